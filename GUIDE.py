@@ -1,238 +1,91 @@
 # -*- coding: utf-8 -*-
 
+from time import perf_counter
+time_launch = perf_counter()
+import sys
+from modele import Modele, DoubleBuffer, parse_arguments, export_columns, save_columns
+
+# Launch phases reported with --profile-startup: (phase, perf_counter at its end)
+startup_times = [('modele import (numpy)',perf_counter())]
+
+def startup_phase(phase):
+    startup_times.append((phase,perf_counter()))
+
+def print_startup_profile():
+    """ Duration of each launch phase since the import of GUIDE.py (python -X importtime GUIDE.py details the imports) """
+    print('Startup profile (ms):')
+    time_previous = time_launch
+    for (phase,time_end) in startup_times:
+        print(f'{1e3*(time_end-time_previous):9.1f}  {phase}')
+        time_previous = time_end
+    print(f'{1e3*(time_previous-time_launch):9.1f}  total')
+
+# Headless batch mode (python GUIDE.py -f model_input.py --headless --steps N --out file): no Qt import at all
+if __name__ == '__main__' and parse_arguments().headless:
+    modele = Modele()
+    if modele.arguments.profile_startup:
+        startup_phase('model loading (Modele.__init__)')
+        print_startup_profile()
+    modele.run_headless()
+    sys.exit()
+
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui,QtWidgets
 from pyqtgraph.dockarea import *
-from time import perf_counter
 from pyqtgraph.graphicsItems.GradientEditorItem import Gradients
+from pyqtgraph.widgets.RemoteGraphicsView import RemoteGraphicsView
+startup_phase('pyqtgraph and Qt imports')
+from remote_docks import SharedArrays
+from decimation import MinMaxPyramid
+from recorder import Recorder
+from continuation import continue_branch, print_bifurcations
 
-import sys
 import numpy as np
 import os
+import importlib.util
 from functools import partial
 import time
-from openpyxl import load_workbook
-import pandas as pd
-import time
+import threading
+startup_phase('other imports')
 
 pg.mkQApp()
+startup_phase('QApplication')
+
+def load_ui(ui_filename):
+
+    """ (form class, base class) of a Qt Designer file. The form is compiled once into a python module cached in __pycache__ and recompiled only when the .ui file is newer, instead of parsing the .ui file at every launch (pg.Qt.loadUiType, used if the cache cannot be written) """
+
+    cache_filename = os.path.join(os.path.dirname(ui_filename),'__pycache__',f'{os.path.splitext(os.path.basename(ui_filename))[0]}_ui_{pg.Qt.QT_LIB}.py')
+    try:
+        if not os.path.exists(cache_filename) or os.path.getmtime(cache_filename) < os.path.getmtime(ui_filename):
+            import io
+            import xml.etree.ElementTree as ElementTree
+            source = io.StringIO()
+            if pg.Qt.QT_LIB in ['PyQt5','PyQt6']:
+                uic = importlib.import_module(f'{pg.Qt.QT_LIB}.uic')
+                uic.compileUi(ui_filename,source)
+            else:  # PySide: uic executable of the binding
+                import subprocess
+                source.write(subprocess.run([f'{pg.Qt.QT_LIB.lower()}-uic',ui_filename],capture_output=True,text=True,check=True).stdout)
+            source.write(f"\nbase_class = '{ElementTree.parse(ui_filename).getroot().find('widget').get('class')}'\n")
+            os.makedirs(os.path.dirname(cache_filename),exist_ok=True)
+            with open(cache_filename+f'.{os.getpid()}','w') as cache_file:  # renamed at once: concurrent launches never read a partial module
+                cache_file.write(source.getvalue())
+            os.replace(cache_filename+f'.{os.getpid()}',cache_filename)
+        spec   = importlib.util.spec_from_file_location(f'GUIDE_ui_{pg.Qt.QT_LIB}',cache_filename)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        form_class = [value for (key,value) in module.__dict__.items() if key.startswith('Ui_')][0]
+        return form_class,getattr(QtWidgets,module.base_class)
+    except Exception as error:
+        print(f'Warning: compiled form of {ui_filename} not cached ({error}), parsing it')
+        return pg.Qt.loadUiType(ui_filename)
 
 ## Define main window class from template
 path = os.path.dirname(os.path.abspath(__file__))
 uiFile = os.path.join(path, 'GUIDE.ui')
-WindowTemplate, TemplateBaseClass = pg.Qt.loadUiType(uiFile)
-
-
-### BEGIN Modele class ###
-class Modele():
-
-    def __init__(self):
-        
-        # Allow importing any file provided as argument in the form: python3 GUIDE.py -f model_input
-        if len(sys.argv) > 1:
-            import importlib
-            option_name = sys.argv[1]
-            assert option_name == '-f', f"option '{option_name}' not understood. Known option is only '-f' with filename as value"
-            assert len(sys.argv)>=3, "provide a filename to load parameters from"
-            lib_path = sys.argv[2]
-            if lib_path.endswith('.py'): lib_path = lib_path.rstrip('.py')
-            input_file = importlib.import_module(lib_path.replace('/','.'))
-        else:
-            import model_input as input_file
-
-        # Loading plots configuration (used in MainWindow class)
-        docks = input_file.load_docks()
-        setattr(self,'docks',docks)
-
-        # Loading window parameters
-        window_params = input_file.window_params
-        if 'streaming' not in window_params.keys(): self.streaming = True
-        for window_param in window_params.keys():
-            setattr(self,window_param,window_params[window_param])
-
-        # Tracking time
-        self.nstep      = 0
-        self.time_stamp = np.zeros(self.array_size).astype(np.float64)
-
-        # Loading parameters
-        params = input_file.load_params()
-        setattr(self,'params',params)
-        for param in self.params.keys():
-            if isinstance(self.params[param]['step'],int):  typ = int
-            else: typ = np.float64
-            self.params[param]['value'] = self.params[param]['init_cond'] * np.ones(self.array_size).astype(typ)
-        
-        # Set default plot for params to False if none provided
-        for param in self.params.keys():
-            if 'plot' not in self.params[param].keys():
-                self.params[param]['plot'] = False
-                
-        # Loading variables
-        variables = input_file.load_variables()
-        setattr(self,'variables',variables)
-        # Loading observables
-        observables = input_file.load_observables()
-        setattr(self,'observables',observables)
-
-        # List as defined in the input file (as observables are added to variables dict)
-        list_variables = list(self.variables.keys())
-        list_observables = list(self.observables.keys())
-
-        # Concatenate the variables and observables dict (if 'invert_var_obs' then invert order observables and variables are displayed)
-        if not 'invert_order_obs_var' in window_params.keys(): self.variables = dict(self.variables, **self.observables)
-        else:
-            if window_params['invert_order_obs_var']:
-                self.variables = dict(self.observables, **self.variables)
-            else:
-                self.variables = dict(self.variables, **self.observables)
-
-        # Build main dict of variables
-        for variable in self.variables.keys():
-            self.variables[variable]['value'] = self.variables[variable]['init_cond'] * np.ones(self.array_size).astype(self.variables[variable]['type'])
-            if variable in list_variables:
-                self.variables[variable]['observable'] = False
-            elif variable in list_observables:
-                self.variables[variable]['observable'] = True
-        
-        # Assert no params, variables and observables are called the same
-        assert len(set(list_variables)&set(list_observables))==0 and len(set(list_variables)&set(list(self.params.keys())))==0 and len(set(list(self.params.keys()))&set(list_observables))==0, f"Repeated name for variables, observables and/or parameters"
-        
-        # Set default plot for variables to True if none provided
-        for variable in self.variables.keys():
-            if 'plot' not in self.variables[variable].keys():
-                self.variables[variable]['plot'] = True
-
-        # Loading equations into keyword 'equation' in variables dict
-        # 'diff_eq_' and 'eq_' are default patterns for variables and observables respectively
-        pattern_variables = 'diff_eq_'
-        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_variables)]:
-            variable = key.split(pattern_variables)[-1]
-            if variable not in list_variables:
-                print(f"Warning: Equation for Variable {variable} not used or not understood")
-                continue
-            if 'equation' in self.variables[variable].keys(): continue
-            self.variables[variable]['equation'] = input_file.__dict__[key]
-
-        pattern_observables = 'eq_'
-        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_observables)]:
-            variable = key.split(pattern_observables)[-1]
-            if variable not in list_observables:
-                print(f"Warning: Equation for Observable {variable} not used or not understood")
-                continue
-            if 'equation' in self.variables[variable].keys(): continue
-            self.variables[variable]['equation'] = input_file.__dict__[key]
-
-        # Create dict of the usable kernels
-        self.kernels = {}
-        pattern_kernels = 'kernel_'
-        for key in [attr for attr in self.__dir__() if attr.startswith(pattern_kernels)]:
-            kernel = key.split(pattern_kernels)[-1]
-            self.kernels[kernel] = {}
-            self.kernels[kernel]['value'] = getattr(self,key)
-        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_kernels)]:
-            kernel = key.split(pattern_kernels)[-1]
-            self.kernels[kernel] = {}
-            self.kernels[kernel]['value'] = input_file.__dict__[key]
-
-        # Load additional keyboard keys if any provided
-        self.user_defined_keyPressEvent = input_file.keyboard_keys()
-        if self.user_defined_keyPressEvent is None: self.user_defined_keyPressEvent = {} # if None provided
-        system_reserved_keys = [" ", "q", "h", "s", "r", "i", "c"]
-
-        for user_defined_key in self.user_defined_keyPressEvent.keys():
-            assert user_defined_key not in system_reserved_keys, f"User defined key '{user_defined_key}' in system reserved ones {system_reserved_keys}"
-
-
-        ########################### BEGIN Assertions input file ###########################
-        # 'dock' (variables): Not providing dock_name that doesn't exist
-        for variable in self.variables.keys():
-            if 'dock' in self.variables[variable]:
-                for dock_name in self.variables[variable]['dock']:
-                    if not isinstance(dock_name,dict):
-                        assert dock_name in self.docks.keys(), f"Dock name '{dock_name}' for variable {variable} not understood. Dock name must be in {list(self.docks.keys())}"
-        # all variables have an equation
-        for variable in self.variables.keys():
-            assert 'equation' in self.variables[variable].keys(), f"An equation for variable {variable} must be provided"
-        ###########################  END Assertions input file  ###########################
-
-
-    def simulator(self):
-
-        """ Calculate 1 time step and update arrays """
-
-        # Actual computation (pass only the 'value' keyword of each sub-dictionnary)
-        self.computation_result_dict = self.kernels[self.kernel]['value']({key:value['value'][-1] for (key,value) in self.variables.items() if not value['observable']},{key:value['value'][-1] for (key,value) in self.params.items()})  # use last value of all variables for the computations of next step
-
-        # Update last values to the newest calculated
-        for variable in self.variables.keys():
-            if not self.variables[variable]['observable']:
-                # Simpler concatenate replacing directly indices
-                self.variables[variable]['value'][:-1] = self.variables[variable]['value'][1:]
-                self.variables[variable]['value'][-1] = self.computation_result_dict[variable]
-
-        # Evaluate observables
-        self.update_observables()
-
-    def update_observables(self):
-        for variable in self.variables.keys():
-            if self.variables[variable]['observable']:
-                self.obs_computation_result = self.variables[variable]['equation'](self,{key:value['value'] for (key,value) in self.variables.items()},{key:value['value'][-1] for (key,value) in self.params.items()})
-                if 'calculation_size' in self.variables[variable].keys() and self.variables[variable]['calculation_size']:
-                    self.variables[variable]['value'] = self.obs_computation_result
-                else:
-                    try:              index = len(self.obs_computation_result)
-                    except TypeError: index = 1   # If return only a single value
-                self.variables[variable]['value'][:-index] = self.variables[variable]['value'][index:]
-                self.variables[variable]['value'][-index:] = self.obs_computation_result
-
-
-    def kernel_euler(self, variables, params):
-
-        """ N variables Euler algorithm (A = A + dt * eq_A(params)) """
-
-        new_variables = {}
-        for variable_name in variables.keys():
-            new_variables[variable_name] = variables[variable_name] + self.step_size * self.variables[variable_name]['equation'](self,variables,params)
-
-        return new_variables
-
-    def kernel_RK4(self, variables, params):
-
-        """ N variables RK4 algorithm """
-
-        temp_variables = variables.copy()
-
-        # Loop for each coefficient on all equations
-        coefs_1 = {}
-        for variable_name in variables.keys():
-            coefs_1[variable_name] = self.variables[variable_name]['equation'](self,temp_variables,params)
-
-        coefs_2 = {}
-        for variable_name in variables.keys():    # evaluate variables first
-            temp_variables[variable_name] = variables[variable_name] + (self.step_size/2.)*coefs_1[variable_name]
-        for variable_name in variables.keys():
-            coefs_2[variable_name] = self.variables[variable_name]['equation'](self,temp_variables,params)
-
-        coefs_3 = {}
-        for variable_name in variables.keys():
-            temp_variables[variable_name] = variables[variable_name] + (self.step_size/2.)*coefs_2[variable_name]
-        for variable_name in variables.keys():
-            coefs_3[variable_name] = self.variables[variable_name]['equation'](self,temp_variables,params)
-
-        coefs_4 = {}
-        for variable_name in variables.keys():
-            temp_variables[variable_name] = variables[variable_name] + self.step_size*coefs_3[variable_name]
-        for variable_name in variables.keys():
-            coefs_4[variable_name] = self.variables[variable_name]['equation'](self,temp_variables,params)
-
-        new_variables = {}
-        for variable_name in variables.keys():
-            new_variables[variable_name] = variables[variable_name] + (self.step_size/6.)*(coefs_1[variable_name]+2*coefs_2[variable_name]+2*coefs_3[variable_name]+coefs_4[variable_name])
-
-        return new_variables
-
-
-
+WindowTemplate, TemplateBaseClass = load_ui(uiFile)
+startup_phase('UI form (GUIDE.ui)')
 
 
 ### BEGIN MainWindow class ###
@@ -252,6 +105,7 @@ class MainWindow(TemplateBaseClass,Modele):
 
         # Load UI
         TemplateBaseClass.__init__(self)   # This seems to call Modele.__init__(self) => Commenting the first occurence
+        startup_phase('model loading (Modele.__init__)')
         self.setWindowTitle('Graphical User Interface for Differential Equations (GUIDE)')
 
         # Create the main window
@@ -283,16 +137,24 @@ class MainWindow(TemplateBaseClass,Modele):
         #ICs_button
         self.ui.ICs_button.clicked.connect(self.update_ICs_button)
         self.ui.ICs_button.keyPressEvent = self.keyPressEvent
-        #nstep_slider
-        self.ui.nstep_slider.setRange(1,int(self.array_size/10))
+        #nstep_slider (with window_params 'target_fps', shows the number of steps per frame chosen by schedule_nstep)
+        self.nstep_update_plot_max = self.array_size if self.target_fps else int(self.array_size/10)
+        self.nstep_scheduled       = float(self.nstep_update_plot)
+        self.time_last_frame       = None
+        self.ui.nstep_slider.setRange(1,self.nstep_update_plot_max)
         self.ui.nstep_slider.setValue(self.nstep_update_plot)
         self.ui.nstep_slider.valueChanged.connect(self.update_nstep_slider)
         #nstep_spinbox
-        self.ui.nstep_spinbox.setRange(1,int(self.array_size/10))
+        self.ui.nstep_spinbox.setRange(1,self.nstep_update_plot_max)
         self.ui.nstep_spinbox.setSingleStep(1)
         self.ui.nstep_spinbox.setValue(self.nstep_update_plot)
         self.ui.nstep_spinbox.setKeyboardTracking(False)  # emit signal only when enter is pressed
         self.ui.nstep_spinbox.valueChanged.connect(self.update_nstep_spinbox)
+        #timings_label: rolling statistics of the computation phases next to fps_label ('p' key)
+        self.timings_label = QtWidgets.QLabel()
+        self.timings_label.hide()
+        self.ui.horizontalLayout.insertWidget(self.ui.horizontalLayout.indexOf(self.ui.fps_label),self.timings_label)
+        self.time_timings_label = 0.
         #fps_label
         self.update_fps_label()
         #record_label
@@ -301,6 +163,10 @@ class MainWindow(TemplateBaseClass,Modele):
         ########################## BEGIN figure layout and docks ##########################
         # Dock declaration and initial placement
         self.main_dock_area = self.ui.dock_area
+        self.shared_arrays  = SharedArrays()  # data of the docks rendered in RemoteGraphicsView subprocesses
+        self.pyramids       = {}              # min/max decimation of the histories plotted in plot1D docks
+        self.recorder       = None            # streaming recorder ('r' key)
+        self.export_jobs    = []              # background threads writing the traces saved with 's'/'r' keys
         for dock_name in self.docks.keys():
             self.add_dock(dock_name) # add 'dock' and 'region' keywords into self.docks[dock_name]
 
@@ -313,7 +179,8 @@ class MainWindow(TemplateBaseClass,Modele):
         self.warning_observables_docks = []
         for dock_name in self.docks.keys():
             if self.docks[dock_name]['type'] == 'plot1D':
-                self.create_PlotWidget(dock_name) # add 'actual_plot' keyword into self.docks[dock_name]
+                if self.is_remote_dock(dock_name): self.create_RemotePlotWidget(dock_name)
+                else: self.create_PlotWidget(dock_name) # add 'actual_plot' keyword into self.docks[dock_name]
 
                 # Attribution of the curves to the plots
                 flag = 0
@@ -357,7 +224,8 @@ class MainWindow(TemplateBaseClass,Modele):
 
 
             elif self.docks[dock_name]['type'] == 'plot2D':
-                self.create_PlotWidget(dock_name)
+                if self.is_remote_dock(dock_name): self.create_RemotePlotWidget(dock_name)
+                else: self.create_PlotWidget(dock_name)
 
                 # Attribution of the curves to the plots
                 flag = 0
@@ -388,15 +256,25 @@ class MainWindow(TemplateBaseClass,Modele):
                                                 print(f"WARNING: check validity of dock_names you provided in the variables/observable dictionnary: {list(element_variable_dock.keys())}'")
                                         
                                         
-                if flag == 0:  # Nothing plotted on the 'plot2D'
+                if 'branch' in self.docks[dock_name]:  # branches of steady states (continuation): stable solid, unstable dashed, bifurcations as symbols
+                    param,variable = self.docks[dock_name]['branch']
+                    assert param in self.params.keys() and variable in self.variables.keys(), f"'branch' of dock '{dock_name}' must be [param, variable/observable], provided was {self.docks[dock_name]['branch']}"
+                    rgb_branch,rgb_bifurcations = [self.colors_dict[list(self.colors_dict.keys())[np.mod(flag+i,len(self.colors_dict))]]['rgb'] for i in range(2)]
+                    self.docks[dock_name]['branch_curves'] = {}
+                    self.docks[dock_name]['branch_curves']['stable']       = self.docks[dock_name]['actual_plot'].plot(pen=rgb_branch)
+                    self.docks[dock_name]['branch_curves']['unstable']     = self.docks[dock_name]['actual_plot'].plot(pen={'color':rgb_branch,'style':QtCore.Qt.PenStyle.DashLine})
+                    self.docks[dock_name]['branch_curves']['bifurcations'] = self.docks[dock_name]['actual_plot'].plot(pen=None,symbol='o',symbolBrush=rgb_bifurcations)
+                elif flag == 0:  # Nothing plotted on the 'plot2D'
                     print(f"WARNING: nothing has been plotted on the 'plot2D' dock with name '{dock_name}'")
 
                 if 'zoomOf' in self.docks[dock_name].keys():
                     pass
 
             elif self.docks[dock_name]['type'] == 'image':
-                self.create_ImageView(dock_name)
-                self.docks[dock_name]['actual_plot'].keyPressEvent = self.keyPressEvent
+                if self.is_remote_dock(dock_name): self.create_RemoteImageView(dock_name)
+                else:
+                    self.create_ImageView(dock_name)
+                    self.docks[dock_name]['actual_plot'].keyPressEvent = self.keyPressEvent
 
         #self.docks[dock_name]['actual_plot'].enableAutoRange('xy', True)
         ########################## END figure layout and docks ##########################
@@ -419,7 +297,7 @@ class MainWindow(TemplateBaseClass,Modele):
             if not self.variables[variable]['observable']:
                 self.variables[variable]['lineedit'] = QtWidgets.QLineEdit()
                 temp.setWidget(1, self.variables[variable]['lineedit'])
-                self.variables[variable]['lineedit'].setText(str(self.variables[variable]['value'][-1])) # set initial value
+                self.variables[variable]['lineedit'].setText(str(self.variables[variable]['value'][-1]) if variable not in self.fields else f'field {self.fields[variable]}') # set initial value (a number sets a uniform field)
                 self.variables[variable]['lineedit'].returnPressed.connect(partial(self.update_lineedit_variable,variable))
 
             # Create checkbox
@@ -502,6 +380,7 @@ class MainWindow(TemplateBaseClass,Modele):
         #############################  END Trees declaration  ############################
 
         # Start showing the window
+        startup_phase('widgets, trees and docks')
         self.show()
 
         # Connect timer to update the figure
@@ -509,6 +388,13 @@ class MainWindow(TemplateBaseClass,Modele):
         self.timer.timeout.connect(self.run_simulator)
         self.timer.start(10)
 
+        # Calculations in a background worker (window_params 'worker'): snapshots are handed over to the timer through a double buffer
+        self.snapshot = None
+        if self.worker:
+            self.snapshots     = DoubleBuffer()
+            self.worker_thread = SimulationWorker(self)
+            self.worker_thread.start()
+
         # Initial window states
         if not self.streaming: self.timer.stop(); self.run_simulator()
         self.update_pause_indicator()
@@ -529,23 +415,28 @@ class MainWindow(TemplateBaseClass,Modele):
         #print('2',self.docks[relatedTo]['actual_plot'].getViewBox().viewRange()[1])
         self.docks[relatedTo]['region'][dock_name].setRegion(self.docks[dock_name]['actual_plot'].getViewBox().viewRange()[0])
 
-    def update_plots(self):
+    def update_plots(self,values=None):
+        """ Update all the curves/images with values ({name:array} of variables, observables and params); by default the current arrays, or the latest snapshot of the worker """
+        if values is None:
+            values = self.snapshot if self.worker else self.plot_values()
+            if values is None: return  # no snapshot published yet
+        self.shared_arrays.new_frame()
         for dock_name in self.docks.keys():
             if self.docks[dock_name]['type'] == 'plot1D':
                 for variable in self.variables.keys():
                     if self.variables[variable]['plot']:
                         if 'dock' in self.variables[variable].keys():
                             if dock_name in self.variables[variable]['dock']:
-                                self.docks[dock_name]['curve'][variable].setData(self.variables[variable]['value'])
+                                self.set_curve1D_data(dock_name,self.docks[dock_name]['curve'][variable],values,variable)
                         else:
-                            self.docks[dock_name]['curve'][variable].setData(self.variables[variable]['value'])
+                            self.set_curve1D_data(dock_name,self.docks[dock_name]['curve'][variable],values,variable)
                 for param in self.params.keys():
                     if self.params[param]['plot']:
                         if 'dock' in self.params[param].keys():
                             if dock_name in self.params[param]['dock']:
-                                self.docks[dock_name]['curve'][param].setData(self.params[param]['value'])
+                                self.set_curve1D_data(dock_name,self.docks[dock_name]['curve'][param],values,param)
                         else:
-                            self.docks[dock_name]['curve'][param].setData(self.params[param]['value'])
+                            self.set_curve1D_data(dock_name,self.docks[dock_name]['curve'][param],values,param)
             elif self.docks[dock_name]['type'] == 'plot2D':
                 # plot the variable names that are pre stored in dock dict
                 for curve2D in self.docks[dock_name]['curve']:
@@ -557,48 +448,185 @@ class MainWindow(TemplateBaseClass,Modele):
                         index_variable_provided = list(set([0,1]) - set([index_param_provided]))
                         if self.variables[curve2D.split('_plot2D_')[0]]['plot']:
                             if index_param_provided == 0:
-                                self.docks[dock_name]['curve'][curve2D]['curve'].setData(self.params[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][0]]['value'],self.variables[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][1]]['value'])
+                                self.set_plot_data(dock_name,self.docks[dock_name]['curve'][curve2D]['curve'],'setData',values,*self.docks[dock_name]['curve'][curve2D]['variables_to_plot'])
                             elif index_param_provided == 1:
-                                self.docks[dock_name]['curve'][curve2D]['curve'].setData(self.variables[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][0]]['value'],self.params[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][1]]['value'])
+                                self.set_plot_data(dock_name,self.docks[dock_name]['curve'][curve2D]['curve'],'setData',values,*self.docks[dock_name]['curve'][curve2D]['variables_to_plot'])
                     # no params provided
                     else:
                         # if variables specified, index 0 is to be plot
                         if self.variables[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][0]]['plot']:
-                            self.docks[dock_name]['curve'][curve2D]['curve'].setData(self.variables[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][0]]['value'],self.variables[self.docks[dock_name]['curve'][curve2D]['variables_to_plot'][1]]['value'])
+                            self.set_plot_data(dock_name,self.docks[dock_name]['curve'][curve2D]['curve'],'setData',values,*self.docks[dock_name]['curve'][curve2D]['variables_to_plot'])
             elif self.docks[dock_name]['type'] == 'image':
                 for variable in self.variables.keys():
                     if 'dock' in self.variables[variable].keys():
                         if self.variables[variable]['plot']:
                             if dock_name in self.variables[variable]['dock']:
-                                self.docks[dock_name]['actual_plot'].setImage(self.variables[variable]['value'])
+                                self.set_plot_data(dock_name,self.docks[dock_name]['actual_plot'],'setImage',values,variable)
         # Update fps_label
         self.update_fps_label()
 
+    def continuation(self,param,stop,**options):
+        """ Follow the steady states from the current state in param up to stop (options: see continuation.continue_branch) and show the branch in the plot2D docks with the key 'branch' for this param. Returns (branch, bifurcations) """
+        branch,bifurcations = continue_branch(self,param,stop,**options)
+        print(f"Branch of {len(branch[param])} steady states, {param} from {branch[param][0]:.6g} to {branch[param][-1]:.6g}")
+        print_bifurcations(bifurcations,param)
+        for dock_name in self.docks.keys():
+            if 'branch_curves' in self.docks[dock_name] and self.docks[dock_name]['branch'][0] == param:
+                self.plot_branch(dock_name,branch)
+        return branch,bifurcations
+
+    def plot_branch(self,dock_name,branch):
+        param,variable = self.docks[dock_name]['branch']
+        assert variable in branch, f"'{variable}' is not on the branch (only variables and pointwise observables are)"
+        x,y    = branch[param],branch[variable]
+        if np.iscomplexobj(y): y = np.abs(y)
+        stable = branch['stable']
+        solid,dashed = stable.copy(),~stable  # segments joined at the changes of stability
+        solid[1:]  |= stable[:-1]
+        dashed[1:] |= ~stable[:-1]
+        bifurcations = branch['bifurcation'] != ''
+        values = {f'{dock_name}/branch/x':x,f'{dock_name}/branch/stable':np.where(solid,y,np.nan),f'{dock_name}/branch/unstable':np.where(dashed,y,np.nan),
+                  f'{dock_name}/branch/x_bifurcations':x[bifurcations],f'{dock_name}/branch/bifurcations':y[bifurcations]}
+        for (name,curve) in self.docks[dock_name]['branch_curves'].items():
+            self.set_plot_data(dock_name,curve,'setData',values,f'{dock_name}/branch/x_bifurcations' if name == 'bifurcations' else f'{dock_name}/branch/x',f'{dock_name}/branch/{name}')
+
+    def set_curve1D_data(self,dock_name,curve,values,name):
+        """ Set the data of a plot1D curve decimated to about 2 points per pixel of the visible x range (min/max of bins, see decimation.MinMaxPyramid): the whole history when the x axis auto-ranges (always for remote docks), only the region for zoom docks """
+        array  = values[name]
+        counts = values['history_counts'].get(name)
+        if np.ndim(array) == 2:  # field: current profile along space
+            self.set_plot_data(dock_name,curve,'setData',{f'{dock_name}/{name}/profile':array[-1]},f'{dock_name}/{name}/profile')
+            return
+        if counts is None or np.iscomplexobj(array):  # no history (calculation_size) or complex values: plotted as is
+            self.set_plot_data(dock_name,curve,'setData',values,name)
+            return
+        if name not in self.pyramids: self.pyramids[name] = MinMaxPyramid(len(array))
+        if (self.pyramids[name].count,self.pyramids[name].revision,self.pyramids[name].version) != counts:  # new samples, rewrite or last sample modified (set_last)
+            self.pyramids[name].update(array,*counts)
+
+        if 'remote_view' in self.docks[dock_name]:
+            x_range,width = (0,len(array)),self.docks[dock_name]['remote_view'].width()
+        else:
+            view_box = self.docks[dock_name]['actual_plot'].getViewBox()
+            x_range  = (0,len(array)) if view_box.autoRangeEnabled()[0] else view_box.viewRange()[0]
+            width    = view_box.width()
+        nb_points = max(2*int(width),2)
+        margin    = (x_range[1]-x_range[0])/nb_points*2  # one bin beyond each side so that the curve reaches the edges
+        x,y = self.pyramids[name].decimate(array,np.floor(x_range[0]-margin),np.ceil(x_range[1]+margin)+1,nb_points)
+        self.set_plot_data(dock_name,curve,'setData',{f'{dock_name}/{name}/x':x,f'{dock_name}/{name}/y':y},f'{dock_name}/{name}/x',f'{dock_name}/{name}/y')
+
+    def set_plot_data(self,dock_name,item,method,values,*names):
+        """ Call item.method with the arrays values[name]; for remote docks the arrays go through shared memory and the call is asynchronous """
+        if 'remote_view' in self.docks[dock_name]:
+            descriptors = [self.shared_arrays.write(name,values[name]) for name in names]
+            self.shared_arrays.sent(names,self.docks[dock_name]['remote_set_data'](item,method,descriptors,_callSync='async'))
+        else:
+            getattr(item,method)(*[values[name] for name in names])
+
     def run_simulator(self,nstep_update_plot=None):
-        if not nstep_update_plot: nstep_update_plot = self.nstep_update_plot
-        
-        # Calculation
+        # Calculations in the background worker: the timer only renders the latest complete snapshot
+        if self.worker and not nstep_update_plot:
+            snapshot = self.snapshots.take()
+            if snapshot is not None:
+                if self.target_fps:
+                    # Frame period measured here (from the previous take, includes rendering and waiting for the worker): the worker computes one block per rendered frame
+                    time_take = perf_counter()
+                    if self.time_last_frame is not None and time_take-self.time_last_frame < 4./self.target_fps: self.schedule_nstep(time_take-self.time_last_frame)
+                    self.time_last_frame = time_take
+                self.snapshot = snapshot
+                time_start = self.timings.start()
+                self.update_plots(self.snapshot)
+                self.timings.stop('update_plots',time_start)
+            if self.target_fps: self.show_nstep_update_plot()
+            return
+
+        scheduled = not nstep_update_plot  # timer frames follow the frame budget, explicit calls (e.g. scans) compute what they ask
+        if scheduled: nstep_update_plot = self.nstep_update_plot
+        time_start = perf_counter()
+        with self.computation_lock:  # explicit calls (e.g. scans) compute here even with a worker
+            self.apply_queued_requests()
+            self.compute(nstep_update_plot)
+        elapsed_time = perf_counter() - time_start
+        if self.timings.enabled: self.timings.add('frame',elapsed_time)
+        if scheduled and self.target_fps:
+            # Frame duration from the start of the previous timer frame (includes painting and the timer interval) unless the simulation was paused in between
+            if self.time_last_frame is not None and time_start-self.time_last_frame < 4./self.target_fps: elapsed_time = time_start - self.time_last_frame
+            self.time_last_frame = time_start
+            self.schedule_nstep(elapsed_time)
+            self.show_nstep_update_plot()
+
+    def schedule_nstep(self,elapsed_time):
+        """ (window_params 'target_fps') Adapt nstep_update_plot so that a frame (steps, plots and events) lasts 1/target_fps: the steps per frame follow the square root of the ratio between the budget and the last frame duration, by at most a factor 2 per frame """
+        ratio = np.clip(np.sqrt(1./(self.target_fps*max(elapsed_time,1e-6))),0.5,2.)
+        self.nstep_scheduled   = np.clip(self.nstep_scheduled*ratio,1,self.nstep_update_plot_max)
+        self.nstep_update_plot = int(round(self.nstep_scheduled))
+
+    def show_nstep_update_plot(self):
+        """ Show the steps per frame chosen by schedule_nstep in nstep_slider/nstep_spinbox without triggering their callbacks """
+        if self.ui.nstep_slider.value() == self.nstep_update_plot: return
+        for widget in [self.ui.nstep_slider,self.ui.nstep_spinbox]:
+            widget.blockSignals(True)
+            widget.setValue(self.nstep_update_plot)
+            widget.blockSignals(False)
+
+    def compute(self,nstep_update_plot,in_worker=False):
+        """ Calculate nstep_update_plot steps (recording if needed) and update the plots after the last one, or publish a snapshot of the arrays when called from the worker thread """
+
+        # Block integration: all the steps in a single kernel call, then one update of observables, records and plots
+        timings = self.timings
+        if self.is_block_integration():
+            self.simulator_block(nstep_update_plot)
+            time_start = timings.start()
+            if self.record_state:
+                self.recorder.extend(self.traces_of_last_steps(nstep_update_plot))
+                timings.stop('recording',time_start)
+            self.publish_plots(in_worker)
+            time_start = timings.start()
+            self.update_time_stamp_and_params(nstep_update_plot)
+            timings.stop('time_and_params',time_start)
+            if not in_worker:
+                time_start = timings.start()
+                QtCore.QCoreApplication.processEvents()
+                timings.stop('process_events',time_start)
+            return
+
+        # Calculation: events are processed once per slice of the frame budget (and after the plots update) rather than after every step
+        event_slice = 1./self.target_fps if self.target_fps else 0.02
+        time_events = perf_counter()
         for i in range(nstep_update_plot):
             self.simulator()
 
             # If recording
             if self.record_state and (self.nstep%self.nstep_record == 0):  # record every self.nstep_record
-                self.append_to_dataframe()
+                time_start = timings.start()
+                self.recorder.append_row({key:value[-1] for (key,value) in self.traces_to_save().items()})
+                timings.stop('recording',time_start)
 
             # Update main plots every nstep_update_plot (last occurence of the loop)
             if i==nstep_update_plot-1:
-                self.update_plots()
+                self.publish_plots(in_worker)
 
             # Update time_stamp and parameter dict last (then saved correspond to calculation)
-            self.time_stamp[:-1] = self.time_stamp[1:]
-            self.time_stamp[-1] += self.step_size
-            self.nstep          += 1
-
-            for param in self.params.keys():
-                self.params[param]['value'][:-1] = self.params[param]['value'][1:]
+            time_start = timings.start()
+            self.update_time_stamp_and_params()
+            timings.stop('time_and_params',time_start)
 
             # Fix app freezing on Windows systems  (if event occurs must process it)
-            QtCore.QCoreApplication.processEvents()
+            if not in_worker and (i==nstep_update_plot-1 or perf_counter()-time_events > event_slice):
+                time_start = timings.start()
+                QtCore.QCoreApplication.processEvents()
+                timings.stop('process_events',time_start)
+                time_events = perf_counter()
+
+    def publish_plots(self,in_worker):
+        """ Update the plots, or publish a snapshot of the arrays for the GUI thread when called from the worker """
+        time_start = self.timings.start()
+        if in_worker:
+            self.snapshots.write(self.plot_values())
+            self.timings.stop('snapshot',time_start)
+        else:
+            self.update_plots()
+            self.timings.stop('update_plots',time_start)
             
     #################################  END plots update  ###################################
 
@@ -610,40 +638,74 @@ class MainWindow(TemplateBaseClass,Modele):
         except: key = event  # allow calling keys programatically
 
         if key in list(self.user_defined_keyPressEvent.keys()):  # Interprete keys defined user file
-            self.user_defined_keyPressEvent[key](self,{key:value['value'] for (key,value) in self.variables.items()},{key:value['value'][-1] for (key,value) in self.params.items()})
+            with self.computation_lock:  # the worker (if any) waits for the user function to return
+                self.evaluate_observables()
+                self.user_defined_keyPressEvent[key](self,{key:value['value'] for (key,value) in self.variables.items()},{key:value['value'][-1] for (key,value) in self.params.items()})
         elif key == ' ':
             self.toggle_streaming()
         elif key == 'q':
+            self.stop_worker()
+            self.close_recorder()
+            self.close_remote_docks()
             sys.exit()
         elif key == 'h':
             previous_streaming_state = self.streaming
             if previous_streaming_state: self.toggle_streaming()
-            self.display_help()
+            with self.computation_lock:
+                self.display_help()
             if previous_streaming_state: self.toggle_streaming()
         elif key == 's' or key == 'r':
             previous_streaming_state = self.streaming
             if previous_streaming_state: self.toggle_streaming() # pause it
-            if   key=='s': self.save() # query filename and save initial screenshot
-            elif key=='r':
-                if not self.record_state:
-                    self.save(record=True)
-                else:
-                    self.toggle_record_state()
-                    self.save_screenshot(self.filename_to_record_no_ext+'_END.png')
-                    self.save_appended_dataframe()
-                    self.filename_to_record_no_ext = None
+            with self.computation_lock:  # wait for the worker (if any) to finish its current steps
+                if   key=='s': self.save() # query filename and save initial screenshot
+                elif key=='r':
+                    if not self.record_state:
+                        self.save(record=True)
+                    else:
+                        self.toggle_record_state()
+                        self.save_screenshot(self.filename_to_record_no_ext+'_END.png')
+                        self.close_recorder()
             if previous_streaming_state: self.toggle_streaming()
         elif key == 'i':
             self.change_ICs_variable()
         elif key == 'c':
             self.update_images_colormap()
+        elif key == 'k' or key == 'l':
+            previous_streaming_state = self.streaming
+            if previous_streaming_state: self.toggle_streaming() # pause it
+            self.checkpoint(restore=(key=='l'))
+            if previous_streaming_state: self.toggle_streaming()
+        elif key == 'p':
+            self.queue_request(self.set_timings,self.timings_label.isHidden())
+            self.timings_label.setHidden(not self.timings_label.isHidden())
+        elif key == 'P':
+            with self.computation_lock:
+                self.timings.dump(f'timings_{time.strftime("%Y-%m-%d_%H-%M-%S")}.json')
         else:
             if key != "" and event.key() != QtCore.Qt.Key.Key_Return:
                 print(f'Keyboard event "{key}" not None')
 
 
+    def stop_worker(self):
+        if self.worker:
+            self.worker_thread.requestInterruption()
+            self.worker_thread.wait()
+
+    def close_remote_docks(self):
+        for dock_name in self.docks.keys():
+            if 'remote_view' in self.docks[dock_name]:
+                self.docks[dock_name]['remote_view'].close()
+        self.shared_arrays.close()
+
+    def closeEvent(self,event):
+        self.stop_worker()
+        self.close_recorder()
+        self.close_remote_docks()
+        event.accept()
+
     def create_PlotWidget(self,dock_name):
-        self.docks[dock_name]['actual_plot'] = pg.PlotWidget(**{key:value for key,value in self.docks[dock_name].items() if key not in ['dock','type','position','relativeTo','size','zoomOf','region']})
+        self.docks[dock_name]['actual_plot'] = pg.PlotWidget(**{key:value for key,value in self.docks[dock_name].items() if key not in ['dock','type','position','relativeTo','size','zoomOf','region','remote','branch']})
         self.docks[dock_name]['dock'].addWidget(self.docks[dock_name]['actual_plot'])
 
     def create_ImageView(self,dock_name):
@@ -652,7 +714,7 @@ class MainWindow(TemplateBaseClass,Modele):
         img = pg.ImageItem(np.zeros((50,50)),axisOrder='row-major')  # to rotate 90 degree
 
         # Create an ImageView Widget
-        self.docks[dock_name]['actual_plot'] = pg.ImageView(view=pl,imageItem=img,**{key:value for key,value in self.docks[dock_name].items() if key not in ['dock','type','position','relativeTo','size','zoomOf','region']})
+        self.docks[dock_name]['actual_plot'] = pg.ImageView(view=pl,imageItem=img,**{key:value for key,value in self.docks[dock_name].items() if key not in ['dock','type','position','relativeTo','size','zoomOf','region','remote','branch']})
         # Set initial states
         self.docks[dock_name]['actual_plot'].view.invertY(False)
         self.docks[dock_name]['actual_plot'].view.setAspectLocked(False)
@@ -669,6 +731,39 @@ class MainWindow(TemplateBaseClass,Modele):
 
         self.docks[dock_name]['dock'].addWidget(self.docks[dock_name]['actual_plot'])
 
+    def is_remote_dock(self,dock_name):
+        """ Whether the dock is rendered in a RemoteGraphicsView subprocess (dock key 'remote', default window_params 'remote_docks'). Not possible for docks linked by 'zoomOf' (regions are local items) """
+        remote = self.docks[dock_name].get('remote',self.remote_docks)
+        if remote and ('zoomOf' in self.docks[dock_name] or dock_name in [self.docks[name].get('zoomOf') for name in self.docks.keys()]):
+            print(f"WARNING: dock '{dock_name}' is linked by 'zoomOf' and cannot be rendered in a remote process")
+            return False
+        return remote
+
+    def create_RemoteView(self,dock_name):
+        """ RemoteGraphicsView subprocess holding a PlotItem; returns the proxy of the PlotItem """
+        self.docks[dock_name]['remote_view'] = RemoteGraphicsView()
+        self.docks[dock_name]['remote_view'].keyPressEvent = self.keyPressEvent
+        self.docks[dock_name]['remote_set_data'] = self.docks[dock_name]['remote_view']._proc._import('remote_docks').set_data
+        plot_item = self.docks[dock_name]['remote_view'].pg.PlotItem(**{key:value for key,value in self.docks[dock_name].items() if key not in ['dock','type','position','relativeTo','size','zoomOf','region','remote','branch','remote_view','remote_set_data']})
+        self.docks[dock_name]['remote_view'].setCentralItem(plot_item)
+        self.docks[dock_name]['dock'].addWidget(self.docks[dock_name]['remote_view'])
+        return plot_item
+
+    def create_RemotePlotWidget(self,dock_name):
+        self.docks[dock_name]['actual_plot'] = self.create_RemoteView(dock_name)
+
+    def create_RemoteImageView(self,dock_name):
+        # Image item in a plot item (to get axis); no histogram in remote docks
+        plot_item = self.create_RemoteView(dock_name)
+        self.docks[dock_name]['actual_plot'] = self.docks[dock_name]['remote_view'].pg.ImageItem(axisOrder='row-major')
+        plot_item.addItem(self.docks[dock_name]['actual_plot'])
+        plot_item.setAspectLocked(False)
+
+        # Set colormap to be used
+        gradient = Gradients[self.colormaps_list[self.flag_colormaps]]
+        cmap = pg.ColorMap(pos=[c[0] for c in gradient['ticks']],color=[c[1] for c in gradient['ticks']])
+        self.docks[dock_name]['actual_plot'].setColorMap(cmap)
+
     def add_dock(self,dock_name):
         ''' Add a dock to the main window '''
         if 'relativeTo' in self.docks[dock_name].keys():
@@ -680,7 +775,7 @@ class MainWindow(TemplateBaseClass,Modele):
 
     def repaint_all_plots(self):
         for dock_name in self.docks.keys():
-            if 'actual_plot' in self.docks[dock_name]:
+            if 'actual_plot' in self.docks[dock_name] and 'remote_view' not in self.docks[dock_name]:
                 self.docks[dock_name]['actual_plot'].repaint()
 
     def toggle_streaming(self):
@@ -694,7 +789,7 @@ class MainWindow(TemplateBaseClass,Modele):
         else:
             self.ui.run_label.setStyleSheet("QLabel {border: 3px solid %s; background-color : %s; color : %s; }" %('#000000',self.colors_dict['r']['hex'],(0,0,0)))
             self.ui.run_label.setText('   Stop    ')
-            self.timer.stop()
+            if not self.worker: self.timer.stop()  # with a worker, keep rendering changes made while paused
         self.ui.run_label.repaint()
 
     def update_images_colormap(self):
@@ -720,14 +815,14 @@ class MainWindow(TemplateBaseClass,Modele):
         for variable in self.variables.keys():
             if not self.variables[variable]['observable']:
                 value = np.array(self.variables[variable]['init_cond']).astype(self.variables[variable]['type'])  # convert to array to be able to astype
-                self.variables[variable]['lineedit'].setText(str(value)) # set initial value
-            self.variables[variable]['value'] = self.variables[variable]['init_cond'] * np.ones(self.array_size).astype(self.variables[variable]['type'])
+                self.variables[variable]['lineedit'].setText(str(value) if variable not in self.fields else f'field {self.fields[variable]}') # set initial value
+            self.queue_request(self.reset_variable_to_init_cond,variable)
 
     def display_help(self):
         # Message must be a list of each line to display
         text_help_dialog  = ['Important Notes:','- (keyboard keys) do not work when focus is given to lineedits or spinboxes','- ("image" plots) you must pause to modify the aspect ratio, zoom or histogram range']
         text_help_dialog += ['']
-        text_help_dialog += ['Usable keyboard keys:','- "  ":   toggle run/stop','- "q":   close the window','- "h":   display this help message','- "s":   save a snapshot and a dataframe','- "r":   toggle recording, save snapshots at start/end','- "i":   apply all variables ICs','- "c":   change the colormap to be use to draw "image" plots']
+        text_help_dialog += ['Usable keyboard keys:','- "  ":   toggle run/stop','- "q":   close the window','- "h":   display this help message','- "s":   save a snapshot and a dataframe','- "r":   toggle recording, save snapshots at start/end','- "i":   apply all variables ICs','- "c":   change the colormap to be use to draw "image" plots','- "k":   save a checkpoint of the whole simulation state (directory)','- "l":   restore a checkpoint','- "p":   toggle the timings of the computation phases (shown next to fps, per equation in tooltip)','- "P":   dump the timings to a json file']
         text_help_dialog += ['']
         text_help_dialog += ['Defined variables and observables:']
         for variable in self.variables.keys():
@@ -763,7 +858,7 @@ class MainWindow(TemplateBaseClass,Modele):
         if self.filename_to_save_no_ext is None:
             save_dialog = QtWidgets.QFileDialog()
             save_dialog.setFileMode(QtWidgets.QFileDialog.FileMode.AnyFile)
-            save_dialog.setNameFilter("Output files (*.png *.xlsx)")
+            save_dialog.setNameFilter("Output files (*.png "+" ".join(['*.'+extension for extension in self.save_formats])+")")
             save_dialog.setWindowTitle("Saving files: screenshot, traces and window state")
             if save_dialog.exec():
                 filename_provided = save_dialog.selectedFiles()[0]
@@ -774,7 +869,7 @@ class MainWindow(TemplateBaseClass,Modele):
 
                 # Build a dict of the existing conflicting files
                 existing_filename_dict = {}
-                for filename in [self.filename_to_save_no_ext+'.png',self.filename_to_save_no_ext+'.xlsx']:
+                for filename in [self.filename_to_save_no_ext+'.png']+[self.filename_to_save_no_ext+'.'+extension for extension in self.save_formats]:
                     if os.path.exists(filename):
                         existing_filename_dict[filename] = {}
                         existing_filename_dict[filename]['name'] = filename.split("/")[-1]
@@ -803,22 +898,57 @@ class MainWindow(TemplateBaseClass,Modele):
         if self.filename_to_save_no_ext is None: return
 
         # save screenshot
-        time.sleep(0.1) # wait for save_dialog to close before the snapshot
+        QtWidgets.QApplication.processEvents() # let save_dialog close before the snapshot
         add_text = '_START' if record else ''
         self.save_screenshot(self.filename_to_save_no_ext+f"{add_text}.png")
-        # save dataframe with variables, observables and parameter values
-        self.save_dataframe(self.filename_to_save_no_ext+'.xlsx')
+        # save variables, observables and parameter values in the background
+        self.export_traces(self.filename_to_save_no_ext)
         if record:
-            self.list_to_record            = []
+            self.recorder                  = Recorder(self.filename_to_save_no_ext+'_record',{key:value.dtype for (key,value) in self.traces_to_save().items()},self.record_chunk_size)
             self.filename_to_record_no_ext = self.filename_to_save_no_ext
             self.toggle_record_state()
 
+    def checkpoint(self,restore=False,directory=None):
+        """ Save the simulation state into a checkpoint directory, or restore one and show its params, kernel and nstep_update_plot in the widgets """
+        if directory is None:
+            if restore: directory = QtWidgets.QFileDialog.getExistingDirectory(self,'Restoring checkpoint directory')
+            else:       directory = QtWidgets.QFileDialog.getSaveFileName(self,'Saving checkpoint directory')[0]
+            if not directory: return
+        with self.computation_lock:  # wait for the worker (if any) to finish its current steps
+            if not restore:
+                self.save_checkpoint(directory)
+                return
+            self.restore_checkpoint(directory)
+            self.show_model_in_widgets()
+            if self.worker: self.snapshots.write(self.plot_values())
+            else:           self.update_plots()
+
+    def show_model_in_widgets(self):
+        """ Show the current params, kernel and nstep_update_plot of the model in the widgets without triggering their callbacks (e.g. after restoring a checkpoint) """
+        for param in self.params.keys():
+            value = self.params[param]['value'][-1]
+            for (widget,widget_value) in [(self.params[param]['spinbox'],value),(self.params[param]['slider'],int(np.round(value*self.params[param]['slider_conversion_factor'])))]:
+                widget.blockSignals(True)
+                widget.setValue(widget_value)
+                widget.blockSignals(False)
+        self.kernels[self.kernel]['checkbox'].setChecked(True)
+        self.nstep_scheduled = float(self.nstep_update_plot)
+        self.show_nstep_update_plot()
+
     def overwrite_buttons(self,event):
         button_pressed = event.text()
         if 'Cancel' in button_pressed:
             self.filename_to_save_no_ext = None
         elif 'Save' in button_pressed:
             return
+    def close_recorder(self):
+        """ Write the last recorded steps (if recording) """
+        if self.recorder is None: return
+        self.recorder.close()
+        print(f'Convert it with: python recorder.py {self.filename_to_record_no_ext}_record {self.filename_to_record_no_ext}_record.xlsx')
+        self.recorder                  = None
+        self.filename_to_record_no_ext = None
+
     def toggle_record_state(self):
         self.record_state = not(self.record_state)
         self.update_record_state_indicator()
@@ -829,42 +959,14 @@ class MainWindow(TemplateBaseClass,Modele):
         screenshot = screen.grabWindow( self.ui.main_splitter.winId() )
         screenshot.save(filename, 'png')
         print(f'File "{filename}" saved')
-    def save_dataframe(self,filename):
-        data_frame = self.build_dataframe_to_save()
-        data_frame.to_excel(filename,index=False)
-        print(f'File "{filename}" saved')
-    def save_appended_dataframe(self,sheet_name='Sheet1'):
-        """ Append to existing data frame """
-        filename                  = self.filename_to_record_no_ext+'.xlsx'
-        self.data_frame_to_record = pd.DataFrame(self.list_to_record)
-        
-        with pd.ExcelWriter(filename,engine='openpyxl',mode='a',if_sheet_exists='overlay') as writer:
-            reader = pd.read_excel(filename)
-            self.data_frame_to_record.to_excel(writer,header=False,index=False, startrow=reader.shape[0]+1)
-
-        print(f'File "{filename}" appended')
-
-    def build_dataframe_to_save(self):
-        data_frame      = pd.DataFrame()
-        data_frame['time'] = self.time_stamp
-        for variable in self.variables.keys():
-            if 'calculation_size' in self.variables[variable].keys() and self.variables[variable]['calculation_size']:
-                continue
-            data_frame[variable] = self.variables[variable]['value']
-        for param in self.params.keys():
-            data_frame[param] = self.params[param]['value']
-        return data_frame
-
-    def append_to_dataframe(self):
-        list_to_data_frame = []
-        list_to_data_frame.append(self.time_stamp[-1])
-        for variable in self.variables.keys():
-            if 'calculation_size' in self.variables[variable].keys() and self.variables[variable]['calculation_size']:
-                continue
-            list_to_data_frame.append(self.variables[variable]['value'][-1])
-        for param in self.params.keys():
-            list_to_data_frame.append(self.params[param]['value'][-1])
-        self.list_to_record.append(list_to_data_frame)
+    def export_traces(self,filename_no_ext):
+        """ Copy the traces once and write them in the window_params 'save_formats' from a background thread, so that streaming resumes right away """
+        columns = {key:np.array(value) for (key,value) in self.traces_to_save().items()}
+        export_jobs = [threading.Thread(target=export_columns,args=(filename_no_ext,columns,self.save_formats))]
+        if self.fields:  # (time, space) histories in their own .npz
+            export_jobs.append(threading.Thread(target=save_columns,args=(filename_no_ext+'_fields.npz',{key:np.array(value) for (key,value) in self.field_traces().items()})))
+        for export_job in export_jobs: export_job.start()
+        self.export_jobs = [job for job in self.export_jobs if job.is_alive()] + export_jobs
     #################################  END save  ###################################
 
     def update_fps_label(self):
@@ -877,11 +979,24 @@ class MainWindow(TemplateBaseClass,Modele):
             s = np.clip(dt*3., 0, 1)
             self.fps = self.fps * (1-s) + (1.0/dt) * s
             self.ui.fps_label.setText('{:05.2f} fps'.format(self.fps))
+        if self.timings_label.isVisible() and self.time_now - self.time_timings_label > 0.5:
+            self.update_timings_label()
+
+    def update_timings_label(self):
+        """ Mean and 95th percentile (ms) of the main phases next to fps_label, every phase and equation in its tooltip """
+        self.time_timings_label = self.time_now
+        summary = self.timings.summary()
+        main_phases = [phase for phase in summary.keys() if not phase.startswith('eq_') and not phase.startswith('diff_eq_')]
+        self.timings_label.setText(' | '.join([f"{phase} {1e3*summary[phase]['mean_s']:.2f}/{1e3*summary[phase]['p95_s']:.2f}" for phase in main_phases])+' ms ')
+        lines = ['phase: mean / p50 / p95 / max (ms), count']
+        lines += [f"{phase}: {1e3*stats['mean_s']:.3f} / {1e3*stats['p50_s']:.3f} / {1e3*stats['p95_s']:.3f} / {1e3*stats['max_s']:.3f}, {stats['count']}" for (phase,stats) in summary.items()]
+        self.timings_label.setToolTip('\n'.join(lines))
 
     def update_checkbox_kernel(self):
         for kernel in self.kernels.keys():
             if self.kernels[kernel]['checkbox'].isChecked():
-                self.kernel = kernel
+                self.queue_request(self.set_kernel,kernel)
+                if not self.accepts_kernel(kernel): self.kernels[self.kernel]['checkbox'].setChecked(True)  # refused: the current kernel stays checked
 
     def update_checkbox_variable(self,variable):
         # Is it an variable/observable or param
@@ -924,9 +1039,10 @@ class MainWindow(TemplateBaseClass,Modele):
         types = [complex,float,int]
         try:
             value = self.variables[variable]['lineedit'].text().replace(' ','')
+            if variable in self.fields and value.startswith('field'): return  # shape shown, not a value (a number sets a uniform field)
             for typ in types:
-                if isinstance(self.variables[variable]['value'][-1],typ):
-                    self.variables[variable]['value'][-1] = typ(value)
+                if isinstance(np.ravel(self.variables[variable]['value'][-1])[0],typ):  # (first member in ensemble mode)
+                    self.queue_request(self.set_variable_value,variable,typ(value))
         except ValueError:
             print(f'Input {value if len(value) else "None"} not a {typ.__name__} data type')
 
@@ -934,7 +1050,7 @@ class MainWindow(TemplateBaseClass,Modele):
     def update_spinbox_params(self,param):
         value = np.round(self.params[param]['slider'].value()/self.params[param]['slider_conversion_factor'],self.spinbox_precision)
         if value <= self.params[param]['max'] and value >= self.params[param]['min']:
-            self.params[param]['value'][-1] = value  # For simona
+            self.queue_request(self.set_param_value,param,value)  # For simona
             self.params[param]['spinbox'].setValue(value)
 
     def update_slider_params(self,param):
@@ -942,19 +1058,22 @@ class MainWindow(TemplateBaseClass,Modele):
         if isinstance(self.params[param]['step'],int):
             value = int(value)
         if value <= self.params[param]['max']*self.params[param]['slider_conversion_factor'] and value >= self.params[param]['min']*self.params[param]['slider_conversion_factor']:
-            self.params[param]['value'][-1] = value/self.params[param]['slider_conversion_factor']
+            self.queue_request(self.set_param_value,param,value/self.params[param]['slider_conversion_factor'])
             self.params[param]['slider'].setValue(value)
-        # Update observables and plots (works also for spinbox here as setValue calls this func.)
-        self.update_observables()
-        self.update_plots()
+        # Update observables and plots (works also for spinbox here as setValue calls this func.); the worker does it itself
+        if not self.worker:
+            self.update_observables(0)
+            self.update_plots()
 
     def update_nstep_slider(self):
         value = self.ui.nstep_slider.value()
         self.nstep_update_plot = value
+        self.nstep_scheduled   = float(value)  # the scheduler (if any) restarts from the chosen value
         self.ui.nstep_spinbox.setValue(value)
     def update_nstep_spinbox(self):
         value = self.ui.nstep_spinbox.value()
         self.nstep_update_plot = value
+        self.nstep_scheduled   = float(value)
         self.ui.nstep_slider.setValue(value)
     def change_ICs_variable(self):
         for variable in self.variables.keys():
@@ -984,10 +1103,41 @@ class ScrollMessageBox(QtWidgets.QMessageBox):
 
 
 
+# Worker running the calculations out of the Qt main thread
+class SimulationWorker(QtCore.QThread):
+
+    """ Computes blocks of nstep_update_plot steps of the window's model and publishes snapshots of the arrays into its double buffer (window.snapshots). Requests queued from the GUI (params, ICs, kernel) are applied between two blocks. With a target fps, a block is computed once the GUI took the previous snapshot """
+
+    def __init__(self,window):
+        QtCore.QThread.__init__(self)
+        self.window = window
+
+    def run(self):
+        with self.window.computation_lock:
+            self.window.snapshots.write(self.window.plot_values())  # initial state
+        while not self.isInterruptionRequested():
+            streaming = self.window.streaming
+            waiting   = streaming and self.window.target_fps and self.window.snapshots.pending()  # with a target fps, one block per frame rendered by the GUI (which schedules nstep_update_plot)
+            with self.window.computation_lock:
+                nb_requests = self.window.apply_queued_requests()
+                if streaming and not waiting:
+                    self.window.compute(self.window.nstep_update_plot,in_worker=True)
+                elif not streaming and nb_requests:  # paused: only show the effect of the modifications
+                    self.window.update_observables(0)
+                    self.window.snapshots.write(self.window.plot_values())
+            self.msleep(1 if streaming else 10)  # let the GUI thread acquire the computation lock
+
+
+
+
 ## Start Qt event loop unless running in interactive mode or using pyside.
 if __name__ == '__main__':
     ### BEGIN Start the window ###
     win = MainWindow()
+    if win.arguments.profile_startup:
+        QtWidgets.QApplication.instance().processEvents()
+        startup_phase('window setup and first paint')
+        print_startup_profile()
 
     if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
         QtWidgets.QApplication.instance().exec()
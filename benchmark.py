@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+# Throughput benchmarks of GUIDE, results written as JSON to track regressions between releases:
+#     python benchmark.py [--quick] [--groups kernels array_size ...] [--out benchmark.json] [--compare previous.json]
+# Fixtures are model_input.py and synthetic models (linear chains of N coupled variables) built in memory.
+# GUI benchmarks (update_plots frame time per dock type) run with the offscreen Qt platform.
+
+import os
+import sys
+import json
+import time
+import types
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from time import perf_counter
+from modele import Modele, parse_arguments, save_columns
+from recorder import Recorder
+
+accepted_groups = ['kernels','array_size','model_size','observables','plots','recording']
+windows = []  # GUI windows of the plots benchmark, kept until the end of the process
+
+
+def synthetic_model(nb_variables=2,nb_observables=2,nb_params=2,array_size=10000,dock_type='plot1D'):
+
+    """ Input module (registered in sys.modules to be loaded with -f) of a linear chain of nb_variables coupled variables, with nb_observables pointwise observables (squares of variables) and nb_params params. dock_type: 'plot1D' (all variables), 'plot2D' (pairs of consecutive variables) or 'image' (a calculation_size observable folding x0) """
+
+    name   = f'benchmark_model_{nb_variables}_{nb_observables}_{nb_params}_{array_size}_{dock_type}'
+    module = types.ModuleType(name)
+    module.window_params = {'kernel': 'RK4','block_integration': False,'nstep_update_plot': 100, 'step_size': 0.01, 'array_size': array_size, 'streaming': True, 'record_state':False, 'nstep_record':1, 'window_size':(1000,800), 'invert_order_obs_var': True,'theme':'dark'}
+
+    def load_docks():
+        return {dock_type: {'type': dock_type, 'position': 'left', 'size': (500,500)}}
+    def load_variables():
+        variables = {}
+        for i in range(nb_variables):
+            variables[f'x{i}'] = {'type': np.float64, 'init_cond': 1./(i+1),
+                                  'equation': lambda ui,variables,params,i=i: -variables[f'x{i}'] + params[f'p{i%nb_params}']*variables[f'x{(i+1)%nb_variables}']}
+            if   dock_type == 'plot1D': variables[f'x{i}']['dock'] = ['plot1D']
+            elif dock_type == 'plot2D': variables[f'x{i}']['dock'] = [{'plot2D':[f'x{i}',f'x{(i+1)%nb_variables}']}]
+            else:                       variables[f'x{i}']['dock'] = []
+        return variables
+    def load_observables():
+        observables = {}
+        for i in range(nb_observables):
+            observables[f'o{i}'] = {'type': np.float64, 'init_cond': 0., 'pointwise': True, 'dock': ['plot1D'] if dock_type == 'plot1D' else [],
+                                    'equation': lambda ui,variables,params,i=i: variables[f'x{i%nb_variables}']**2}
+        if dock_type == 'image':
+            observables['folded_x0'] = {'type': np.float64, 'init_cond': 0., 'calculation_size': True, 'dock': ['image'],
+                                        'equation': lambda ui,variables,params: np.reshape(variables['x0'][-(array_size//100)*100:],(array_size//100,100))}
+        return observables
+    def load_params():
+        return {f'p{i}': {'init_cond': 0.5, 'min': 0., 'max': 1., 'step': 0.01} for i in range(nb_params)}
+    def keyboard_keys():
+        return {}
+
+    module.load_docks,module.load_variables,module.load_observables,module.load_params,module.keyboard_keys = load_docks,load_variables,load_observables,load_params,keyboard_keys
+    sys.modules[name] = module
+    return name
+
+def load_modele(module_name=None,**window_params):
+    """ Modele of an input module (model_input.py by default) with some window_params overwritten """
+    modele = Modele(parse_arguments([] if module_name is None else ['-f',module_name]))
+    for (key,value) in window_params.items():
+        if key == 'kernel': modele.set_kernel(value)
+        else:               setattr(modele,key,value)
+    return modele
+
+def steps_per_second(modele,nstep):
+    """ Throughput of modele.advance (simulator, observables, time stamp and params; no plots) """
+    modele.advance(min(nstep,modele.array_size)//10+1)  # warm-up
+    time_start = perf_counter()
+    nstep_done = 0
+    while nstep_done < nstep:
+        block_size  = min(modele.array_size,nstep-nstep_done)
+        modele.advance(block_size)
+        nstep_done += block_size
+    return nstep/(perf_counter()-time_start)
+
+def time_per_call(function,min_duration=0.2):
+    """ Mean duration of function() over calls repeated for at least min_duration seconds """
+    function()
+    nb_calls   = 0
+    time_start = perf_counter()
+    while perf_counter()-time_start < min_duration:
+        function()
+        nb_calls += 1
+    return (perf_counter()-time_start)/nb_calls
+
+
+### BEGIN benchmarks ###
+def benchmark_kernels(quick):
+    """ Steps/s of each kernel on model_input.py (packed kernels also with block integration) """
+    nstep   = 2000 if quick else 20000
+    results = []
+    for kernel in ['euler','RK4','euler_packed','RK4_packed','DP45']:
+        for block_integration in ([False,True] if kernel.endswith('packed') or kernel == 'DP45' else [False]):
+            modele = load_modele(kernel=kernel,block_integration=block_integration)
+            results.append({'name':kernel,'params':{'block_integration':block_integration,'model':'model_input'},'metrics':{'steps_per_s':steps_per_second(modele,nstep)}})
+    return results
+
+def benchmark_array_size(quick):
+    """ Steps/s as a function of the history length (array_size) """
+    nstep   = 2000 if quick else 20000
+    results = []
+    for array_size in ([10**3,10**4,10**5] if quick else [10**3,10**4,10**5,10**6]):
+        for (kernel,block_integration) in [('RK4',False),('RK4_packed',True)]:
+            modele = load_modele(synthetic_model(2,2,2,array_size),kernel=kernel,block_integration=block_integration)
+            results.append({'name':kernel,'params':{'array_size':array_size,'block_integration':block_integration},'metrics':{'steps_per_s':steps_per_second(modele,nstep)}})
+    return results
+
+def benchmark_model_size(quick):
+    """ Steps/s as a function of the number of variables, observables and params """
+    nstep   = 500 if quick else 5000
+    results = []
+    sizes   = [1,10,50] if quick else [1,10,50,200]
+    for (nb_variables,nb_observables,nb_params) in [(n,0,1) for n in sizes] + [(2,n,1) for n in sizes] + [(2,0,n) for n in sizes]:
+        for (kernel,block_integration) in [('RK4',False),('RK4_packed',True)]:
+            modele = load_modele(synthetic_model(nb_variables,nb_observables,nb_params),kernel=kernel,block_integration=block_integration)
+            results.append({'name':kernel,'params':{'nb_variables':nb_variables,'nb_observables':nb_observables,'nb_params':nb_params,'block_integration':block_integration},'metrics':{'steps_per_s':steps_per_second(modele,nstep)}})
+    return results
+
+def benchmark_observables(quick):
+    """ Duration of update_observables for one new sample and for a block of nstep_update_plot samples """
+    results = []
+    for (name,module_name) in [('model_input',None)] + [(f'synthetic_{n}',synthetic_model(n,n,1)) for n in ([2,50] if quick else [2,50,200])]:
+        modele = load_modele(module_name)
+        modele.advance(100)
+        for nstep in [1,modele.nstep_update_plot]:
+            results.append({'name':name,'params':{'nstep':nstep},'metrics':{'update_observables_s':time_per_call(lambda: modele.update_observables(nstep))}})
+        results.append({'name':name,'params':{'lazy':True},'metrics':{'evaluate_observables_s':time_per_call(lambda: (modele.advance(1),modele.evaluate_observables()))}})
+    return results
+
+def benchmark_plots(quick):
+    """ Frame time (update_plots + painting) per dock type, offscreen Qt """
+    os.environ.setdefault('QT_QPA_PLATFORM','offscreen')
+    argv = sys.argv
+    try:
+        sys.argv = ['GUIDE.py']  # MainWindow parses the command line
+        import GUIDE
+        from pyqtgraph.Qt import QtWidgets
+    finally:
+        sys.argv = argv
+    results = []
+    for array_size in ([10**4,10**5] if quick else [10**4,10**5,10**6]):
+        for dock_type in ['plot1D','plot2D','image']:
+            module_name = synthetic_model(4,4 if dock_type == 'plot1D' else 0,1,array_size,dock_type)
+            try:
+                sys.argv = ['GUIDE.py','-f',module_name]
+                window = GUIDE.MainWindow()
+            finally:
+                sys.argv = argv
+            window.timer.stop()
+            window.show()
+            window.advance(array_size)
+            def frame():
+                window.advance(window.nstep_update_plot)
+                window.update_plots()
+                QtWidgets.QApplication.processEvents()
+            frame_time = time_per_call(frame,0.5)
+            results.append({'name':dock_type,'params':{'array_size':array_size},'metrics':{'frame_time_s':frame_time,'fps':1./frame_time}})
+            window.hide()
+            windows.append(window)  # destroying pyqtgraph windows before the end of the process may crash the garbage collector
+    return results
+
+def benchmark_recording(quick):
+    """ Rows/s of the streaming recorder (step by step and by blocks) and of the export formats """
+    nb_rows = 20000 if quick else 200000
+    modele  = load_modele()
+    modele.advance(1000)
+    traces  = modele.traces_to_save()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        recorder   = Recorder(os.path.join(directory,'record'),{key:value.dtype for (key,value) in traces.items()},chunk_size=10000)
+        row        = {key:value[-1] for (key,value) in traces.items()}
+        time_start = perf_counter()
+        for i in range(nb_rows): recorder.append_row(row)
+        recorder.close()
+        results.append({'name':'recorder','params':{'mode':'append_row','nb_columns':len(traces)},'metrics':{'rows_per_s':nb_rows/(perf_counter()-time_start)}})
+
+        recorder   = Recorder(os.path.join(directory,'record'),{key:value.dtype for (key,value) in traces.items()},chunk_size=10000)
+        block      = {key:value[-100:] for (key,value) in traces.items()}
+        time_start = perf_counter()
+        for i in range(nb_rows//100): recorder.extend(block)
+        recorder.close()
+        results.append({'name':'recorder','params':{'mode':'extend','nb_columns':len(traces)},'metrics':{'rows_per_s':nb_rows/(perf_counter()-time_start)}})
+
+        for extension in ['npz','csv','parquet','xlsx']:
+            nb_rows_export = modele.array_size if extension != 'xlsx' or not quick else 1000
+            columns    = {key:value[-nb_rows_export:] for (key,value) in traces.items()}
+            filename   = os.path.join(directory,f'export.{extension}')
+            time_start = perf_counter()
+            save_columns(filename,columns)
+            if os.path.exists(filename):
+                results.append({'name':'export','params':{'format':extension,'nb_columns':len(traces)},'metrics':{'rows_per_s':nb_rows_export/(perf_counter()-time_start)}})
+    return results
+### END benchmarks ###
+
+
+def metadata():
+    """ Environment of the benchmark run """
+    try:    commit = subprocess.run(['git','rev-parse','HEAD'],capture_output=True,text=True,cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: commit = None
+    return {'date':time.strftime('%Y-%m-%dT%H:%M:%S'),'commit':commit,'python':platform.python_version(),'numpy':np.__version__,
+            'platform':platform.platform(),'processor':platform.processor(),'cpu_count':os.cpu_count()}
+
+def compare(results,previous_results):
+    """ Print the ratio of each metric to the one of a previous run (same group, name and params) """
+    previous = {(result['group'],result['name'],json.dumps(result['params'],sort_keys=True)):result['metrics'] for result in previous_results}
+    for result in results:
+        key = (result['group'],result['name'],json.dumps(result['params'],sort_keys=True))
+        if key not in previous: continue
+        for (metric,value) in result['metrics'].items():
+            if metric in previous[key] and previous[key][metric]:
+                print(f"{result['group']:12s} {result['name']:14s} {json.dumps(result['params'],sort_keys=True):80s} {metric:22s} x{value/previous[key][metric]:.2f}")
+
+def run_benchmarks(groups=None,quick=False):
+    """ Dict {'metadata', 'results'} of the benchmark groups (all by default). Each result is {'group', 'name', 'params', 'metrics'} """
+    if groups is None: groups = accepted_groups
+    results = []
+    for group in groups:
+        assert group in accepted_groups, f"Benchmark group '{group}' not understood. Must be in {accepted_groups}"
+        time_start = perf_counter()
+        for result in globals()[f'benchmark_{group}'](quick):
+            results.append(dict({'group':group},**result))
+        print(f'Benchmark "{group}" done in {perf_counter()-time_start:.1f} s')
+    return {'metadata':metadata(),'results':results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Throughput benchmarks of GUIDE (JSON output)')
+    parser.add_argument('--groups', nargs='+', default=None, help=f'benchmark groups among {accepted_groups} (default: all)')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes and fewer steps')
+    parser.add_argument('--out', default='benchmark.json', help='JSON file of the results')
+    parser.add_argument('--compare', default=None, help='JSON file of a previous run to compare with')
+    arguments = parser.parse_args()
+
+    benchmark = run_benchmarks(arguments.groups,arguments.quick)
+    with open(arguments.out,'w') as json_file:
+        json.dump(benchmark,json_file,indent=1,default=float)
+    print(f'File "{arguments.out}" saved')
+    if arguments.compare is not None:
+        with open(arguments.compare) as json_file:
+            compare(benchmark['results'],json.load(json_file)['results'])
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+# Shared fixtures of the tests: python -m pytest
+
+import textwrap
+import pytest
+from modele import Modele, parse_arguments
+
+
+@pytest.fixture
+def model_from_source(tmp_path,monkeypatch):
+    """ load(name,source): Modele of the input file name.py written from source (distinct names for distinct sources, modules are imported once) """
+    monkeypatch.syspath_prepend(str(tmp_path))
+    def load(name,source,argv=()):
+        (tmp_path/f'{name}.py').write_text(textwrap.dedent(source))
+        return Modele(parse_arguments(['-f',name]+list(argv)))
+    return load
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Steady states and numerical continuation of the model of an input file, directly on the diff_eq_* right-hand sides (no time stepping):
+# Newton solves of f(y,p) = 0, pseudo-arclength continuation in a param, stability from the eigenvalues of the Jacobian, fold and Hopf detection.
+# Complex variables are handled as pairs of real unknowns (see Modele.real_derivatives), the Jacobian comes from jac_* or finite differences.
+# python continuation.py -f model_input.py --param f=10 --out branch.npz    (from the initial conditions and param values, up to f=10)
+# In the GUI: ui.continuation('f',10.) from a user key, plotted in the plot2D docks with the key 'branch': ['f','mod_A']
+
+import argparse
+import numpy as np
+from modele import Modele, parse_arguments, save_columns
+
+
+def check_model(modele,param):
+
+    """ Continuation needs a system of ODEs and a continuous param """
+
+    assert not modele.fields and modele.ensemble_size == 1 and not modele.delay_buffers, "Continuation needs a system of ODEs (no fields, ensembles nor delayed variables)"
+    assert param in modele.params.keys(), f"Param '{param}' not understood. Must be in {list(modele.params.keys())}"
+    assert not isinstance(modele.params[param]['step'],int), f"Param '{param}' is an integer, it cannot be continued"
+
+def residual(modele,y,params):
+
+    """ Right-hand sides of the equations at y (real view of the packed state vector) """
+
+    return modele.real_derivatives(y,params,np.empty_like(y))
+
+def param_derivative(modele,y,params,param,f):
+
+    """ Derivative of the right-hand sides with respect to param (forward finite difference), f: right-hand sides at y """
+
+    step    = np.sqrt(np.finfo(float).eps)*max(abs(params[param]),1.)
+    shifted = dict(params)
+    shifted[param] = params[param] + step
+    return (residual(modele,y,shifted) - f)/step
+
+def steady_state(modele,params=None,y=None,tol=1e-10,max_iter=50):
+
+    """ Steady state of the model by damped Newton iterations (the step is halved until the residual decreases) from y (real view of the packed state vector, default: current state) for params (default: current ones). Returns (y, converged) """
+
+    if params is None: params = dict(modele.last_params)
+    if y is None:
+        modele.pack_state()
+        y = modele.state.view(np.float64).copy()
+    f = residual(modele,y,params)
+    for iteration in range(max_iter):
+        try:    dy = np.linalg.solve(modele.evaluate_jacobian(y,params,f),-f)
+        except np.linalg.LinAlgError: return y,False
+        damping = 1.
+        while damping > 1e-4:
+            f_new = residual(modele,y+damping*dy,params)
+            if np.linalg.norm(f_new) < np.linalg.norm(f) or (damping == 1. and np.max(np.abs(dy)) < tol*(1.+np.max(np.abs(y)))): break
+            damping /= 2.
+        y,f = y + damping*dy,f_new
+        if np.max(np.abs(damping*dy)) < tol*(1.+np.max(np.abs(y))): return y,True
+    return y,False
+
+def corrector(modele,param,u,u_previous,tangent,ds,params,tol,max_iter=10):
+
+    """ Newton iterations on u = (y, param) for f(y,param) = 0 and the arclength condition tangent.(u - u_previous) = ds. Returns (u, converged, number of iterations) """
+
+    for iteration in range(max_iter):
+        params[param] = u[-1]
+        f      = residual(modele,u[:-1],params)
+        system = np.vstack((np.column_stack((modele.evaluate_jacobian(u[:-1],params,f),param_derivative(modele,u[:-1],params,param,f))),tangent))
+        try:    du = np.linalg.solve(system,-np.append(f,np.dot(tangent,u-u_previous)-ds))
+        except np.linalg.LinAlgError: return u,False,iteration
+        u = u + du
+        if not np.all(np.isfinite(u)): return u,False,iteration
+        if np.max(np.abs(du)) < tol*(1.+np.max(np.abs(u))): return u,True,iteration+1
+    return u,False,max_iter
+
+def continue_branch(modele,param,stop,start=None,ds=0.01,ds_min=1e-6,ds_max=0.1,max_points=1000,tol=1e-10):
+
+    """ Branch of steady states followed by pseudo-arclength continuation in param towards stop, from the steady state reached by Newton iterations from the current state (or the initial conditions if they fail) at the current value of param (or start); the other params keep their current values. The step ds (arclength) grows up to ds_max where the corrector converges quickly and shrinks down to ds_min where it fails, the last point is on stop (or on start if the branch turns back past it). Returns (branch, bifurcations): branch is {column:array} with the param, the variables, the pointwise observables, 'stable', 'max_real_eigenvalue' (largest real part of the eigenvalues of the Jacobian) and 'bifurcation' (type or ''), bifurcations a list of {'type', 'index' (between points index-1 and index), param, 'frequency' (Hopf)} """
+
+    check_model(modele,param)
+    params = dict(modele.last_params)
+    if start is not None: params[param] = start
+    y,converged = steady_state(modele,params,tol=tol)
+    if not converged:  # e.g. oscillating current state: from the initial conditions
+        y,converged = steady_state(modele,params,np.array([modele.variables[variable]['init_cond'] for variable in modele.state_indices.keys()],dtype=modele.state.dtype).view(np.float64),tol=tol)
+    assert converged, f"No steady state found from the current state at {param}={params[param]}"
+    lower,upper = sorted([params[param],stop])
+
+    # Unknowns u = (y, param); the tangent is the kernel of [J_y J_param], oriented as the previous one
+    u       = np.append(y,params[param])
+    tangent = np.zeros_like(u)
+    tangent[-1] = 1. if stop >= params[param] else -1.
+    points,eigenvalues,param_tangents = [],[],[]
+    at_bound = False
+    while len(points) < max_points:
+        params[param] = u[-1]
+        f        = residual(modele,u[:-1],params)
+        jacobian = modele.evaluate_jacobian(u[:-1],params,f)
+        extended = np.vstack((np.column_stack((jacobian,param_derivative(modele,u[:-1],params,param,f))),tangent))
+        try:    tangent = np.linalg.solve(extended,np.append(np.zeros(len(f)),1.))
+        except np.linalg.LinAlgError:
+            print(f"WARNING: singular extended Jacobian at {param}={u[-1]}, continuation stopped")
+            break
+        tangent /= np.linalg.norm(tangent)
+        points.append(u)
+        eigenvalues.append(np.linalg.eigvals(jacobian))
+        param_tangents.append(tangent[-1])
+        if at_bound: break
+
+        # Predictor along the tangent, corrector on the branch (smaller step until it converges)
+        converged = False
+        while not converged and ds >= ds_min:
+            u_new,converged,nb_iterations = corrector(modele,param,u+ds*tangent,u,tangent,ds,params,tol)
+            if not converged: ds /= 2.
+        if not converged:
+            print(f"WARNING: continuation stopped at {param}={u[-1]} (corrector not converging with ds >= {ds_min})")
+            break
+        if not lower <= u_new[-1] <= upper:  # last point on the bound crossed: steady state at the bound from the interpolation of the last step
+            bound    = upper if u_new[-1] > upper else lower
+            params[param] = bound
+            y,converged   = steady_state(modele,params,u[:-1] + (bound-u[-1])/(u_new[-1]-u[-1])*(u_new[:-1]-u[:-1]),tol=tol)
+            if not converged:
+                print(f"WARNING: no steady state found at {param}={bound}, continuation stopped at {param}={u[-1]}")
+                break
+            u_new,at_bound = np.append(y,bound),True
+        u = u_new
+        if nb_iterations <= 3: ds = min(1.5*ds,ds_max)
+
+    points = np.array(points)
+    branch = {param:points[:,-1]}
+    states = np.ascontiguousarray(points[:,:-1]).view(modele.state.dtype)
+    for (variable,index,real_valued) in modele.state_packing:
+        branch[variable] = states[:,index].real if real_valued else states[:,index]
+    for variable in modele.variables.keys():
+        if modele.variables[variable]['observable'] and modele.variables[variable]['pointwise']:
+            branch[variable] = np.broadcast_to(modele.variables[variable]['equation'](modele,branch,modele.last_params),(len(points),))
+    branch['max_real_eigenvalue'] = np.array([np.max(values.real) for values in eigenvalues])
+    branch['stable']              = branch['max_real_eigenvalue'] < 0.
+    bifurcations = detect_bifurcations(branch[param],eigenvalues,param_tangents,param)
+    branch['bifurcation'] = np.array(['']*len(points),dtype='<U12')
+    for bifurcation in bifurcations:
+        branch['bifurcation'][bifurcation['index']] = bifurcation['type']
+    return branch,bifurcations
+
+def detect_bifurcations(param_values,eigenvalues,param_tangents,param):
+
+    """ Bifurcations between consecutive points of a branch from the sign changes of test functions, located by linear interpolation: fold (the param goes back), Hopf (a complex pair of eigenvalues crosses the imaginary axis), branch point (a real eigenvalue crosses zero away from folds) """
+
+    def largest_real_part(values,complex_pair):
+        selected = values[(np.abs(values.imag) > 1e-10) == complex_pair]
+        return selected[np.argmax(selected.real)] if len(selected) else None
+
+    bifurcations = []
+    for index in range(1,len(param_values)):
+        tests = []
+        if param_tangents[index-1]*param_tangents[index] < 0.:
+            tests.append(('fold',param_tangents[index-1],param_tangents[index],None))
+        else:
+            before,after = largest_real_part(eigenvalues[index-1],False),largest_real_part(eigenvalues[index],False)
+            if before is not None and after is not None and before.real*after.real < 0.:
+                tests.append(('branch_point',before.real,after.real,None))
+        before,after = largest_real_part(eigenvalues[index-1],True),largest_real_part(eigenvalues[index],True)
+        if before is not None and after is not None and before.real*after.real < 0.:
+            tests.append(('hopf',before.real,after.real,abs(after.imag)))
+        for (typ,test_before,test_after,frequency) in tests:
+            fraction = test_before/(test_before-test_after)
+            bifurcation = {'type':typ,'index':index,param:param_values[index-1] + fraction*(param_values[index]-param_values[index-1])}
+            if frequency is not None: bifurcation['frequency'] = frequency
+            bifurcations.append(bifurcation)
+    return bifurcations
+
+def print_bifurcations(bifurcations,param):
+    for bifurcation in bifurcations:
+        print(f"{bifurcation['type']:>12} at {param} = {bifurcation[param]:.6g}" + (f" (frequency {bifurcation['frequency']:.6g})" if 'frequency' in bifurcation else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Steady states of a GUIDE model followed in a param by pseudo-arclength continuation (no GUI)')
+    parser.add_argument('-f', dest='filename', default=None, help='input file to load the model from (default: model_input.py)')
+    parser.add_argument('--param', required=True, help='continued param as name=stop (from its initial value) or name=start:stop')
+    parser.add_argument('--ds', type=float, default=0.01, help='initial arclength step')
+    parser.add_argument('--ds-max', type=float, default=0.1, help='largest arclength step')
+    parser.add_argument('--max-points', type=int, default=1000, help='largest number of points of the branch')
+    parser.add_argument('--restore', default=None, help='checkpoint directory whose state starts the Newton iterations (default: initial conditions)')
+    parser.add_argument('--out', default=None, help='file where the branch is saved (.npz, .csv, .parquet or .xlsx)')
+    arguments = parser.parse_args()
+
+    modele = Modele(parse_arguments([] if arguments.filename is None else ['-f',arguments.filename]))
+    if arguments.restore is not None: modele.restore_checkpoint(arguments.restore)
+    param,values = arguments.param.split('=')
+    start,stop   = [float(value) for value in values.split(':')] if ':' in values else (None,float(values))
+    branch,bifurcations = continue_branch(modele,param,stop,start,arguments.ds,ds_max=arguments.ds_max,max_points=arguments.max_points)
+    print(f"{len(branch[param])} points, {param} from {branch[param][0]:.6g} to {branch[param][-1]:.6g}, {len(bifurcations)} bifurcations")
+    print_bifurcations(bifurcations,param)
+    if arguments.out is not None: save_columns(arguments.out,branch)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Level-of-detail for plot1D curves: a curve only receives about 2 points per pixel of its visible x range.
+# Min/max of blocks of 2**level samples are kept in a pyramid updated incrementally as new samples arrive,
+# so that decimating a view costs O(number of points drawn) instead of O(array_size).
+
+import numpy as np
+
+
+### BEGIN MinMaxPyramid class ###
+class MinMaxPyramid():
+
+    """ Min and max of the blocks of 2**level consecutive samples (level = 1..nb_levels) of a RingBuffer history. Blocks are indexed by absolute sample index (history.count) and stored in rings, only blocks touched by new samples are recomputed """
+
+    def __init__(self,size):
+        self.size      = size
+        self.nb_levels = max(int(np.log2(size)),1)
+        self.mins      = [None] + [np.zeros(size//2**level+2) for level in range(1,self.nb_levels+1)]
+        self.maxs      = [None] + [np.zeros(size//2**level+2) for level in range(1,self.nb_levels+1)]
+        self.count     = None   # history.count, history.revision and history.version at the last update
+        self.revision  = None
+        self.version   = None
+
+    def update(self,array,count,revision,version=None):
+        """ array: chronologically ordered history whose last sample has the absolute index count-1. Everything is recomputed after a full rewrite of the history (revision changed), the blocks of the last sample otherwise (new version with the same count after a set_last) """
+        first_sample = count - self.size
+        if self.count is None or revision != self.revision or count - self.count >= self.size:
+            start = first_sample
+        else:
+            start = max(self.count-1,first_sample)  # last sample may have been overwritten since (set_last)
+        self.count    = count
+        self.revision = revision
+        self.version  = version
+
+        for level in range(1,self.nb_levels+1):
+            block       = 2**level
+            first_block = max(start//block,-(-first_sample//block))  # only blocks starting inside the history
+            last_block  = (count-1)//block
+            if first_block > last_block: continue
+            left  = 2*np.arange(first_block,last_block+1)
+            right = np.minimum(left+1,(count-1)//(block//2))  # last block may have a single child
+            if level == 1:
+                mins_left,maxs_left   = array[left-first_sample],array[left-first_sample]
+                mins_right,maxs_right = array[right-first_sample],array[right-first_sample]
+            else:
+                ring_size = len(self.mins[level-1])
+                mins_left,maxs_left   = self.mins[level-1][left%ring_size],self.maxs[level-1][left%ring_size]
+                mins_right,maxs_right = self.mins[level-1][right%ring_size],self.maxs[level-1][right%ring_size]
+            ring = np.arange(first_block,last_block+1) % len(self.mins[level])
+            self.mins[level][ring] = np.minimum(mins_left,mins_right)
+            self.maxs[level][ring] = np.maximum(maxs_left,maxs_right)
+
+    def decimate(self,array,index_min,index_max,nb_points):
+        """ (x, y) of array[index_min:index_max] reduced to about nb_points points: min and max of bins of 2**level samples (computed from the samples for the incomplete bins at both ends). Must be called after update """
+        index_min,index_max = max(int(index_min),0),min(int(index_max),len(array))
+        if index_max - index_min <= nb_points:
+            return np.arange(index_min,index_max),array[index_min:index_max]
+
+        level = int(np.clip(np.ceil(np.log2(2.*(index_max-index_min)/nb_points)),1,self.nb_levels))
+        block = 2**level
+        first_sample = self.count - self.size
+        first_block  = -(-(index_min+first_sample)//block)      # complete blocks inside the range
+        last_block   = (index_max+first_sample)//block - 1
+        if first_block > last_block:
+            return partial_bin(array,index_min,index_max)
+
+        blocks = np.arange(first_block,last_block+1)
+        ring   = blocks % len(self.mins[level])
+        x_blocks = np.repeat(blocks*block-first_sample+block/2.,2)
+        y_blocks = np.empty(2*len(blocks))
+        y_blocks[0::2] = self.mins[level][ring]
+        y_blocks[1::2] = self.maxs[level][ring]
+
+        x_left,y_left   = partial_bin(array,index_min,first_block*block-first_sample)
+        x_right,y_right = partial_bin(array,(last_block+1)*block-first_sample,index_max)
+        return np.concatenate((x_left,x_blocks,x_right)),np.concatenate((y_left,y_blocks,y_right))
+
+
+def partial_bin(array,start,end):
+    """ (x, y) min and max of array[start:end] at the middle of the bin, or its samples if there are less than 3 """
+    if end - start < 3:
+        return np.arange(start,end),array[start:end]
+    return np.array([(start+end-1)/2.]*2),np.array([array[start:end].min(),array[start:end].max()])
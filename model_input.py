@@ -5,14 +5,28 @@ import numpy as np
 
 # Main parameters for window
 #     'record_every': number of time_steps one between two consecutive record events
-
-window_params = {'kernel': 'RK4','nstep_update_plot': 100, 'step_size': 0.01, 'array_size': 10000, 'streaming': True, 'record_state':False, 'nstep_record':1, 'window_size':(1200,1000), 'invert_order_obs_var': True,'theme':'dark'}
+#     'kernel': integration algorithm (kernel_* of modele.py or of this file). Packed kernels ('RK4_packed', 'euler_packed', 'DP45', 'BDF2', ...) integrate systems of ODEs only: with fields or ensembles, a '*_packed' kernel is replaced by its dict version and 'DP45'/'BDF2' are refused
+#     'rtol', 'atol': relative and absolute tolerances of the adaptive kernel 'DP45' (internal steps are adapted, outputs stay on the 'step_size' grid) and of the Newton iterations of the implicit kernel 'BDF2'
+#     'worker': run the calculations in a background thread, the GUI only renders the latest computed arrays (params/ICs modifications are queued to the worker)
+#     'remote_docks': render every dock (except those linked by 'zoomOf') in its own subprocess, data handed over through shared memory; can be set per dock with the dock key 'remote'
+#     'record_chunk_size': number of recorded steps per chunk file written in the background while recording ("r" key), convert the record with: python recorder.py filename_record filename.xlsx
+#     'save_formats': formats of the traces written in the background with "s"/"r" keys, among 'npz' (fastest), 'csv', 'parquet' (needs pyarrow or fastparquet) and 'xlsx' (slow for long arrays)
+#     'ensemble_size': number of members (initial conditions/param sets) integrated at once by the dict kernels ('RK4', 'euler'); variables get a column per member ('init_cond' may give one value per member, params one value per member with the key 'ensemble'). Equations must broadcast over the members (NumPy operators)
+#     'ensemble_plot': members shown in plots, saves and "calculation_size" observables: 'mean', 'std', 'min', 'max' or a member index (other observables are computed per member)
+#     'target_fps': frame rate targeted by the GUI (e.g. 30): the steps per frame (nstep slider) are adapted automatically to the cost of the model and of the plots; None keeps a fixed 'nstep_update_plot'
+#     'nstep_field_history': number of time steps between two stored samples of the history of fields (variables/observables whose 'init_cond' is a 1D/2D array, see model_input_PDE.py); the last sample always holds the current value
+#     'block_integration': with a packed kernel, compute the nstep_update_plot steps in a single kernel call and update observables/records/plots once per block (observables returning a single value are then held constant over the block). Packed kernels are meant for it: step by step, they are only on par with their dict versions
+#     'noise_seed': seed of the white noise of the stochastic kernels ('euler_maruyama', 'heun' and their '_packed' versions, see the variable key "noise"), None: drawn at launch; the generator state is kept in checkpoints
+#     'noise_block_size': number of steps of noise drawn at once by the stochastic kernels
+# Opt-in for systems of ODEs: 'kernel': 'RK4_packed' with 'block_integration': True is the fastest setting (about twice the steps/s of 'RK4' step by step), at the cost of observables returning a single value held constant over each block
+
+window_params = {'kernel': 'RK4','nstep_update_plot': 100, 'step_size': 0.01, 'array_size': 10000, 'streaming': True, 'record_state':False, 'nstep_record':1, 'window_size':(1200,1000), 'invert_order_obs_var': True,'theme':'dark','rtol':1e-6,'atol':1e-9,'worker':False,'remote_docks':False,'record_chunk_size':10000,'save_formats':['npz','xlsx'],'ensemble_size':1,'ensemble_plot':'mean','target_fps':None}
 
 
 # Definition of the plot configuration
 def load_docks():
 
-    ''' Returns a dict to be used for plots declaration. Here, we use pyqtgraph docks. Each plot has a dictionnary as "value" with keys: "type" (accepted values: 'plot' and 'image'), "zoomOf" (key name of another dock), "position" (accepted values: 'bottom', 'top', 'left', 'right', 'above', or 'below'), "relativeTo" (optional, key name of another dock; position relative to another dock), size [(xlength,ylength); note that lengths arguments are only a suggestion; docks will still have to fill the entire dock area and obey the limits of their internal widgets], "labels" (dict of position:str), "title" (str). '''
+    ''' Returns a dict to be used for plots declaration. Here, we use pyqtgraph docks. Each plot has a dictionnary as "value" with keys: "type" (accepted values: 'plot' and 'image'), "zoomOf" (key name of another dock), "position" (accepted values: 'bottom', 'top', 'left', 'right', 'above', or 'below'), "relativeTo" (optional, key name of another dock; position relative to another dock), size [(xlength,ylength); note that lengths arguments are only a suggestion; docks will still have to fill the entire dock area and obey the limits of their internal widgets], "labels" (dict of position:str), "title" (str), "remote" (bool, optional default is window_params 'remote_docks'; render the dock in a separate process), "branch" ([param, variable/observable], 'plot2D' only; shows the branches of steady states computed with ui.continuation(param,stop): stable solid, unstable dashed, bifurcations as symbols). '''
 
     docks = {
     'plot1' : {'type': 'plot1D' , 'position': 'left' , 'size': (500,500), 'labels':{'bottom':'Time (arb. units)','left':'Intensity (arb. units)'}},
@@ -20,13 +34,14 @@ def load_docks():
     'plot2' : {'type': 'plot1D' , 'zoomOf': 'plot1'  , 'position': 'bottom', 'relativeTo': 'phase_space', 'size': (300,100)},
     'plot3' : {'type': 'plot1D', 'position': 'top','relativeTo':'phase_space', 'size': (300,300)},
     'custom_name' : {'type': 'image', 'position': 'above','relativeTo':'plot3', 'size': (300,300)},
+    'bifurcation' : {'type': 'plot2D', 'position': 'above','relativeTo':'phase_space', 'size': (300,300), 'branch': ['f','mod_A']},
     }
 
     return docks
 
 def load_variables():
 
-    ''' Returns a dict of the variables. Each variable is a dict with keys: "type" (e.g. np.float64, np.complex128), "init_cond" (type), "plot" (bool, optional default is True), "dock" (list of key name(s) of docks [str] as defined in load_dock function; optional; if not provided, will be ploted on every plot), "equation" (callable, optional default is diff_eq_{variable_name}), "help" (str, to be displayed in help message). Additionnal keys are added internally: "value", "observable" (False), "lineedit", "checkbox". '''
+    ''' Returns a dict of the variables. Each variable is a dict with keys: "type" (e.g. np.float64, np.complex128), "init_cond" (type, or array of window_params 'ensemble_size' values, or 1D/2D array for a field of a PDE; dict kernels only), "plot" (bool, optional default is True), "dock" (list of key name(s) of docks [str] as defined in load_dock function; optional; if not provided, will be ploted on every plot), "equation" (callable, optional default is diff_eq_{variable_name}), "max_delay" (float, optional; largest delay (time units) at which the variable is used through ui.delayed(variable,delay) in equations), "jacobian" (callable, optional default is jac_{variable}; partial derivatives of the equation of a real variable for the implicit kernel 'BDF2', finite differences otherwise), "linear" (callable(ui,params), fields only, optional default is linear_{variable}; linear part of the equation as a multiplier in Fourier space, integrated exactly by kernel 'splitstep', see model_input_PDE.py), "noise" (float or param name, optional; amplitude sigma of an additive white noise sigma dW added by the stochastic kernels 'euler_maruyama', 'heun' and their '_packed' versions, independent real and imaginary parts of total variance sigma^2 dt for complex variables), "help" (str, to be displayed in help message). Additionnal keys are added internally: "value", "history", "observable" (False), "lineedit", "checkbox". '''
 
     variables = {
     'A'  : {'type': np.complex128, 'init_cond': 0., 'plot': False, 'dock':['plot1','plot2'], 'help':'field in the first cavity'},
@@ -37,11 +52,11 @@ def load_variables():
 
 def load_observables():
 
-    ''' Returns a dict of the observables. Similar to variables, observables are added internally to the dictionnary of variables. Each observable is a dict with keys: "type" (e.g. np.float64, np.complex128), "init_cond" (type), "plot" (bool, optional default is True), "dock" (list of key name(s) of docks [str] as defined in load_dock function; optional; if not provided, will be ploted on every plot), "equation" (callable, optional default is eq_{variable_name}), "calculation_size" (bool, whether you want according variable to be only the size of what calculation returns; WARNING: those items won't be stored), "help" (str, to be displayed in help message). Additionnal keys are added internally: "value", "observable" (True), "lineedit", "checkbox". '''
+    ''' Returns a dict of the observables. Similar to variables, observables are added internally to the dictionnary of variables. Each observable is a dict with keys: "type" (e.g. np.float64, np.complex128), "init_cond" (type), "plot" (bool, optional default is True), "dock" (list of key name(s) of docks [str] as defined in load_dock function; optional; if not provided, will be ploted on every plot), "equation" (callable, optional default is eq_{variable_name}), "calculation_size" (bool, whether you want according variable to be only the size of what calculation returns; WARNING: those items won't be stored), "pointwise" (bool, optional default is False or True if the equation is decorated with modele.pointwise; element-wise equation only evaluated on the new samples of the variables), "depends_on" (list of names of variables/observables/params, optional; "calculation_size" observables are evaluated only when plotted and when one of their dependencies changed, dependencies are recorded at each evaluation if not provided), "help" (str, to be displayed in help message). Additionnal keys are added internally: "value", "history" (not for "calculation_size" ones), "observable" (True), "lineedit", "checkbox". '''
 
     observables = {
-    'mod_A' : {'type': np.float64, 'init_cond': 0., 'plot': True, 'dock':['plot1','plot2'], 'help':'modulus square of A'},
-    'mod_B' : {'type': np.float64, 'init_cond': 0., 'dock':['plot1','plot2','plot3']},
+    'mod_A' : {'type': np.float64, 'init_cond': 0., 'plot': True, 'dock':['plot1','plot2'], 'pointwise': True, 'help':'modulus square of A'},
+    'mod_B' : {'type': np.float64, 'init_cond': 0., 'dock':['plot1','plot2','plot3'], 'pointwise': True},
     'mod_A_2' : {'type': np.float64, 'init_cond': 0., 'plot': True, 'dock':[{'phase_space':['mod_A_2','mod_B_2']}],'calculation_size':True, 'help':'abs(A)**2 shorter to be plotted in phase space'},
     'mod_B_2' : {'type': np.float64, 'init_cond': 0. ,'dock':[{'phase_space':['mod_B_2','mod_A_2']}],'calculation_size':True},
     'mod_A_2D' : {'type': np.float64, 'init_cond': 0. ,'dock':['custom_name'],'calculation_size':True,'help':'variable to be used plotted in image'},
@@ -54,7 +69,7 @@ def load_observables():
 
 def load_params():
 
-    ''' Returns a dict of the parameters. Similarly to variables/observables, each parameter has a dictionnary as "value" with keys: "init_cond" (float), "min" (float), "max" (float), step (float or int; WARNING if int this parameter will be an integer), "help" (str, to be displayed in help message). Additionnal keys are added internally: "value", "spinbox", "slider", "slider_conversion_factor". '''
+    ''' Returns a dict of the parameters. Similarly to variables/observables, each parameter has a dictionnary as "value" with keys: "init_cond" (float), "min" (float), "max" (float), step (float or int; WARNING if int this parameter will be an integer), "ensemble" (array of window_params 'ensemble_size' values, optional; one value per member until the param is modified), "help" (str, to be displayed in help message). Additionnal keys are added internally: "value", "history", "spinbox", "slider", "slider_conversion_factor". '''
     params = {}
     params['delta'] = {'init_cond': -8., 'min': -10., 'max': 10., 'step': 0.01, 'help':'detuning parameter'}
     params['f']     = {'init_cond': 4.8, 'min': 0.  , 'max': 20., 'step': 0.01}
@@ -71,6 +86,9 @@ def load_params():
     return params
 
 # BEGIN Declaration of the equations. Automatically recognized pattern are "diff_eq_{variable}" (variables) and "eq_{observable}" (observables); with a name after the pattern that must match the variable/observable's one. Alternatively, you may use custom equation names. You should declare it in the variable/observable dictionnary with keyword "equation".
+# Stiff systems (e.g. large 'kappa'): the implicit kernel 'BDF2' stays stable with large step_size. It uses finite differences for the Jacobian, or "jac_{variable}" returning the dict {variable:partial derivative} of diff_eq_{variable} (real variables, missing ones are zero), e.g. def jac_x(ui,variables,params): return {'x':-params['mu'],'y':1.}
+# Delay differential equations: ui.delayed('A',params['tau']) is the value of A at a time tau (>= step_size) before the current kernel stage, interpolated from a history of the variable's "max_delay" (e.g. 'A': {..., 'max_delay': 10.})
+# Stochastic equations: the noise of a variable with the key "noise" is drawn and added by the stochastic kernels, diff_eq_{variable} only holds the deterministic part
 
 def diff_eq_A(ui,variables, params):
     return 1j*(params['delta']*params['tau'] + abs(variables['A'])**2)*variables['A'] - variables['A'] + (1j*params['kappa'] + params['gamma'])*params['tau']*variables['B'] + params['f']
@@ -97,10 +115,11 @@ def eq_mod_A_2D(ui,variables,params):
 
 
 def keyboard_keys():
-    """ Returns a dictionnary of user defined keys of form key:callable. System reserved keys: [" ", "q", "h", "s", "r", "i", "c"]. This must return an empty dict if no extra keys. """
+    """ Returns a dictionnary of user defined keys of form key:callable. System reserved keys: [" ", "q", "h", "s", "r", "i", "c", "k", "l", "p", "P"]. This must return an empty dict if no extra keys. """
 
     keys = {
     't': ramp_f,
+    'b': continuation_f,
     }
 
     return keys
@@ -117,8 +136,12 @@ def ramp_f(ui,variables,params):
     
     print('end scanning')
 
+def continuation_f(ui,variables,params):
+    # Steady states from f=min_scan to max_scan without time stepping (Newton iterations from the current state), shown in the 'bifurcation' dock
+    ui.continuation('f',params['max_scan'],start=params['min_scan'])
+
 def kernel_my_own(variables,params):
 
-    ''' Takes as arguments dicts of variables and params as {'key':value}. Returns a dict of the results with the same form. For now the function name must start with "kernel_" '''
+    ''' Takes as arguments dicts of variables and params as {'key':value}. Returns a dict of the results with the same form. For now the function name must start with "kernel_". Alternatively, kernels decorated with modele.packed_kernel take the 1D state vector of the variables (see ui.state_indices) and the params dict, and return the next state vector. Kernels also decorated with modele.stochastic_kernel add the noise of the variables (see ui.noise_terms and ui.packed_noise). '''
 
     pass
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from stencils import grid, wavenumbers
+
+# Spatially extended Kerr cavity (Lugiato-Lefever equation) on a periodic 1D grid: python GUIDE.py -f model_input_PDE.py
+# Fields are variables/observables whose init_cond is a 1D or 2D array (see model_input.py for the other keys)
+#     'nstep_field_history': steps between two rows of the (time, space) histories of the fields (array_size/nstep_field_history rows are kept)
+# The linear part (losses, detuning, dispersion) is declared in Fourier space (linear_psi) and integrated exactly by kernel 'splitstep', so that
+# the step is not limited by the stiff dispersion term; the other kernels add it to diff_eq_psi (e.g. 'RK4', stable for step_size < 0.01 here).
+# The packed kernels of systems of ODEs ('DP45', 'BDF2') are refused for fields: stiff fields are integrated with their stiff linear part in linear_psi
+
+nb_points = 256
+x,dx      = grid(50.,nb_points)
+k         = wavenumbers(nb_points,dx)
+
+window_params = {'kernel': 'splitstep','nstep_update_plot': 10, 'step_size': 0.025, 'array_size': 8000, 'streaming': True, 'record_state':False, 'nstep_record':1, 'window_size':(1200,1000), 'invert_order_obs_var': True,'theme':'dark','nstep_field_history':20,'save_formats':['npz']}
+
+
+def load_docks():
+
+    ''' Returns a dict to be used for plots declaration (see model_input.py). "image" docks show the (time, space) history of 1D fields, "plot1D" docks their current profile. '''
+
+    docks = {
+    'space_time' : {'type': 'image', 'position': 'left', 'size': (600,600)},
+    'profile'    : {'type': 'plot1D', 'position': 'right', 'size': (500,300), 'labels':{'bottom':'Space (grid points)','left':'Intensity (arb. units)'}},
+    'energy'     : {'type': 'plot1D', 'position': 'bottom', 'relativeTo': 'profile', 'size': (500,300), 'labels':{'bottom':'Time (arb. units)','left':'Mean intensity (arb. units)'}},
+    }
+
+    return docks
+
+def load_variables():
+
+    ''' Returns a dict of the variables (see model_input.py). A 1D or 2D array as "init_cond" makes the variable a field, "linear" (callable(ui,params), optional default is linear_{variable}) gives the multiplier of its Fourier transform for the linear part of its equation (diff_eq_{variable} is then the nonlinear part). '''
+
+    variables = {
+    'psi' : {'type': np.complex128, 'init_cond': 1.+0.01*np.random.default_rng(0).standard_normal(nb_points), 'plot': False, 'dock':['profile'], 'help':'intracavity field'},
+    }
+
+    return variables
+
+def load_observables():
+
+    ''' Returns a dict of the observables (see model_input.py). '''
+
+    observables = {
+    'intensity' : {'type': np.float64, 'init_cond': np.zeros(nb_points), 'dock':['space_time','profile'], 'pointwise': True, 'help':'intensity field'},
+    'mean_intensity' : {'type': np.float64, 'init_cond': 0., 'dock':['energy'], 'help':'intensity averaged over space'},
+    }
+
+    return observables
+
+def load_params():
+
+    ''' Returns a dict of the parameters (see model_input.py). '''
+
+    params = {}
+    params['delta'] = {'init_cond': 1.5, 'min': -5., 'max': 10., 'step': 0.01, 'help':'detuning'}
+    params['F']     = {'init_cond': 1.5, 'min': 0.  , 'max': 5., 'step': 0.01, 'help':'pump amplitude'}
+    params['D']     = {'init_cond': 1. , 'min': -2. , 'max': 2., 'step': 0.01, 'help':'dispersion (> 0: anomalous)'}
+
+    return params
+
+def linear_psi(ui,params):
+    return -(1.+1j*params['delta']) - 1j*params['D']*k**2
+
+def diff_eq_psi(ui,variables,params):
+    psi = variables['psi']
+    return 1j*(psi.real**2+psi.imag**2)*psi + params['F']
+
+def eq_intensity(ui,variables,params):
+    return variables['psi'].real**2 + variables['psi'].imag**2
+def eq_mean_intensity(ui,variables,params):
+    return np.mean(variables['intensity'][-1])
+
+
+def keyboard_keys():
+    """ Returns a dictionnary of user defined keys of form key:callable (see model_input.py). """
+    return {}
@@ -0,0 +1,1489 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import argparse
+import importlib
+import threading
+import queue
+import json
+import numpy as np
+from time import perf_counter
+from collections import deque
+
+
+def parse_arguments(argv=None):
+
+    """ Command line options: python GUIDE.py [-f model_input.py] [--restore checkpoint_directory] [--profile-startup] [--headless [--steps N] [--out filename] [--timings filename.json] [--checkpoint checkpoint_directory]] """
+
+    parser = argparse.ArgumentParser(description='Graphical User Interface for Differential Equations (GUIDE)')
+    parser.add_argument('-f', dest='filename', default=None, help='input file to load the model from (default: model_input.py)')
+    parser.add_argument('--headless', action='store_true', help='compute without GUI (no Qt import) and report steps/s')
+    parser.add_argument('--steps', type=int, default=None, help='number of time steps to compute in headless mode (default: array_size)')
+    parser.add_argument('--out', default=None, help='headless mode: file where traces are recorded every nstep_record steps (.npz, .csv or .xlsx), streamed into the chunks of the directory file_record during the run; without extension only the chunk directory is written (long runs, convert with recorder.py)')
+    parser.add_argument('--timings', default=None, help='headless mode: JSON file where the timings of the computation phases and equations are dumped')
+    parser.add_argument('--restore', default=None, help='checkpoint directory (written with the "k" key or --checkpoint) the simulation starts from')
+    parser.add_argument('--checkpoint', default=None, help='headless mode: directory where a checkpoint of the final state is written')
+    parser.add_argument('--profile-startup', action='store_true', help='print the duration of each launch phase (imports, model loading, UI, docks)')
+    return parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+def load_input_file(filename=None):
+
+    """ Import the user input file (python module) given as path, model_input.py by default """
+
+    if filename is None:
+        import model_input as input_file
+        return input_file
+    lib_path = filename[:-len('.py')] if filename.endswith('.py') else filename
+    return importlib.import_module(lib_path.replace('/','.'))
+
+def save_columns(filename,columns):
+
+    """ Write a dict of 1D arrays of same length {column_name:array} at once. Format is chosen from the extension: .npz (fastest), .csv, .parquet (needs pyarrow or fastparquet) or .xlsx (pandas imported only for those) """
+
+    extension = os.path.splitext(filename)[1]
+    accepted_extensions = ['.npz','.csv','.parquet','.xlsx']
+    assert extension in accepted_extensions, f"Extension '{extension}' of file '{filename}' not understood. Must be in {accepted_extensions}"
+    if extension == '.npz':
+        np.savez(filename,**columns)
+    else:
+        import pandas as pd
+        data_frame = pd.DataFrame(columns)
+        if extension == '.csv':
+            data_frame.to_csv(filename,index=False)
+        elif extension == '.parquet':
+            try:
+                data_frame.to_parquet(filename,index=False)
+            except ImportError:
+                print(f'WARNING: saving .parquet files needs pyarrow or fastparquet, file "{filename}" not saved')
+                return
+        else:
+            data_frame.to_excel(filename,index=False)
+    print(f'File "{filename}" saved')
+
+# Window settings saved in checkpoints (all restored but the structural array_size and ensemble_size)
+checkpoint_settings = ['kernel','step_size','array_size','ensemble_size','ensemble_plot','nstep_update_plot','nstep_record','block_integration','rtol','atol','target_fps']
+
+def fit_history(values,size):
+
+    """ Last size samples of values, padded with its first sample if it is shorter (e.g. history of a checkpoint written with another array_size) """
+
+    if len(values) >= size: return values[-size:]
+    return np.concatenate((np.full((size-len(values),)+values.shape[1:],values[0],dtype=values.dtype),values))
+
+def export_columns(filename_no_ext,columns,formats):
+
+    """ Write columns (see save_columns) in each of the formats (extensions without dot), fastest first. Meant to run in a background thread on a copy of the arrays """
+
+    for extension in sorted(formats,key=lambda extension: ['npz','csv','parquet','xlsx'].index(extension)):
+        save_columns(f'{filename_no_ext}.{extension}',columns)
+
+
+# Dormand-Prince 5(4) coefficients (stages matrix, 5th order weights, error weights and 4th order dense output polynomials as in Hairer's DOPRI5)
+DP45_A = [np.array([]),
+          np.array([1/5]),
+          np.array([3/40, 9/40]),
+          np.array([44/45, -56/15, 32/9]),
+          np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+          np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656])]
+DP45_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])
+DP45_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+DP45_E = np.array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+DP45_P = np.array([[1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+                   [0, 0, 0, 0],
+                   [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+                   [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+                   [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+                   [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+                   [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+def packed_kernel(kernel):
+
+    """ Decorator for kernels using the packed protocol: kernel(state,params) takes the 1D state vector of all the variables (see Modele.state_indices) and returns the next one (the same array can be updated in place) """
+
+    kernel.packed = True
+    return kernel
+
+
+def stochastic_kernel(kernel):
+
+    """ Decorator for kernels adding the white noise of the variables with the key 'noise' (see Modele.noise_terms and Modele.packed_noise): the other kernels ignore it """
+
+    kernel.stochastic = True
+    return kernel
+
+
+def pointwise(equation):
+
+    """ Decorator for observables that are element-wise functions of the variables (equivalent to the observable key 'pointwise': True): they are only evaluated on the samples produced since the last update, and their results appended to their history """
+
+    equation.pointwise = True
+    return equation
+
+
+### BEGIN RingBuffer class ###
+class RingBuffer():
+
+    """ Fixed length history with O(1) append. Each sample is written twice in a buffer of twice the history length so that the chronologically ordered history is always available as a contiguous view (no copy) """
+
+    def __init__(self,initial_values):
+        self.size   = len(initial_values)
+        self.buffer = np.concatenate((initial_values,initial_values))
+        self.index  = 0  # position of the oldest sample (the newest one is at index-1)
+        self.count    = self.size  # number of samples written since creation (absolute index of the newest one + 1)
+        self.revision = 0          # incremented at each overwrite of the whole history
+        self.version  = 0          # incremented at each write
+
+    def fill(self,values):
+        """ Overwrite the whole history with values (scalar or array of the history length) """
+        self.buffer[:self.size] = values
+        self.buffer[self.size:] = self.buffer[:self.size]
+        self.index = 0
+        self.revision += 1
+        self.version  += 1
+
+    def append(self,value):
+        self.buffer[self.index]           = value
+        self.buffer[self.index+self.size] = value
+        self.index += 1
+        self.count += 1
+        self.version += 1
+        if self.index == self.size: self.index = 0
+
+    def extend(self,values):
+        """ Append several samples at once (oldest first) """
+        nb_values = len(values)
+        if nb_values >= self.size:
+            self.fill(values[-self.size:])
+            self.count += nb_values
+            return
+        end = self.index + nb_values
+        if end <= self.size:
+            self.buffer[self.index:end] = values
+            self.buffer[self.index+self.size:end+self.size] = values
+        else:  # wrap around the end of the history
+            split = self.size - self.index
+            self.buffer[self.index:self.size] = values[:split]
+            self.buffer[self.index+self.size:] = values[:split]
+            self.buffer[:nb_values-split] = values[split:]
+            self.buffer[self.size:self.size+nb_values-split] = values[split:]
+        self.index = end % self.size
+        self.count += nb_values
+        self.version += 1
+
+    def view(self):
+        """ Chronologically ordered history (contiguous view on the buffer, do not write in it) """
+        return self.buffer[self.index:self.index+self.size]
+
+    def last(self):
+        return self.buffer[self.index+self.size-1]
+
+    def set_last(self,value):
+        index = (self.index-1) % self.size
+        self.buffer[index]           = value
+        self.buffer[index+self.size] = value
+        self.version += 1
+
+
+### BEGIN DelayBuffer class ###
+class DelayBuffer():
+
+    """ History of a delayed variable on the step_size grid, sized from its 'max_delay' independently of array_size. Samples are kept in a ring (Python list, fast scalar access) and a delayed value is the 4 points Lagrange interpolation (4th order, as RK4) of the samples around the delayed time, in O(1) """
+
+    def __init__(self,size,value):
+        self.size = size
+        self.fill(value)
+
+    def fill(self,value):
+        """ Constant history (e.g. initial condition before the start of the simulation) """
+        self.samples = [value]*self.size
+        self.count   = self.size  # number of samples written (the newest one has the absolute index count-1)
+
+    def load(self,values):
+        """ Overwrite the history with the samples values (oldest first), padded with the first one if there are less than size """
+        values = fit_history(np.asarray(values),self.size)
+        self.samples = values.tolist() if values.ndim == 1 else list(values)
+        self.count   = self.size
+
+    def append(self,value):
+        self.samples[self.count%self.size] = value
+        self.count += 1
+
+    def set_last(self,value):
+        self.samples[(self.count-1)%self.size] = value
+
+    def ordered(self):
+        """ Samples from the oldest to the newest """
+        start = self.count%self.size
+        return self.samples[start:] + self.samples[:start]
+
+    def value(self,lag):
+        """ Value lag samples (float) before the newest one, interpolated between the 4 samples around it (extrapolated for -1 <= lag < 0) """
+        offset = max(1-int((-lag)//1),3)  # samples between the first of the 4 interpolated ones and the newest one
+        assert offset < self.size, f"Delay of {lag} steps beyond the delay buffer of {self.size} steps, increase the 'max_delay' of the variable"
+        base = self.count - 1 - offset
+        x    = offset - lag
+        s0,s1,s2,s3 = [self.samples[index%self.size] for index in range(base,base+4)]
+        return (-(x-1.)*(x-2.)*(x-3.)/6.)*s0 + (x*(x-2.)*(x-3.)/2.)*s1 - (x*(x-1.)*(x-3.)/2.)*s2 + (x*(x-1.)*(x-2.)/6.)*s3
+
+
+### BEGIN TrackedValues class ###
+class TrackedValues(dict):
+
+    """ Dict of the values given to the equations of observables: records the accessed keys (dependencies) and brings lazy observables up to date before they are read """
+
+    def __init__(self,modele,values):
+        dict.__init__(self,values)
+        self.modele   = modele
+        self.accessed = set()
+
+    def __getitem__(self,key):
+        self.accessed.add(key)
+        if key in self.modele.observables_cache:
+            self.modele.evaluate_observable(key)
+            return self.modele.variables[key]['value']
+        return dict.__getitem__(self,key)
+
+
+### BEGIN PhaseTimings class ###
+class PhaseTimings():
+
+    """ Durations of named phases of the computation (kernel, observables, equations, plots...): totals and the last nb_samples durations of each phase for rolling statistics. When disabled, start and stop only check a flag """
+
+    def __init__(self,nb_samples=500):
+        self.enabled    = False
+        self.nb_samples = nb_samples
+        self.reset()
+
+    def reset(self):
+        self.durations = {}  # phase: deque of the last durations
+        self.totals    = {}  # phase: [count, total duration]
+
+    def start(self):
+        return perf_counter() if self.enabled else 0.
+
+    def stop(self,phase,time_start):
+        if self.enabled: self.add(phase,perf_counter()-time_start)
+
+    def add(self,phase,duration):
+        if phase not in self.durations:
+            self.durations[phase] = deque(maxlen=self.nb_samples)
+            self.totals[phase]    = [0,0.]
+        self.durations[phase].append(duration)
+        self.totals[phase][0] += 1
+        self.totals[phase][1] += duration
+
+    def summary(self):
+        """ {phase:{statistic:value}} with count and total duration since the last reset, and mean/p50/p95/max of the last durations (seconds), phases sorted by decreasing total duration """
+        summary = {}
+        for phase in sorted(self.totals.keys(),key=lambda phase: -self.totals[phase][1]):
+            durations = np.array(self.durations[phase])  # copied at once (may be appended by the worker thread)
+            summary[phase] = {'count':self.totals[phase][0],'total_s':self.totals[phase][1],'mean_s':durations.mean(),
+                              'p50_s':np.percentile(durations,50),'p95_s':np.percentile(durations,95),'max_s':durations.max()}
+        return summary
+
+    def dump(self,filename):
+        with open(filename,'w') as json_file:
+            json.dump(self.summary(),json_file,indent=1)
+        print(f'File "{filename}" saved')
+
+
+### BEGIN DoubleBuffer class ###
+class DoubleBuffer():
+
+    """ Hand-off of snapshots ({name:array}) from a producer thread to a consumer thread. The producer copies into the slot that is not being read, the consumer takes the latest complete slot and keeps reading it until it takes another one """
+
+    def __init__(self):
+        self.lock           = threading.Lock()
+        self.slots          = [{},{}]
+        self.reading_slot   = 0
+        self.published_slot = 0
+        self.writing        = False
+        self.new_snapshot   = False
+
+    def write(self,arrays):
+        with self.lock:
+            slot         = 1 - self.reading_slot
+            self.writing = True
+        snapshot = self.slots[slot]
+        for (key,value) in arrays.items():
+            if isinstance(value,dict):  # small dicts of scalars (e.g. history_counts) are handed over as is
+                snapshot[key] = value
+                continue
+            value = np.asarray(value)
+            if key in snapshot and snapshot[key].shape == value.shape and snapshot[key].dtype == value.dtype:
+                np.copyto(snapshot[key],value)
+            else:
+                snapshot[key] = value.copy()
+        with self.lock:
+            self.published_slot = slot
+            self.writing        = False
+            self.new_snapshot   = True
+
+    def pending(self):
+        """ Whether the last published snapshot has not been taken yet """
+        with self.lock:
+            return self.new_snapshot
+
+    def take(self):
+        """ Latest complete snapshot, None if nothing new has been published (or if it is being overwritten) """
+        with self.lock:
+            if not self.new_snapshot or self.writing: return None
+            self.reading_slot = self.published_slot
+            self.new_snapshot = False
+            return self.slots[self.reading_slot]
+
+
+### BEGIN NoiseGenerator class ###
+class NoiseGenerator():
+
+    """ Standard normal numbers for nb_columns noise components per step, drawn by blocks of block_size steps from a seeded np.random.Generator into a preallocated array and handed out one row per step: a single generator call per block, same sequence for the same seed """
+
+    def __init__(self,nb_columns,seed,block_size=4096):
+        self.generator = np.random.default_rng(seed)
+        self.block     = np.empty((block_size,nb_columns))
+        self.index     = block_size  # next row to hand out (the block is drawn at the first step)
+
+    def next(self):
+        if self.index == len(self.block):
+            self.generator.standard_normal(out=self.block)
+            self.index = 0
+        self.index += 1
+        return self.block[self.index-1]
+
+
+### BEGIN Modele class ###
+class Modele():
+
+    def __init__(self,arguments=None):
+        
+        # Allow importing any file provided as argument in the form: python3 GUIDE.py -f model_input (or arguments given as parse_arguments(argv), e.g. sweep workers)
+        self.arguments = parse_arguments() if arguments is None else arguments
+        input_file = load_input_file(self.arguments.filename)
+
+        # Loading plots configuration (used in MainWindow class)
+        docks = input_file.load_docks()
+        setattr(self,'docks',docks)
+
+        # Loading window parameters
+        window_params = input_file.window_params
+        if 'streaming' not in window_params.keys(): self.streaming = True
+        if 'block_integration' not in window_params.keys(): self.block_integration = False
+        if 'worker' not in window_params.keys(): self.worker = False  # calculations in a background thread (GUI)
+        if 'remote_docks' not in window_params.keys(): self.remote_docks = False  # docks rendered in subprocesses (GUI)
+        if 'rtol' not in window_params.keys(): self.rtol = 1e-6   # adaptive kernels tolerances
+        if 'atol' not in window_params.keys(): self.atol = 1e-9
+        if 'record_chunk_size' not in window_params.keys(): self.record_chunk_size = 10000  # recorded steps per chunk file ('r' key)
+        if 'save_formats' not in window_params.keys(): self.save_formats = ['xlsx']  # formats of the traces saved with 's'/'r' keys, among 'npz', 'csv', 'parquet', 'xlsx'
+        if 'ensemble_size' not in window_params.keys(): self.ensemble_size = 1  # number of members integrated at once (ensemble mode if > 1)
+        if 'ensemble_plot' not in window_params.keys(): self.ensemble_plot = 'mean'  # members shown in plots/saves: 'mean', 'std', 'min', 'max' or member index
+        if 'nstep_field_history' not in window_params.keys(): self.nstep_field_history = 1  # steps between two rows of the (time, space) histories of the fields
+        if 'noise_seed' not in window_params.keys(): self.noise_seed = None  # seed of the noise of the stochastic kernels, None: drawn at launch (kept in checkpoints)
+        if 'noise_block_size' not in window_params.keys(): self.noise_block_size = 4096  # steps of noise drawn at once
+        if 'target_fps' not in window_params.keys(): self.target_fps = None  # frame rate targeted by adapting nstep_update_plot (GUI), None: fixed nstep_update_plot
+        for window_param in window_params.keys():
+            setattr(self,window_param,window_params[window_param])
+        for extension in self.save_formats:
+            assert extension in ['npz','csv','parquet','xlsx'], f"Save format '{extension}' not understood. Must be in {['npz','csv','parquet','xlsx']}"
+
+        # Tracking time
+        self.nstep      = 0
+        self.time_stamp_history = RingBuffer(np.zeros(self.array_size).astype(np.float64))
+        self.time_stamp         = self.time_stamp_history.view()
+
+        # Loading parameters
+        params = input_file.load_params()
+        setattr(self,'params',params)
+        for param in self.params.keys():
+            if isinstance(self.params[param]['step'],int):  typ = int
+            else: typ = np.float64
+            self.params[param]['history'] = RingBuffer(self.params[param]['init_cond'] * np.ones(self.array_size).astype(typ))
+            self.params[param]['value']   = self.params[param]['history'].view()
+        self.last_params = {param:self.params[param]['history'].last().item() for param in self.params.keys()}  # kept up to date by set_param_value, Python numbers (numpy scalars are slow in arithmetic with the Python numbers of the packed kernels)
+
+        # Ensemble mode: params with key 'ensemble' (array of ensemble_size values) take one value per member until modified
+        for param in self.params.keys():
+            if 'ensemble' in self.params[param]:
+                assert self.ensemble_size > 1 and len(self.params[param]['ensemble']) == self.ensemble_size, f"'ensemble' values of param {param} must be of length window_params 'ensemble_size' (> 1)"
+                self.last_params[param] = np.asarray(self.params[param]['ensemble'])
+        
+        # Set default plot for params to False if none provided
+        for param in self.params.keys():
+            if 'plot' not in self.params[param].keys():
+                self.params[param]['plot'] = False
+                
+        # Loading variables
+        variables = input_file.load_variables()
+        setattr(self,'variables',variables)
+        # Loading observables
+        observables = input_file.load_observables()
+        setattr(self,'observables',observables)
+
+        # List as defined in the input file (as observables are added to variables dict)
+        list_variables = list(self.variables.keys())
+        list_observables = list(self.observables.keys())
+
+        # Concatenate the variables and observables dict (if 'invert_var_obs' then invert order observables and variables are displayed)
+        if not 'invert_order_obs_var' in window_params.keys(): self.variables = dict(self.variables, **self.observables)
+        else:
+            if window_params['invert_order_obs_var']:
+                self.variables = dict(self.observables, **self.variables)
+            else:
+                self.variables = dict(self.variables, **self.observables)
+
+        # Fields (variables/observables whose init_cond is a 1D or 2D array, outside of ensemble mode): histories of field_history_size rows of the spatial shape, a row every nstep_field_history steps
+        self.fields = {}
+        self.field_history_size = max(self.array_size//self.nstep_field_history,1)
+        for variable in self.variables.keys():
+            if np.ndim(self.variables[variable]['init_cond']) > 0 and self.ensemble_size == 1 and not self.is_calculation_size(variable):
+                assert np.ndim(self.variables[variable]['init_cond']) <= 2, f"Field {variable} must be 1D or 2D"
+                self.fields[variable] = np.shape(self.variables[variable]['init_cond'])
+
+        # Build main dict of variables
+        for variable in self.variables.keys():
+            self.variables[variable]['value'] = self.initial_values(variable)
+            if not self.is_calculation_size(variable):
+                self.variables[variable]['history'] = RingBuffer(self.variables[variable]['value'])
+                self.variables[variable]['value']   = self.variables[variable]['history'].view()
+            if variable in list_variables:
+                self.variables[variable]['observable'] = False
+            elif variable in list_observables:
+                self.variables[variable]['observable'] = True
+        
+        # Assert no params, variables and observables are called the same
+        assert len(set(list_variables)&set(list_observables))==0 and len(set(list_variables)&set(list(self.params.keys())))==0 and len(set(list(self.params.keys()))&set(list_observables))==0, f"Repeated name for variables, observables and/or parameters"
+        
+        # Set default plot for variables to True if none provided
+        for variable in self.variables.keys():
+            if 'plot' not in self.variables[variable].keys():
+                self.variables[variable]['plot'] = True
+
+        # Loading equations into keyword 'equation' in variables dict
+        # 'diff_eq_' and 'eq_' are default patterns for variables and observables respectively
+        pattern_variables = 'diff_eq_'
+        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_variables)]:
+            variable = key.split(pattern_variables)[-1]
+            if variable not in list_variables:
+                print(f"Warning: Equation for Variable {variable} not used or not understood")
+                continue
+            if 'equation' in self.variables[variable].keys(): continue
+            self.variables[variable]['equation'] = input_file.__dict__[key]
+
+        pattern_observables = 'eq_'
+        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_observables)]:
+            variable = key.split(pattern_observables)[-1]
+            if variable not in list_observables:
+                print(f"Warning: Equation for Observable {variable} not used or not understood")
+                continue
+            if 'equation' in self.variables[variable].keys(): continue
+            self.variables[variable]['equation'] = input_file.__dict__[key]
+
+        # Jacobians (key 'jacobian' or jac_{variable}, returning the dict {variable:partial derivative} of diff_eq_{variable}, missing ones being zero) used by the implicit kernel_BDF2 instead of finite differences
+        pattern_jacobians = 'jac_'
+        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_jacobians)]:
+            variable = key.split(pattern_jacobians)[-1]
+            if variable not in list_variables:
+                print(f"Warning: Jacobian for Variable {variable} not used or not understood")
+                continue
+            if 'jacobian' in self.variables[variable].keys(): continue
+            self.variables[variable]['jacobian'] = input_file.__dict__[key]
+
+        # Linear parts of field equations in Fourier space (key 'linear' or linear_{variable}, returning the multiplier of the Fourier transform of the field): diff_eq_* is then the nonlinear part. kernel_splitstep integrates the linear part exactly, the other kernels add it to diff_eq_* ('equation'; 'nonlinear' keeps diff_eq_* alone)
+        pattern_linear = 'linear_'
+        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_linear)]:
+            variable = key.split(pattern_linear)[-1]
+            if variable not in list_variables:
+                print(f"Warning: Linear operator for Variable {variable} not used or not understood")
+                continue
+            if 'linear' in self.variables[variable].keys(): continue
+            self.variables[variable]['linear'] = input_file.__dict__[key]
+        self.linear_operators = {}  # variable: {'params': {param:value} used by the operator, 'operator': multiplier, 'propagators': {step:exp(operator*step)}}
+        for variable in list_variables:
+            if 'linear' in self.variables[variable]:
+                self.variables[variable]['nonlinear'] = self.variables[variable]['equation']
+                assert variable in self.fields, f"Variable {variable} has a linear operator in Fourier space, it must be a field (1D or 2D array init_cond)"
+                self.variables[variable]['equation'] = self.equation_with_linear_part(variable,self.variables[variable]['nonlinear'])
+
+        # Pointwise observables (key 'pointwise' or decorator pointwise) only see the new samples
+        for variable in list_observables:
+            pointwise = self.variables[variable].get('pointwise',getattr(self.variables[variable]['equation'],'pointwise',False))
+            if pointwise and self.is_calculation_size(variable):
+                print(f"Warning: Observable {variable} is 'calculation_size', it cannot be pointwise")
+                pointwise = False
+            self.variables[variable]['pointwise'] = pointwise
+        self.revision_of_variables = 0  # sum of the revisions of the histories of the variables at the last update of pointwise observables
+
+        # Lazy observables ("calculation_size" ones) are only evaluated when consumed (plots, user keys), and only if one of their dependencies changed since. Dependencies are declared with the key 'depends_on' or recorded at each evaluation
+        self.observables_cache = {}  # lazy observable: {'dependencies': {name:version}, 'version': number of evaluations}
+        self.evaluating        = []  # lazy observables being evaluated (cyclic dependencies detection)
+        for variable in list_observables:
+            if self.is_calculation_size(variable):
+                self.observables_cache[variable] = {'dependencies':None,'version':0}
+            for key in self.variables[variable].get('depends_on',[]):
+                assert key in self.variables.keys() or key in self.params.keys(), f"Dependency '{key}' of observable {variable} is neither a variable, an observable nor a param"
+
+        # Create dict of the usable kernels
+        self.kernels = {}
+        pattern_kernels = 'kernel_'
+        for key in [attr for attr in self.__dir__() if attr.startswith(pattern_kernels)]:
+            kernel = key.split(pattern_kernels)[-1]
+            self.kernels[kernel] = {}
+            self.kernels[kernel]['value'] = getattr(self,key)
+            self.kernels[kernel]['packed'] = getattr(self.kernels[kernel]['value'],'packed',False)
+            self.kernels[kernel]['stochastic'] = getattr(self.kernels[kernel]['value'],'stochastic',False)
+        for key in [attr for attr in input_file.__dict__.keys() if attr.startswith(pattern_kernels)]:
+            kernel = key.split(pattern_kernels)[-1]
+            self.kernels[kernel] = {}
+            self.kernels[kernel]['value'] = input_file.__dict__[key]
+            self.kernels[kernel]['packed'] = getattr(self.kernels[kernel]['value'],'packed',False)
+            self.kernels[kernel]['stochastic'] = getattr(self.kernels[kernel]['value'],'stochastic',False)
+        if not self.accepts_kernel(self.kernel):  # members/fields are integrated at once by the dict kernels (equations broadcast over the arrays): same algorithm without '_packed', other packed kernels (e.g. 'DP45', 'BDF2') are refused
+            dict_kernel = self.kernel[:-len('_packed')]
+            assert self.kernel.endswith('_packed') and dict_kernel in self.kernels.keys(), f"Kernel '{self.kernel}' integrates systems of ODEs only (no ensembles nor fields), use one of {[kernel for kernel in self.kernels.keys() if not self.kernels[kernel]['packed']]}"
+            print(f"WARNING: packed kernel '{self.kernel}' cannot integrate ensembles nor fields, kernel '{dict_kernel}' used instead")
+            self.kernel = dict_kernel
+
+        # Load additional keyboard keys if any provided
+        self.user_defined_keyPressEvent = input_file.keyboard_keys()
+        if self.user_defined_keyPressEvent is None: self.user_defined_keyPressEvent = {} # if None provided
+        system_reserved_keys = [" ", "q", "h", "s", "r", "i", "c", "k", "l", "p", "P"]
+
+        for user_defined_key in self.user_defined_keyPressEvent.keys():
+            assert user_defined_key not in system_reserved_keys, f"User defined key '{user_defined_key}' in system reserved ones {system_reserved_keys}"
+
+
+        ########################### BEGIN Assertions input file ###########################
+        # 'dock' (variables): Not providing dock_name that doesn't exist
+        for variable in self.variables.keys():
+            if 'dock' in self.variables[variable]:
+                for dock_name in self.variables[variable]['dock']:
+                    if not isinstance(dock_name,dict):
+                        assert dock_name in self.docks.keys(), f"Dock name '{dock_name}' for variable {variable} not understood. Dock name must be in {list(self.docks.keys())}"
+        # all variables have an equation
+        for variable in self.variables.keys():
+            assert 'equation' in self.variables[variable].keys(), f"An equation for variable {variable} must be provided"
+        ###########################  END Assertions input file  ###########################
+
+        # Packed state vector of the variables (used by packed kernels): name->index map built once
+        self.state_indices  = {}
+        self.state_packing  = []  # (variable, index, real_valued) for fast loops over the state
+        for index,variable in enumerate(list_variables):
+            self.state_indices[variable] = index
+        self.state = np.zeros(len(list_variables),dtype=np.result_type(*[self.variables[variable]['type'] for variable in list_variables]))
+        for variable,index in self.state_indices.items():
+            real_valued = np.iscomplexobj(self.state) and not np.issubdtype(self.variables[variable]['type'],np.complexfloating)
+            self.state_packing.append((variable,index,real_valued))
+        self.real_packing     = [(variable,index) for (variable,index,real_valued) in self.state_packing if real_valued]  # real variables in a complex state vector, given as floats to diff_eq_*
+        self.state_equations  = [self.variables[variable]['equation'] for variable in self.state_indices.keys()]
+        self.state_view       = {}     # dict of variables given to diff_eq_* by the packed kernels, refreshed from the state vector
+        self.state_up_to_date = False  # whether self.state holds the last values of the variables histories
+        self.block_buffer     = np.empty((0,)+self.state.shape,dtype=self.state.dtype)
+        self.DP45_state       = None   # internal integration of the adaptive kernel_DP45
+        self.BDF2_state       = None   # previous step and iteration matrix of the implicit kernel_BDF2
+        if np.iscomplexobj(self.state) and any(['jacobian' in self.variables[variable] for variable in list_variables]):
+            print("WARNING: jac_* ignored with complex variables (not holomorphic in general), kernel 'BDF2' uses finite differences on their real and imaginary parts")
+
+        # Delayed variables (key 'max_delay'): histories for ui.delayed(variable,delay), kernels set the position of their current stage in the step
+        self.delay_buffers  = {}
+        self.stage_fraction = 0.
+        for variable in list_variables:
+            if 'max_delay' in self.variables[variable]:
+                self.delay_buffers[variable] = DelayBuffer(int(np.ceil(self.variables[variable]['max_delay']/self.step_size))+4,self.initial_delayed_value(variable))
+        for variable in list_observables:
+            assert 'max_delay' not in self.variables[variable], f"Observable {variable} cannot be delayed ('max_delay' is for variables)"
+        self.delay_packing = [(variable,index,real_valued) for (variable,index,real_valued) in self.state_packing if variable in self.delay_buffers]
+
+        # Noisy variables (key 'noise': amplitude sigma of an additive white noise, number or name of a param): stochastic kernels add sigma dW at each step. The rows of the noise generator hold the real components of the noise of all the noisy variables
+        self.noise_layout  = []  # (variable, first column, number of columns, shape of the variable, complex_valued)
+        self.noise_indices = []  # packed kernels: positions of the columns in the real view of the state vector
+        nb_columns = 0
+        for variable in list_variables:
+            if 'noise' in self.variables[variable]:
+                amplitude = self.variables[variable]['noise']
+                assert not isinstance(amplitude,str) or amplitude in self.params.keys(), f"Noise amplitude '{amplitude}' of variable {variable} must be a number or the name of a param"
+                shape          = np.shape(self.variables[variable]['value'][-1])
+                complex_valued = np.issubdtype(self.variables[variable]['type'],np.complexfloating)
+                size           = int(np.prod(shape))*(2 if complex_valued else 1)
+                self.noise_layout.append((variable,nb_columns,size,shape,complex_valued))
+                nb_columns += size
+                index = self.state_indices[variable]
+                if np.iscomplexobj(self.state): self.noise_indices += [2*index,2*index+1] if complex_valued else [2*index]
+                else:                           self.noise_indices += [index]
+        for variable in list_observables:
+            assert 'noise' not in self.variables[variable], f"Observable {variable} cannot be noisy ('noise' is for variables)"
+        if self.noise_seed is None: self.noise_seed = np.random.SeedSequence().entropy
+        self.noise = NoiseGenerator(nb_columns,self.noise_seed,self.noise_block_size)
+        self.noise_sizes = [size for (variable,start,size,shape,complex_valued) in self.noise_layout]
+        self.noise_cache = None
+        if self.noise_indices and self.noise_indices == list(range(self.noise_indices[0],self.noise_indices[-1]+1)):
+            self.noise_indices = slice(self.noise_indices[0],self.noise_indices[-1]+1)  # contiguous components: basic slicing
+        if self.noise_layout and not self.kernels[self.kernel]['stochastic']: self.warn_deterministic_kernel(self.kernel)
+
+        # Thread safety when calculations run in a worker: modifications are queued and applied by the worker between two blocks of steps
+        self.computation_lock = threading.RLock()
+        self.timings          = PhaseTimings()  # timings of the computation phases (set_timings)
+        self.requests         = queue.Queue()
+
+        # Start from a checkpoint (--restore)
+        if self.arguments.restore is not None: self.restore_checkpoint(self.arguments.restore)
+
+
+    def simulator(self):
+
+        """ Calculate 1 time step and update arrays """
+
+        time_start = self.timings.start()
+        if self.kernels[self.kernel]['packed']:
+            # Actual computation on the packed state vector (no dict built)
+            if not self.state_up_to_date: self.pack_state()
+            self.state = self.kernels[self.kernel]['value'](self.state,self.last_params)
+
+            # Update last values to the newest calculated (O(1) append in the history buffers)
+            values = self.state.tolist()
+            for (variable,index,real_valued) in self.state_packing:
+                self.variables[variable]['history'].append(values[index].real if real_valued else values[index])
+                self.variables[variable]['value'] = self.variables[variable]['history'].view()
+            for (variable,index,real_valued) in self.delay_packing:
+                self.delay_buffers[variable].append(values[index].real if real_valued else values[index])
+        else:
+            # Actual computation (pass only the 'value' keyword of each sub-dictionnary)
+            self.computation_result_dict = self.kernels[self.kernel]['value']({key:value['value'][-1] for (key,value) in self.variables.items() if not value['observable']},self.last_params)  # use last value of all variables for the computations of next step
+
+            # Update last values to the newest calculated (O(1) append in the history buffers)
+            for variable in self.variables.keys():
+                if not self.variables[variable]['observable']:
+                    if variable in self.fields: self.append_field_sample(variable,self.computation_result_dict[variable])
+                    else:                       self.variables[variable]['history'].append(self.computation_result_dict[variable])
+                    self.variables[variable]['value'] = self.variables[variable]['history'].view()
+            for variable in self.delay_buffers.keys():
+                self.delay_buffers[variable].append(self.computation_result_dict[variable])
+            self.state_up_to_date = False
+
+        self.timings.stop('kernel',time_start)
+
+        # Evaluate observables
+        time_start = self.timings.start()
+        self.update_observables()
+        self.timings.stop('observables',time_start)
+
+    def simulator_block(self,nstep):
+
+        """ Calculate nstep time steps in a single kernel call (packed kernels only) and update arrays with one vectorized write per history """
+
+        time_start = self.timings.start()
+        block = self.integrate_block(nstep)
+
+        for (variable,index,real_valued) in self.state_packing:
+            self.variables[variable]['history'].extend(block[:,index].real if real_valued else block[:,index])
+            self.variables[variable]['value'] = self.variables[variable]['history'].view()
+        self.timings.stop('kernel',time_start)
+
+        # Evaluate observables once for the whole block
+        time_start = self.timings.start()
+        self.update_observables(nstep)
+        self.timings.stop('observables',time_start)
+
+    def integrate_block(self,nstep):
+
+        """ Advance nstep time steps with the (packed) kernel, returns the block of the new states (shape: nstep x size of the state vector) """
+
+        if self.block_buffer.shape[0] != nstep:
+            self.block_buffer = np.empty((nstep,)+self.state.shape,dtype=self.state.dtype)
+        if not self.state_up_to_date: self.pack_state()
+
+        kernel = self.kernels[self.kernel]['value']
+        for i in range(nstep):
+            self.state = kernel(self.state,self.last_params)
+            self.block_buffer[i] = self.state
+            if self.delay_packing:  # the next steps see this one through their delayed terms
+                values = self.state.tolist()
+                for (variable,index,real_valued) in self.delay_packing:
+                    self.delay_buffers[variable].append(values[index].real if real_valued else values[index])
+
+        return self.block_buffer
+
+    def is_block_integration(self):
+        return self.block_integration and self.kernels[self.kernel]['packed']
+
+    def update_observables(self,nstep=1):
+        """ Evaluate observables after nstep new samples of the variables, nstep=0 re-evaluates the last sample (e.g. after a modification of params). Pointwise observables are evaluated on the new samples only (on the whole histories after an overwrite of the variables, e.g. reset of ICs), the others on the whole histories (observables returning a single value are held constant over these nstep samples) """
+        values = TrackedValues(self,{key:value['value'] for (key,value) in self.variables.items()})
+
+        revision = sum([self.variables[variable]['history'].revision for variable in self.state_indices.keys()])
+        nstep_pointwise = nstep if revision == self.revision_of_variables else self.array_size
+        self.revision_of_variables = revision
+        if nstep_pointwise <= 1: new_samples = {key:value[-1] for (key,value) in values.items() if 'history' in self.variables[key]}
+        else:                    new_samples = {key:value[-self.history_rows(key,nstep_pointwise):] for (key,value) in values.items() if 'history' in self.variables[key]}
+
+        for variable in self.variables.keys():
+            if self.variables[variable]['observable']:
+                if self.variables[variable]['pointwise']:
+                    self.obs_computation_result = self.variables[variable]['equation'](self,new_samples,self.last_params)
+                    if   nstep_pointwise == 0: self.variables[variable]['history'].set_last(self.obs_computation_result)
+                    elif variable in self.fields and nstep_pointwise == 1: self.append_field_sample(variable,self.obs_computation_result)
+                    elif nstep_pointwise == 1: self.variables[variable]['history'].append(self.obs_computation_result)
+                    else:
+                        rows = self.history_rows(variable,nstep_pointwise)
+                        self.write_rows(variable,np.broadcast_to(self.obs_computation_result,(rows,)+self.variables[variable]['history'].buffer.shape[1:]),nstep_pointwise)
+                    self.variables[variable]['value'] = self.variables[variable]['history'].view()
+                    new_samples[variable] = self.obs_computation_result if nstep_pointwise <= 1 else self.variables[variable]['value'][-rows:]
+                elif variable in self.observables_cache:  # lazy
+                    continue
+                else:
+                    self.obs_computation_result = self.variables[variable]['equation'](self,values,self.last_params)
+                    history = self.variables[variable]['history']
+                    if np.ndim(self.obs_computation_result) == history.buffer.ndim:  # samples
+                        history.extend(self.obs_computation_result)
+                    else:   # If return only a single value (one per member in ensemble mode, a field for fields)
+                        if   nstep == 0: history.set_last(self.obs_computation_result)
+                        elif nstep == 1 and variable in self.fields: self.append_field_sample(variable,self.obs_computation_result)
+                        elif nstep == 1: history.append(self.obs_computation_result)
+                        else:            self.write_rows(variable,np.broadcast_to(self.obs_computation_result,(self.history_rows(variable,nstep),)+history.buffer.shape[1:]),nstep)
+                    self.variables[variable]['value'] = self.variables[variable]['history'].view()
+                values[variable] = self.variables[variable]['value']
+
+    def history_rows(self,variable,nstep):
+        """ Number of rows of the history of variable holding the last nstep steps (from self.nstep on): nstep, or for fields the rows opened every nstep_field_history steps (the whole history after an overwrite, nstep >= array_size) """
+        if variable not in self.fields or nstep <= 1: return nstep
+        if nstep >= self.array_size: return self.field_history_size
+        return min((self.nstep+nstep-1)//self.nstep_field_history - self.nstep//self.nstep_field_history + 1,self.field_history_size)
+
+    def write_rows(self,variable,rows,nstep):
+        """ Write the rows of the last nstep steps (see history_rows) into the history of variable, the first row of a field overwrites its last row if a previous step opened it """
+        history = self.variables[variable]['history']
+        if variable in self.fields and nstep < self.array_size and self.nstep%self.nstep_field_history != 0:
+            history.set_last(rows[0])
+            rows = rows[1:]
+        if len(rows): history.extend(rows)
+
+    def append_field_sample(self,variable,value):
+        """ Write the field of a new step: a new row of its history every nstep_field_history steps, otherwise the last row follows the current step """
+        if self.nstep%self.nstep_field_history == 0: self.variables[variable]['history'].append(value)
+        else:                                        self.variables[variable]['history'].set_last(value)
+
+    def update_time_stamp_and_params(self,nstep=1):
+        """ Advance time_stamp of nstep steps and carry the current value of each param to the next steps """
+        if nstep == 1:
+            self.time_stamp_history.append(self.time_stamp_history.last() + self.step_size)
+        else:
+            self.time_stamp_history.extend(self.time_stamp_history.last() + self.step_size*np.arange(1,nstep+1))
+        self.time_stamp = self.time_stamp_history.view()
+        self.nstep     += nstep
+
+        for param in self.params.keys():
+            if nstep == 1: self.params[param]['history'].append(self.params[param]['history'].last())
+            else:          self.params[param]['history'].extend(np.full(nstep,self.params[param]['history'].last()))
+            self.params[param]['value'] = self.params[param]['history'].view()
+
+    def run_headless(self,nstep=None,filename=None):
+
+        """ Compute nstep time steps without GUI. If filename, traces are recorded every nstep_record steps and streamed by a Recorder into chunks of record_chunk_size steps (directory filename_record, memory stays bounded for long runs), converted into filename at the end when it has an extension. With --timings, the timings of the phases and equations are dumped at the end, with --checkpoint the final state is saved """
+
+        if nstep is None:    nstep    = self.arguments.steps if self.arguments.steps is not None else self.array_size
+        if filename is None: filename = self.arguments.out
+        if self.arguments.timings is not None: self.set_timings(True)
+
+        if filename is not None:
+            from recorder import Recorder, convert_record  # recorder imports modele
+            filename_no_ext,extension = os.path.splitext(filename)
+            recorder = Recorder(filename_no_ext+'_record',{key:value.dtype for (key,value) in self.traces_to_save().items()},self.record_chunk_size)
+
+        time_start = perf_counter()
+        nstep_done = 0
+        while nstep_done < nstep:
+            if self.is_block_integration():
+                block_size = min(self.nstep_update_plot,nstep-nstep_done)
+                self.simulator_block(block_size)
+            else:
+                block_size = 1
+                self.simulator()
+
+            if filename is not None:  # record every self.nstep_record
+                traces = self.traces_of_last_steps(block_size)
+                if len(traces['time']) > 0: recorder.extend(traces)
+
+            self.update_time_stamp_and_params(block_size)
+            nstep_done += block_size
+        elapsed_time = perf_counter() - time_start
+        print(f'{nstep} steps computed in {elapsed_time:.3f} s ({nstep/elapsed_time:.1f} steps/s)')
+
+        if filename is not None:
+            recorder.close()
+            if extension: convert_record(filename_no_ext+'_record',filename)
+        if self.arguments.timings is not None:
+            self.timings.dump(self.arguments.timings)
+        if self.arguments.checkpoint is not None:
+            self.save_checkpoint(self.arguments.checkpoint)
+
+    def advance(self,nstep):
+        """ Compute nstep time steps (nstep <= array_size) without plots nor records: the new samples are the last nstep ones of the histories """
+        nstep_done = 0
+        while nstep_done < nstep:
+            block_size = min(self.nstep_update_plot,nstep-nstep_done) if self.is_block_integration() else 1
+            if self.is_block_integration(): self.simulator_block(block_size)
+            else:                           self.simulator()
+            self.update_time_stamp_and_params(block_size)
+            nstep_done += block_size
+
+    def traces_to_save(self):
+        """ Dict of the arrays that are saved/recorded: time_stamp, variables and observables (except "calculation_size" ones and fields, see field_traces; members reduced as plotted in ensemble mode) and params """
+        traces = {'time':self.time_stamp}
+        for variable in self.variables.keys():
+            if self.is_calculation_size(variable) or variable in self.fields:
+                continue
+            traces[variable] = self.reduce_members(self.variables[variable]['value']) if self.ensemble_size > 1 else self.variables[variable]['value']
+        for param in self.params.keys():
+            traces[param] = self.params[param]['value']
+        return traces
+
+    def field_traces(self):
+        """ Dict of the (time, space) histories of the fields and of the time of their rows ('time', the last row is the current step) """
+        traces = {'time':self.time_stamp[-1] - self.step_size*self.nstep_field_history*np.arange(self.field_history_size-1,-1,-1)}
+        traces.update({variable:self.variables[variable]['value'] for variable in self.fields.keys()})
+        return traces
+
+    def pack_state(self):
+        """ Copy the last value of each variable history into the packed state vector """
+        for (variable,index,real_valued) in self.state_packing:
+            self.state[index] = self.variables[variable]['history'].last()
+        self.state_up_to_date = True
+
+    def derivatives(self,state,params,out):
+        """ Evaluate diff_eq_* of all the variables on a packed state vector and write them into out """
+        out[:] = self.stage_derivatives(state.tolist(),params)
+        return out
+
+    def stage_derivatives(self,values,params):
+        """ diff_eq_* of all the variables as a list, for the state vector given as a list of Python numbers (much faster arithmetic than numpy scalars or small arrays). The dict given to the equations is refreshed in place from the list, real variables of a complex state vector as floats like with the dict kernels """
+        self.state_view.update(zip(self.state_indices.keys(),values))
+        for (variable,index) in self.real_packing:
+            self.state_view[variable] = values[index].real
+        return [equation(self,self.state_view,params) for equation in self.state_equations]
+
+    def real_derivatives(self,y,params,out):
+        """ derivatives with the packed state vector seen as real numbers (real and imaginary parts of complex variables as separate unknowns) """
+        self.derivatives(y.view(self.state.dtype),params,out.view(self.state.dtype))
+        return out
+
+    def evaluate_jacobian(self,y,params,f):
+        """ Jacobian of real_derivatives at y (f: derivatives at y): rows of jac_{variable} for real variables, forward finite differences for the others """
+        variables = list(self.state_indices.keys())
+        user_rows = [] if np.iscomplexobj(self.state) else [variable for variable in variables if 'jacobian' in self.variables[variable]]
+        jacobian  = np.zeros((len(y),len(y)))
+        if len(user_rows) < len(variables):
+            f_perturbed = np.empty_like(f)
+            for j in range(len(y)):
+                step = np.sqrt(np.finfo(float).eps)*max(abs(y[j]),1.)
+                y_perturbed     = y.copy()
+                y_perturbed[j] += step
+                jacobian[:,j]   = (self.real_derivatives(y_perturbed,params,f_perturbed) - f)/step
+        if user_rows:
+            self.state_view.update(zip(variables,y.tolist()))
+            for variable in user_rows:
+                row = jacobian[self.state_indices[variable]]
+                row[:] = 0.
+                for (name,derivative) in self.variables[variable]['jacobian'](self,self.state_view,params).items():
+                    row[self.state_indices[name]] = derivative
+        return jacobian
+
+    def equation_with_linear_part(self,variable,nonlinear):
+        def equation(ui,variables,params):
+            return nonlinear(ui,variables,params) + self.apply_linear(variable,variables[variable],params)
+        return equation
+
+    def linear_operator(self,variable,params):
+        """ Cached linear operator of variable in Fourier space, evaluated again only when one of the params it reads changed """
+        cache = self.linear_operators.get(variable)
+        if cache is None or any(params[param] != value for (param,value) in cache['params'].items()):
+            tracked  = TrackedValues(self,params)
+            operator = np.broadcast_to(self.variables[variable]['linear'](self,tracked),self.fields[variable]).astype(np.complex128)
+            cache = self.linear_operators[variable] = {'params':{param:params[param] for param in tracked.accessed},'operator':operator,'propagators':{}}
+        return cache
+
+    def apply_linear(self,variable,value,params):
+        """ Linear part of the derivative of a field: inverse FFT of operator * FFT """
+        result = np.fft.ifftn(self.linear_operator(variable,params)['operator']*np.fft.fftn(value))
+        return result if np.iscomplexobj(value) else result.real
+
+    def propagate_linear(self,variable,value,step,params):
+        """ Exact integration of the linear part of a field over step: inverse FFT of exp(operator*step) * FFT. Propagators are kept for each step until the operator changes """
+        cache = self.linear_operator(variable,params)
+        if step not in cache['propagators']:
+            cache['propagators'][step] = np.exp(cache['operator']*step)
+        result = np.fft.ifftn(cache['propagators'][step]*np.fft.fftn(value))
+        return result if np.iscomplexobj(value) else result.real
+
+    def set_variable_value(self,variable,value):
+        """ Overwrite the last value of a variable (e.g. new initial condition) """
+        self.variables[variable]['history'].set_last(value)
+        if variable in self.delay_buffers: self.delay_buffers[variable].set_last(value)
+        self.state_up_to_date = False
+
+    def delayed(self,variable,delay):
+        """ Value of variable delay (time units, at least step_size) before the current stage of the kernel, interpolated from its delay buffer (variable key 'max_delay'). To be used in diff_eq_*: ui.delayed('A',params['tau']). Before the start of the simulation (or of the delay buffer), the initial condition """
+        assert variable in self.delay_buffers, f"Variable {variable} is delayed, it needs a 'max_delay' key (largest delay used, time units)"
+        lag = delay/self.step_size - self.stage_fraction
+        assert lag >= -1., f"Delay {delay} of variable {variable} shorter than step_size"
+        return self.delay_buffers[variable].value(lag)
+
+    def initial_delayed_value(self,variable):
+        value = self.initial_values(variable)[-1]
+        return value.item() if np.ndim(value) == 0 else value
+
+    def set_param_value(self,param,value):
+        """ Overwrite the current value of a param """
+        self.params[param]['history'].set_last(value)
+        self.last_params[param] = self.params[param]['history'].last().item()
+
+    def traces_of_last_steps(self,nstep):
+        """ traces_to_save restricted to the last nstep calculated steps that are to be recorded (every nstep_record). Must be called before update_time_stamp_and_params """
+        selection = np.mod(self.nstep+np.arange(nstep),self.nstep_record) == 0
+        traces = {}
+        for (key,value) in self.traces_to_save().items():
+            if key == 'time':
+                traces[key] = (value[-1] + self.step_size*np.arange(nstep))[selection]
+            elif key in self.params.keys():  # params are constant during the steps
+                traces[key] = np.full(np.count_nonzero(selection),value[-1])
+            else:
+                traces[key] = value[-nstep:][selection]
+        return traces
+
+    def dependency_version(self,key):
+        """ Version of a dependency of observables: value of a param, number of evaluations of a lazy observable or number of writes in a history """
+        if key in self.params.keys():            return self.last_params[key]
+        if key in self.observables_cache.keys(): return self.observables_cache[key]['version']
+        return self.variables[key]['history'].version
+
+    def evaluate_observable(self,variable):
+        """ Evaluate a lazy observable, unless none of its dependencies changed since its last evaluation """
+        cache = self.observables_cache[variable]
+        if cache['dependencies'] is not None:
+            up_to_date = True
+            for (key,version) in cache['dependencies'].items():
+                if key in self.observables_cache.keys(): self.evaluate_observable(key)
+                if self.dependency_version(key) != version: up_to_date = False
+            if up_to_date: return
+
+        assert variable not in self.evaluating, f"Cyclic dependency of observables: {' -> '.join(self.evaluating+[variable])}"
+        self.evaluating.append(variable)
+        try:
+            if self.ensemble_size > 1:  # calculation_size observables are displayed: they see the members as plotted
+                variables = TrackedValues(self,{key:self.reduce_members(value['value']) if 'history' in value else value['value'] for (key,value) in self.variables.items()})
+                params    = TrackedValues(self,{key:self.reduce_members(value) for (key,value) in self.last_params.items()})
+            else:
+                variables = TrackedValues(self,{key:value['value'] for (key,value) in self.variables.items()})
+                params    = TrackedValues(self,self.last_params)
+            self.variables[variable]['value'] = self.variables[variable]['equation'](self,variables,params)
+        finally:
+            self.evaluating.pop()
+        dependencies = self.variables[variable].get('depends_on',variables.accessed|params.accessed)
+        cache['dependencies'] = {key:self.dependency_version(key) for key in dependencies}
+        cache['version'] += 1
+
+    def evaluate_observables(self,only_plotted=False):
+        """ Bring lazy observables up to date (only those to be plotted if only_plotted) """
+        for variable in self.observables_cache.keys():
+            if not only_plotted or self.variables[variable]['plot']:
+                self.evaluate_observable(variable)
+
+    def plot_values(self):
+        """ Dict {name:array} of the current arrays of variables, observables and params (lazy observables are evaluated if plotted). 1D fields give their (time, space) history, 2D fields their current value """
+        self.evaluate_observables(only_plotted=True)
+        values = {variable:self.variables[variable]['value'] for variable in self.variables.keys()}
+        values.update({variable:self.variables[variable]['value'][-1] for (variable,shape) in self.fields.items() if len(shape) == 2})
+        if self.ensemble_size > 1:
+            values.update({variable:self.reduce_members(self.variables[variable]['value']) for variable in self.variables.keys() if 'history' in self.variables[variable]})
+        values.update({param:self.params[param]['value'] for param in self.params.keys()})
+        values['history_counts'] = self.history_counts()
+        return values
+
+    def history_counts(self):
+        """ Dict {name:(count,revision,version)} of the histories, used to keep the decimation of plot1D curves up to date incrementally """
+        counts = {}
+        for items in (self.variables,self.params):
+            for name in items.keys():
+                if 'history' in items[name] and name not in self.fields:
+                    counts[name] = (items[name]['history'].count,items[name]['history'].revision,items[name]['history'].version)
+        return counts
+
+    def queue_request(self,function,*args):
+        """ Call function(*args) modifying the model, queued to be applied by the worker if calculations run in one """
+        if self.worker: self.requests.put((function,args))
+        else:           function(*args)
+
+    def apply_queued_requests(self):
+        nb_requests = 0
+        while not self.requests.empty():
+            function,args = self.requests.get()
+            function(*args)
+            nb_requests += 1
+        return nb_requests
+
+    def save_checkpoint(self,directory):
+        """ Save the whole state of the simulation into directory: a .npy file per history (time, variables, observables, params, per member params in ensemble mode) and manifest.json (nstep, kernel and settings), written last so that a directory with a manifest holds a complete checkpoint """
+        os.makedirs(directory,exist_ok=True)
+        manifest = {'nstep':int(self.nstep),'settings':{setting:getattr(self,setting) for setting in checkpoint_settings},'time':'time.npy','variables':{},'params':{},'ensemble_params':{},'delay_buffers':{}}
+        np.save(os.path.join(directory,'time.npy'),self.time_stamp)
+        for variable in self.variables.keys():
+            if 'history' in self.variables[variable]:
+                manifest['variables'][variable] = f'variable_{variable}.npy'
+                np.save(os.path.join(directory,manifest['variables'][variable]),self.variables[variable]['value'])
+        for variable in self.delay_buffers.keys():
+            manifest['delay_buffers'][variable] = f'delay_buffer_{variable}.npy'
+            np.save(os.path.join(directory,manifest['delay_buffers'][variable]),np.array(self.delay_buffers[variable].ordered()))
+        if self.noise_layout:  # generator state and current block: a restored simulation gets the same noise as the saved one would have
+            manifest['noise'] = {'seed':self.noise_seed,'generator':self.noise.generator.bit_generator.state,'index':self.noise.index,'block':'noise_block.npy'}
+            np.save(os.path.join(directory,manifest['noise']['block']),self.noise.block)
+        for param in self.params.keys():
+            manifest['params'][param] = f'param_{param}.npy'
+            np.save(os.path.join(directory,manifest['params'][param]),self.params[param]['value'])
+            if np.ndim(self.last_params[param]) > 0:  # one value per member
+                manifest['ensemble_params'][param] = f'ensemble_param_{param}.npy'
+                np.save(os.path.join(directory,manifest['ensemble_params'][param]),self.last_params[param])
+        with open(os.path.join(directory,'manifest.json'),'w') as json_file:
+            json.dump(manifest,json_file,indent=1,default=lambda value: value.item())  # numpy scalars of the settings
+        print(f'Checkpoint "{directory}" saved')
+
+    def restore_checkpoint(self,directory):
+        """ Restore a checkpoint written by save_checkpoint: histories (arrays are memory-mapped and copied into the histories, cut or padded if the checkpoint has another array_size), nstep, kernel and settings. Variables, observables and params missing from the checkpoint keep their current values """
+        manifest_filename = os.path.join(directory,'manifest.json')
+        assert os.path.exists(manifest_filename), f"No checkpoint found in '{directory}'"
+        with open(manifest_filename) as json_file:
+            manifest = json.load(json_file)
+        settings = manifest['settings']
+        assert settings['ensemble_size'] == self.ensemble_size, f"Checkpoint '{directory}' has {settings['ensemble_size']} members, window_params 'ensemble_size' is {self.ensemble_size}"
+        if settings['array_size'] != self.array_size:
+            print(f"Warning: checkpoint '{directory}' has an array_size of {settings['array_size']}, histories are cut or padded to {self.array_size}")
+        for setting in checkpoint_settings:
+            if setting in ['array_size','ensemble_size','kernel']: continue
+            setattr(self,setting,tuple(settings[setting]) if isinstance(settings[setting],list) else settings[setting])
+        if settings['kernel'] in self.kernels.keys(): self.set_kernel(settings['kernel'])
+        else: print(f"Warning: kernel '{settings['kernel']}' of the checkpoint not found, kernel '{self.kernel}' kept")
+
+        load = lambda filename,size: fit_history(np.load(os.path.join(directory,filename),mmap_mode='r'),size)
+        self.nstep = manifest['nstep']
+        self.time_stamp_history.fill(load(manifest['time'],self.array_size))
+        self.time_stamp = self.time_stamp_history.view()
+        for (items,kind) in [(self.variables,'variables'),(self.params,'params')]:
+            for name in items.keys():
+                if 'history' not in items[name]: continue
+                if name not in manifest[kind]:
+                    print(f"Warning: {name} not found in checkpoint '{directory}', current values kept")
+                    continue
+                items[name]['history'].fill(load(manifest[kind][name],items[name]['history'].size))
+                items[name]['value'] = items[name]['history'].view()
+        for variable in self.delay_buffers.keys():  # older checkpoints: delay buffers from the histories
+            if variable in manifest.get('delay_buffers',{}): self.delay_buffers[variable].load(np.load(os.path.join(directory,manifest['delay_buffers'][variable])))
+            else:                                            self.delay_buffers[variable].load(self.variables[variable]['value'])
+        for param in self.params.keys():
+            if param in manifest['ensemble_params']: self.last_params[param] = np.load(os.path.join(directory,manifest['ensemble_params'][param]))
+            else:                                    self.last_params[param] = self.params[param]['history'].last().item()
+        if self.noise_layout and 'noise' in manifest:
+            block = np.load(os.path.join(directory,manifest['noise']['block']))
+            if block.shape[1] == self.noise.block.shape[1]:
+                self.noise_seed = manifest['noise']['seed']
+                self.noise.generator.bit_generator.state = manifest['noise']['generator']
+                self.noise.block = block
+                self.noise.index = manifest['noise']['index']
+            else: print(f"Warning: noise of checkpoint '{directory}' has another number of components, noise generator kept")
+        self.state_up_to_date = False
+        self.DP45_state       = None
+        self.BDF2_state       = None
+        print(f'Checkpoint "{directory}" restored (step {self.nstep}, time {self.time_stamp[-1]})')
+
+    def set_timings(self,enabled):
+        """ Enable/disable the timings of the computation phases (self.timings). Equations are wrapped into timed functions only while enabled """
+        self.timings.enabled = enabled
+        for variable in self.variables.keys():
+            for key in ['equation','nonlinear'] if 'linear' in self.variables[variable] else ['equation']:
+                equation = self.variables[variable][key]
+                if enabled and not hasattr(equation,'untimed'):
+                    self.variables[variable][key] = self.timed_equation(('eq_' if self.variables[variable]['observable'] else 'diff_eq_')+variable,equation)
+                elif not enabled and hasattr(equation,'untimed'):
+                    self.variables[variable][key] = equation.untimed
+        self.state_equations = [self.variables[variable]['equation'] for variable in self.state_indices.keys()]
+
+    def timed_equation(self,phase,equation):
+        def timed(ui,variables,params):
+            time_start = perf_counter()
+            result = equation(ui,variables,params)
+            self.timings.add(phase,perf_counter()-time_start)
+            return result
+        timed.untimed = equation
+        return timed
+
+    def accepts_kernel(self,kernel):
+        """ Packed kernels integrate systems of ODEs only (no ensembles nor fields) """
+        return not ((self.ensemble_size > 1 or self.fields) and self.kernels[kernel]['packed'])
+
+    def set_kernel(self,kernel):
+        if not self.accepts_kernel(kernel):
+            print(f"WARNING: packed kernel '{kernel}' cannot integrate ensembles nor fields, kernel '{self.kernel}' kept")
+            return
+        if self.noise_layout and not self.kernels[kernel]['stochastic']: self.warn_deterministic_kernel(kernel)
+        self.kernel = kernel
+
+    def warn_deterministic_kernel(self,kernel):
+        print(f"WARNING: kernel '{kernel}' ignores the 'noise' of the variables, stochastic kernels: {[name for name in self.kernels.keys() if self.kernels[name]['stochastic']]}")
+
+    def noise_amplitude(self,variable,params):
+        amplitude = self.variables[variable]['noise']
+        return params[amplitude] if isinstance(amplitude,str) else amplitude
+
+    def noise_scales(self,params):
+        """ sigma sqrt(step_size) of each noisy variable (divided by sqrt(2) for complex ones) and repeated over its noise columns, updated only when an amplitude or step_size changed """
+        amplitudes = [self.noise_amplitude(variable,params) for (variable,start,size,shape,complex_valued) in self.noise_layout]
+        if self.noise_cache is None or self.noise_cache['amplitudes'] != amplitudes or self.noise_cache['step_size'] != self.step_size:
+            scales = [float(amplitude*np.sqrt(self.step_size/(2. if layout[4] else 1.))) for (amplitude,layout) in zip(amplitudes,self.noise_layout)]
+            self.noise_cache = {'amplitudes':amplitudes,'step_size':self.step_size,'scales':scales,'columns':np.repeat(scales,self.noise_sizes,axis=0) if self.noise_layout else np.zeros(0),'buffer':np.empty(sum(self.noise_sizes)),
+                                'packing':[(self.state_indices[variable],start,scale,complex_valued) for ((variable,start,size,shape,complex_valued),scale) in zip(self.noise_layout,scales)]}
+        return self.noise_cache
+
+    def noise_terms(self,params):
+        """ Noise terms sigma dW of the noisy variables over one step, {variable:term of its shape} (dict kernels). Complex variables get sigma (dW_real + i dW_imag)/sqrt(2), so that <|dW|^2> = step_size """
+        row    = self.noise.next()
+        scales = self.noise_scales(params)['scales']
+        terms  = {}
+        for ((variable,start,size,shape,complex_valued),scale) in zip(self.noise_layout,scales):
+            if not shape:  # scalar: Python numbers
+                terms[variable] = scale*(complex(row[start],row[start+1]) if complex_valued else float(row[start]))
+            else:
+                increments = row[start:start+size]
+                terms[variable] = scale*(increments.view(np.complex128) if complex_valued else increments).reshape(shape)
+        return terms
+
+    def state_noise(self,params):
+        """ Noise terms sigma dW over one step of the components of the packed state vector as a list of Python numbers, zero for the variables without noise (packed kernels) """
+        cache = self.noise_scales(params)
+        row   = self.noise.next().tolist()
+        noise = [0.]*len(self.state_indices)
+        for (index,column,scale,complex_valued) in cache['packing']:
+            noise[index] = scale*(complex(row[column],row[column+1]) if complex_valued else row[column])
+        return noise
+
+    def packed_noise(self,params):
+        """ Noise terms sigma dW over one step for the components self.noise_indices of the real view of the packed state vector (packed kernels) """
+        cache = self.noise_scales(params)
+        return np.multiply(self.noise.next(),cache['columns'],out=cache['buffer'])
+
+    def initial_values(self,variable):
+        """ Array of the history length filled with the init_cond of variable, with a column per member in ensemble mode ('init_cond' can then give one value per member), or field_history_size rows of the init_cond of a field """
+        if variable in self.fields:
+            return np.ones((self.field_history_size,)+self.fields[variable],dtype=self.variables[variable]['type']) * self.variables[variable]['init_cond']
+        if self.ensemble_size > 1 and not self.is_calculation_size(variable):
+            return self.variables[variable]['init_cond'] * np.ones((self.array_size,self.ensemble_size)).astype(self.variables[variable]['type'])
+        return self.variables[variable]['init_cond'] * np.ones(self.array_size).astype(self.variables[variable]['type'])
+
+    def reduce_members(self,value):
+        """ Members of an ensemble history (array_size, ensemble_size) or of an ensemble param reduced as window_params 'ensemble_plot': 'mean', 'std', 'min', 'max' (params: mean) or member index """
+        if np.ndim(value) == 0 or (np.ndim(value) == 1 and len(value) != self.ensemble_size) or np.ndim(value) > 2: return value
+        if isinstance(self.ensemble_plot,(int,np.integer)): return value[...,self.ensemble_plot]
+        if np.ndim(value) == 1: return np.mean(value)  # param
+        return getattr(np,self.ensemble_plot)(value,axis=1)
+
+    def reset_variable_to_init_cond(self,variable):
+        initial_values = self.initial_values(variable)
+        if self.is_calculation_size(variable):
+            self.variables[variable]['value'] = initial_values
+        else:
+            self.variables[variable]['history'].fill(initial_values)
+            self.variables[variable]['value'] = self.variables[variable]['history'].view()
+        if variable in self.delay_buffers: self.delay_buffers[variable].fill(self.initial_delayed_value(variable))
+        self.state_up_to_date = False
+
+    def is_calculation_size(self,variable):
+        return 'calculation_size' in self.variables[variable].keys() and self.variables[variable]['calculation_size']
+
+
+    def kernel_euler(self, variables, params):
+
+        """ N variables Euler algorithm (A = A + dt * eq_A(params)) """
+
+        new_variables = {}
+        for variable_name in variables.keys():
+            new_variables[variable_name] = variables[variable_name] + self.step_size * self.variables[variable_name]['equation'](self,variables,params)
+
+        return new_variables
+
+    @packed_kernel
+    def kernel_euler_packed(self, state, params):
+
+        """ N variables Euler algorithm on the packed state vector """
+
+        values = state.tolist()
+        coefs  = self.stage_derivatives(values,params)
+        state[:] = [value + self.step_size*coef for (value,coef) in zip(values,coefs)]
+
+        return state
+
+    @stochastic_kernel
+    def kernel_euler_maruyama(self, variables, params):
+
+        """ N variables Euler-Maruyama algorithm for stochastic equations (A = A + dt * eq_A(params) + sigma dW, white noise of amplitude sigma given by the variable key 'noise') """
+
+        noise = self.noise_terms(params)
+        new_variables = {}
+        for variable_name in variables.keys():
+            new_variables[variable_name] = variables[variable_name] + self.step_size * self.variables[variable_name]['equation'](self,variables,params)
+        for (variable_name,term) in noise.items():
+            new_variables[variable_name] = new_variables[variable_name] + term
+
+        return new_variables
+
+    @stochastic_kernel
+    @packed_kernel
+    def kernel_euler_maruyama_packed(self, state, params):
+
+        """ N variables Euler-Maruyama algorithm on the packed state vector """
+
+        values = state.tolist()
+        coefs  = self.stage_derivatives(values,params)
+        state[:] = [value + self.step_size*coef + noise for (value,coef,noise) in zip(values,coefs,self.state_noise(params))]
+
+        return state
+
+    @stochastic_kernel
+    def kernel_heun(self, variables, params):
+
+        """ N variables stochastic Heun algorithm (predictor-corrector with the same noise increment for both stages, strong order 1 for additive noise): predicted A* = A + dt * eq_A(A) + sigma dW, then A = A + dt/2 * (eq_A(A) + eq_A(A*)) + sigma dW """
+
+        noise = self.noise_terms(params)
+
+        coefs_1 = {}
+        self.stage_fraction = 0.
+        for variable_name in variables.keys():
+            coefs_1[variable_name] = self.variables[variable_name]['equation'](self,variables,params)
+        predicted_variables = {}
+        for variable_name in variables.keys():
+            predicted_variables[variable_name] = variables[variable_name] + self.step_size*coefs_1[variable_name] + noise.get(variable_name,0.)
+
+        new_variables = {}
+        self.stage_fraction = 1.
+        for variable_name in variables.keys():
+            new_variables[variable_name] = variables[variable_name] + (self.step_size/2.)*(coefs_1[variable_name] + self.variables[variable_name]['equation'](self,predicted_variables,params)) + noise.get(variable_name,0.)
+        self.stage_fraction = 0.
+
+        return new_variables
+
+    @stochastic_kernel
+    @packed_kernel
+    def kernel_heun_packed(self, state, params):
+
+        """ N variables stochastic Heun algorithm on the packed state vector """
+
+        values = state.tolist()
+        noise  = self.state_noise(params)
+
+        self.stage_fraction = 0.
+        coefs_1 = self.stage_derivatives(values,params)
+        self.stage_fraction = 1.
+        coefs_2 = self.stage_derivatives([value + self.step_size*coef + dW for (value,coef,dW) in zip(values,coefs_1,noise)],params)
+        self.stage_fraction = 0.
+
+        state[:] = [value + (self.step_size/2.)*(coef_1 + coef_2) + dW for (value,coef_1,coef_2,dW) in zip(values,coefs_1,coefs_2,noise)]
+
+        return state
+
+    def kernel_RK4(self, variables, params, equations=None):
+
+        """ N variables RK4 algorithm (equations: {variable:callable} integrated instead of the diff_eq_*, e.g. the nonlinear parts for kernel_splitstep) """
+
+        if equations is None: equations = {variable_name:self.variables[variable_name]['equation'] for variable_name in variables.keys()}
+        temp_variables = variables.copy()
+
+        # Loop for each coefficient on all equations (stage_fraction: time of the stage in the step, for delayed terms)
+        coefs_1 = {}
+        self.stage_fraction = 0.
+        for variable_name in variables.keys():
+            coefs_1[variable_name] = equations[variable_name](self,temp_variables,params)
+
+        coefs_2 = {}
+        self.stage_fraction = 0.5
+        for variable_name in variables.keys():    # evaluate variables first
+            temp_variables[variable_name] = variables[variable_name] + (self.step_size/2.)*coefs_1[variable_name]
+        for variable_name in variables.keys():
+            coefs_2[variable_name] = equations[variable_name](self,temp_variables,params)
+
+        coefs_3 = {}
+        for variable_name in variables.keys():
+            temp_variables[variable_name] = variables[variable_name] + (self.step_size/2.)*coefs_2[variable_name]
+        for variable_name in variables.keys():
+            coefs_3[variable_name] = equations[variable_name](self,temp_variables,params)
+
+        coefs_4 = {}
+        self.stage_fraction = 1.
+        for variable_name in variables.keys():
+            temp_variables[variable_name] = variables[variable_name] + self.step_size*coefs_3[variable_name]
+        for variable_name in variables.keys():
+            coefs_4[variable_name] = equations[variable_name](self,temp_variables,params)
+        self.stage_fraction = 0.
+
+        new_variables = {}
+        for variable_name in variables.keys():
+            new_variables[variable_name] = variables[variable_name] + (self.step_size/6.)*(coefs_1[variable_name]+2*coefs_2[variable_name]+2*coefs_3[variable_name]+coefs_4[variable_name])
+
+        return new_variables
+
+    def kernel_splitstep(self, variables, params):
+
+        """ Split-step Fourier algorithm (Strang splitting) for fields with a linear operator in Fourier space (key 'linear' or linear_{variable}): exact linear propagation over half a step, RK4 step of the nonlinear parts (diff_eq_*), exact linear propagation over half a step. Propagators are precomputed and only updated when a param used by a linear operator changes """
+
+        new_variables = variables.copy()
+        equations     = {}
+        for variable_name in variables.keys():
+            if 'linear' in self.variables[variable_name]:
+                new_variables[variable_name] = self.propagate_linear(variable_name,variables[variable_name],self.step_size/2.,params)
+                equations[variable_name]     = self.variables[variable_name]['nonlinear']
+            else:
+                equations[variable_name]     = self.variables[variable_name]['equation']
+
+        new_variables = self.kernel_RK4(new_variables,params,equations)
+        for variable_name in variables.keys():
+            if 'linear' in self.variables[variable_name]:
+                new_variables[variable_name] = self.propagate_linear(variable_name,new_variables[variable_name],self.step_size/2.,params)
+
+        return new_variables
+
+    @packed_kernel
+    def kernel_RK4_packed(self, state, params):
+
+        """ N variables RK4 algorithm on the packed state vector: the stages are lists of Python numbers (a single conversion from and to the vector per step) """
+
+        values = state.tolist()
+        half   = self.step_size/2.
+
+        self.stage_fraction = 0.
+        coefs_1 = self.stage_derivatives(values,params)
+        self.stage_fraction = 0.5
+        coefs_2 = self.stage_derivatives([value + half*coef for (value,coef) in zip(values,coefs_1)],params)
+        coefs_3 = self.stage_derivatives([value + half*coef for (value,coef) in zip(values,coefs_2)],params)
+        self.stage_fraction = 1.
+        coefs_4 = self.stage_derivatives([value + self.step_size*coef for (value,coef) in zip(values,coefs_3)],params)
+        self.stage_fraction = 0.
+
+        state[:] = [value + (self.step_size/6.)*(coef_1 + 2.*(coef_2 + coef_3) + coef_4) for (value,coef_1,coef_2,coef_3,coef_4) in zip(values,coefs_1,coefs_2,coefs_3,coefs_4)]
+
+        return state
+
+    @packed_kernel
+    def kernel_BDF2(self, state, params):
+
+        """ Implicit BDF2 algorithm for stiff systems (fast decaying modes stay stable whatever step_size), first step with implicit Euler. The implicit equation of each step is solved by Newton iterations reusing the same iteration matrix (I - 2/3 step_size J)^-1 over many steps: the Jacobian J (jac_{variable} or finite differences) is evaluated again only when a param or step_size changed, or when the iterations converge slowly. Complex variables are handled as pairs of real unknowns. Systems of ODEs only (no ensembles nor fields) """
+
+        # (Re)start from the state if it has been modified outside of this kernel (previous step unknown)
+        bdf = self.BDF2_state
+        if bdf is None or not np.array_equal(state,bdf['y_grid']) or bdf['step_size'] != self.step_size:
+            bdf = self.BDF2_state = {'y_grid':state.copy(),'y_previous':None,'step_size':self.step_size,'params':None,'jacobian':None,'gamma_h':None,'matrix':None,'f':np.empty(2*len(state) if np.iscomplexobj(state) else len(state)),'njev':0}
+        if list(params.values()) != bdf['params']:
+            bdf['jacobian'] = None
+            bdf['params']   = list(params.values())
+
+        y = state.view(np.float64)
+        if bdf['y_previous'] is None:   # implicit Euler: z = y + h f(z)
+            gamma,history,z_predicted = 1.,y.copy(),y.copy()
+        else:                           # BDF2: z = (4 y - y_previous)/3 + 2/3 h f(z)
+            gamma       = 2./3.
+            history     = (4.*y - bdf['y_previous'])/3.
+            z_predicted = 2.*y - bdf['y_previous']
+
+        # Fast transient (e.g. relaxation jump) where the iterations fail: the step is split into implicit Euler substeps
+        self.stage_fraction = 1.
+        z,converged = self.BDF2_newton(bdf,history,gamma*self.step_size,z_predicted,params)
+        nb_substeps = 1
+        while not converged and nb_substeps < 64:
+            nb_substeps *= 2
+            z = y.copy()
+            for substep in range(nb_substeps):
+                self.stage_fraction = (substep+1)/nb_substeps
+                z,converged = self.BDF2_newton(bdf,z.copy(),self.step_size/nb_substeps,z.copy(),params)
+                if not converged: break
+        if not converged: print(f"WARNING: kernel 'BDF2' Newton iterations did not converge at step {self.nstep}, reduce step_size")
+        self.stage_fraction = 0.
+
+        bdf['y_previous'] = y.copy()
+        y[:] = z
+        bdf['y_grid'][:] = state
+
+        return state
+
+    def BDF2_newton(self,bdf,history,gamma_h,z,params):
+        """ Solve z = history + gamma_h f(z) (kernel_BDF2) by Newton iterations from z, with the iteration matrix (I - gamma_h J)^-1 kept in bdf from the previous steps. If they converge too slowly, the Jacobian is evaluated again at the last iterate and the iterations go on from there. Returns (z, converged) """
+        f = bdf['f']
+        for attempt in range(3):
+            if bdf['jacobian'] is None:
+                bdf['jacobian'] = self.evaluate_jacobian(z,params,self.real_derivatives(z,params,f))
+                bdf['njev']    += 1
+                bdf['gamma_h']  = None
+            if bdf['gamma_h'] != gamma_h:
+                bdf['matrix']  = np.linalg.inv(np.eye(len(z)) - gamma_h*bdf['jacobian'])
+                bdf['gamma_h'] = gamma_h
+
+            z_start,norm_previous = z.copy(),None
+            for iteration in range(10):
+                dz    = bdf['matrix'] @ (history + gamma_h*self.real_derivatives(z,params,f) - z)
+                z    += dz
+                norm  = np.sqrt(np.mean((dz/(self.atol+self.rtol*np.abs(z)))**2))
+                if norm < 1.:
+                    if iteration > 3: bdf['jacobian'] = None  # slow convergence: new Jacobian for the next step
+                    return z,True
+                if not np.isfinite(norm) or (norm_previous is not None and norm > 0.9*norm_previous): break  # too slow or diverging
+                norm_previous = norm
+            z = z_start if not np.all(np.isfinite(z)) else z
+            bdf['jacobian'] = None
+        return z,False
+
+    @packed_kernel
+    def kernel_DP45(self, state, params):
+
+        """ Adaptive Dormand-Prince 5(4) algorithm with dense output. Internal steps grow or shrink to keep the local error within 'rtol'/'atol' (window_params) while the returned states stay on the uniform step_size grid (interpolated without extra equation evaluation). Systems of ODEs only (no ensembles nor fields) """
+
+        # (Re)start the internal integration if the state or a param has been modified outside of this kernel
+        dp = self.DP45_state
+        if dp is None or not np.array_equal(state,dp['y_grid']) or list(params.values()) != dp['params']:
+            dp = self.DP45_state = {'t':0.,'t_grid':0.,'h':self.step_size,'y':state.copy(),'y_grid':state.copy(),'params':list(params.values()),'K':np.empty((7,)+state.shape,dtype=state.dtype),'fsal':False,'nfev':1}
+            self.stage_fraction = 0.
+            self.derivatives(dp['y'],params,dp['K'][0])
+
+        K        = dp['K']
+        t_target = dp['t_grid'] + self.step_size
+        rejected = False
+        while dp['t'] < t_target:
+            if self.delay_buffers: dp['h'] = min(dp['h'],self.step_size)  # delayed terms are only known up to the last grid point
+            h = dp['h']
+            y = dp['y']
+            if dp['fsal']:  # last stage of the previous accepted step is the first of this one
+                K[0]       = K[6]
+                dp['fsal'] = False
+            for i in range(1,6):
+                self.stage_fraction = (dp['t'] + DP45_C[i]*h - dp['t_grid'])/self.step_size
+                self.derivatives(y + h*np.dot(DP45_A[i],K[:i]),params,K[i])
+            y_new = y + h*np.dot(DP45_B,K[:6])
+            self.stage_fraction = (dp['t'] + h - dp['t_grid'])/self.step_size
+            self.derivatives(y_new,params,K[6])
+            dp['nfev'] += 6
+
+            # Local error estimate (rms norm scaled by the tolerances)
+            scale      = self.atol + self.rtol*np.maximum(np.abs(y),np.abs(y_new))
+            error_norm = np.sqrt(np.mean(np.abs(h*np.dot(DP45_E,K)/scale)**2))
+            if error_norm < 1.:
+                factor = 10. if error_norm == 0. else min(10.,0.9*error_norm**-0.2)
+                if rejected: factor = min(1.,factor)
+                dp['t0'],dp['h0'],dp['y0'] = dp['t'],h,y   # accepted step kept for dense output
+                dp['t'] += h
+                dp['y']  = y_new
+                dp['h']  = h*factor
+                dp['fsal'] = True
+                rejected   = False
+            else:
+                dp['h']  = h*max(0.2,0.9*error_norm**-0.2)
+                rejected = True
+
+        self.stage_fraction = 0.
+
+        # Dense output on the grid point (inside the last accepted step)
+        x = (t_target - dp['t0'])/dp['h0']
+        state[:] = dp['y0'] + dp['h0']*np.dot(np.dot(DP45_P,x**np.arange(1,5)),K)
+        dp['y_grid'][:] = state
+        dp['t_grid']    = t_target
+
+        return state
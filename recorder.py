@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# Streaming recorder of the traces ('r' key): recorded steps are copied into preallocated column chunks, and a writer
+# thread saves each full chunk as a .npz file of the record directory while the simulation runs (memory stays bounded).
+# Offline conversion of a record directory: python recorder.py record_directory output.xlsx (or .csv/.npz)
+
+import os
+import glob
+import queue
+import argparse
+import threading
+import numpy as np
+from modele import save_columns
+
+
+### BEGIN Recorder class ###
+class Recorder():
+
+    """ Column oriented recorder writing chunks of chunk_size rows (chunk_000000.npz, chunk_000001.npz, ...) into directory from a background thread. Only nb_buffers chunks are allocated: if the writer is late, appending waits for a free one """
+
+    def __init__(self,directory,dtypes,chunk_size=10000,nb_buffers=3):
+        self.directory  = directory
+        self.chunk_size = chunk_size
+        self.nb_chunks  = 0  # chunks handed over to the writer
+        os.makedirs(directory,exist_ok=True)
+        for filename in glob.glob(os.path.join(directory,'chunk_*.npz')):  # previous record in the same directory
+            os.remove(filename)
+
+        self.free_buffers = queue.Queue()
+        for i in range(nb_buffers):
+            self.free_buffers.put({key:np.empty(chunk_size,dtype=dtype) for (key,dtype) in dtypes.items()})
+        self.buffer   = self.free_buffers.get()
+        self.nb_rows  = 0     # rows filled in the current buffer
+        self.to_write = queue.Queue()
+        self.writer   = threading.Thread(target=self.write_chunks,daemon=True)
+        self.writer.start()
+
+    def append_row(self,row):
+        """ Append one recorded step, row: {key:scalar} """
+        for (key,value) in row.items():
+            self.buffer[key][self.nb_rows] = value
+        self.nb_rows += 1
+        if self.nb_rows == self.chunk_size: self.flush()
+
+    def extend(self,columns):
+        """ Append several recorded steps, columns: {key:1D array}, all of the same length """
+        nb_values = len(next(iter(columns.values())))
+        start = 0
+        while start < nb_values:
+            nb_copied = min(nb_values-start,self.chunk_size-self.nb_rows)
+            for (key,value) in columns.items():
+                self.buffer[key][self.nb_rows:self.nb_rows+nb_copied] = value[start:start+nb_copied]
+            self.nb_rows += nb_copied
+            start        += nb_copied
+            if self.nb_rows == self.chunk_size: self.flush()
+
+    def flush(self):
+        """ Hand the current (possibly partial) chunk over to the writer and take a free buffer """
+        if self.nb_rows == 0: return
+        self.to_write.put((self.nb_chunks,self.buffer,self.nb_rows))
+        self.nb_chunks += 1
+        self.buffer     = self.free_buffers.get()
+        self.nb_rows    = 0
+
+    def write_chunks(self):
+        while True:
+            item = self.to_write.get()
+            if item is None: return
+            index,buffer,nb_rows = item
+            np.savez(os.path.join(self.directory,f'chunk_{index:06d}.npz'),**{key:value[:nb_rows] for (key,value) in buffer.items()})
+            self.free_buffers.put(buffer)
+
+    def close(self):
+        """ Write the last chunk and wait for the writer to finish """
+        self.flush()
+        self.to_write.put(None)
+        self.writer.join()
+        print(f'Record "{self.directory}" saved ({self.nb_chunks} chunks of {self.chunk_size} steps)')
+
+
+def load_record(directory):
+
+    """ Dict {key:array} of the whole record saved in directory by a Recorder """
+
+    filenames = sorted(glob.glob(os.path.join(directory,'chunk_*.npz')))
+    assert len(filenames) > 0, f"No record found in '{directory}'"
+    chunks = [np.load(filename) for filename in filenames]
+    return {key:np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0].files}
+
+def convert_record(directory,filename):
+
+    """ Convert a record directory into a single file (.xlsx, .csv or .npz, see modele.save_columns) """
+
+    save_columns(filename,load_record(directory))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a record directory (written with the "r" key) into a single .xlsx, .csv or .npz file')
+    parser.add_argument('directory', help='record directory (e.g. my_file_record)')
+    parser.add_argument('filename' , help='output file, format chosen from the extension')
+    arguments = parser.parse_args()
+    convert_record(arguments.directory,arguments.filename)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# Hand-over of plot data to docks rendered in RemoteGraphicsView subprocesses (window_params 'remote_docks' or dock key 'remote').
+# The main process copies each array once per frame into a shared memory block (SharedArrays); only the small
+# descriptors (slot, name, shape, dtype) are pickled and the remote process reads the arrays with set_data.
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+### BEGIN SharedArrays class ###
+class SharedArrays():
+
+    """ (main process) Arrays copied into shared memory blocks, two blocks per key written in turn: a frame is written into one block while the asynchronous remote call of the previous frame may still read the other. A block is written again only once the remote call reading it returned (see sent), and reallocated (twice larger) when an array does not fit """
+
+    def __init__(self):
+        self.blocks  = {}     # key: [block, block], block: {'memory': SharedMemory, 'descriptor': (slot, name, shape, dtype) of the last array written, 'request': remote call reading it}
+        self.current = {}     # key: index of the block of the current frame
+        self.written = set()  # keys already written during the current frame
+
+    def new_frame(self):
+        self.written = set()
+
+    def write(self,key,array):
+        """ Copy array into a block of key (once per frame) and return its descriptor (slot, name, shape, dtype) """
+        array = np.asarray(array)
+        if key in self.written: return self.blocks[key][self.current[key]]['descriptor']
+        if key not in self.blocks:
+            self.blocks[key],self.current[key] = [None,None],1
+        index = self.current[key] = 1 - self.current[key]
+        block = self.blocks[key][index]
+        if block is not None: self.wait(block)
+        if block is None or block['memory'].size < array.nbytes:
+            if block is not None: self.unlink(block['memory'])  # no remote call reads it anymore, the remote process closes it when it sees the new block of the slot
+            block = self.blocks[key][index] = {'memory':shared_memory.SharedMemory(create=True,size=max(2*array.nbytes,1)),'descriptor':None,'request':None}
+        np.copyto(np.ndarray(array.shape,dtype=array.dtype,buffer=block['memory'].buf),array)
+        block['descriptor'] = (f'{key}/{index}',block['memory'].name,array.shape,array.dtype.str)
+        block['request']    = None
+        self.written.add(key)
+        return block['descriptor']
+
+    def sent(self,keys,request):
+        """ Request of the remote call reading the blocks of keys written during the current frame """
+        for key in keys:
+            self.blocks[key][self.current[key]]['request'] = request
+
+    def wait(self,block):
+        """ Wait until the remote call reading block returned """
+        if block['request'] is None: return
+        try:    block['request'].result()
+        except Exception: pass  # closed remote process, or error of the call (reported by the remote process)
+        block['request'] = None
+
+    def unlink(self,memory):
+        memory.close()
+        memory.unlink()
+
+    def close(self):
+        for blocks in self.blocks.values():
+            for block in blocks:
+                if block is not None: self.unlink(block['memory'])
+        self.blocks,self.current = {},{}
+
+
+# Shared memory blocks attached in the remote process, by slot (key and block index)
+attached_memories = {}
+
+def set_data(item,method,descriptors):
+
+    """ (remote process) Call item.method(*arrays) with arrays read from the shared memory blocks given by their descriptors. Arrays are copied so that the main process can write into the blocks once this call returned. A block replaced in its slot (reallocated) is closed """
+
+    arrays = []
+    for (slot,name,shape,dtype) in descriptors:
+        memory = attached_memories.get(slot)
+        if memory is None or memory.name != name:
+            if memory is not None: memory.close()
+            memory = attached_memories[slot] = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(memory._name,'shared_memory')  # owned (and unlinked) by the main process
+        arrays.append(np.ndarray(shape,dtype=dtype,buffer=memory.buf).copy())
+    getattr(item,method)(*arrays)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Finite-difference operators for fields (variables whose init_cond is a 1D or 2D array): partial differential equations
+# are integrated by the usual kernels as systems of ODEs on the grid (method of lines). Whole-array slicing, cost linear in grid size.
+# In the input file: from stencils import laplacian, gradient
+#     def diff_eq_A(ui,variables,params): return 1j*laplacian(variables['A'],params['dx']) - variables['A']
+# Spectral alternative for periodic fields (kernel 'splitstep'): the linear part is declared in Fourier space with the wavenumbers of the grid
+#     k = wavenumbers(nb_points,dx)
+#     def linear_A(ui,params): return -1j*k**2 - 1.
+
+import numpy as np
+
+accepted_boundaries = ['periodic','dirichlet','neumann']
+
+
+def second_difference(field,axis,boundary='periodic',value=0.):
+
+    """ f[i+1] - 2 f[i] + f[i-1] along axis. Boundaries: 'periodic', 'dirichlet' (ghost points at value) or 'neumann' (zero flux, ghost points mirrored about the first and last grid points, see grid with periodic=False) """
+
+    assert boundary in accepted_boundaries, f"Boundary '{boundary}' not understood. Must be in {accepted_boundaries}"
+    field  = np.asarray(field)
+    result = np.empty_like(field)
+    f,r = np.moveaxis(field,axis,0),np.moveaxis(result,axis,0)  # views, the axis first
+    r[1:-1]  = f[2:] + f[:-2]
+    r[1:-1] -= 2.*f[1:-1]
+    if boundary == 'periodic':
+        r[0]  = f[1] - 2.*f[0] + f[-1]
+        r[-1] = f[0] - 2.*f[-1] + f[-2]
+    elif boundary == 'dirichlet':
+        r[0]  = f[1] - 2.*f[0] + value
+        r[-1] = value - 2.*f[-1] + f[-2]
+    else:  # ghost points f[-1] = f[1] and f[n] = f[n-2]: zero derivative on the first and last grid points
+        r[0]  = 2.*(f[1] - f[0])
+        r[-1] = 2.*(f[-2] - f[-1])
+    return result
+
+def laplacian(field,dx,boundary='periodic',value=0.):
+
+    """ Laplacian of a 1D or 2D field (second order centred differences), dx: grid step (or one per axis) """
+
+    dx     = np.broadcast_to(dx,(np.ndim(field),))
+    result = second_difference(field,0,boundary,value)/dx[0]**2
+    for axis in range(1,np.ndim(field)):
+        result += second_difference(field,axis,boundary,value)/dx[axis]**2
+    return result
+
+def gradient(field,dx,axis=0,boundary='periodic',value=0.):
+
+    """ Derivative of a field along axis (second order centred differences), same boundaries as second_difference """
+
+    assert boundary in accepted_boundaries, f"Boundary '{boundary}' not understood. Must be in {accepted_boundaries}"
+    field  = np.asarray(field)
+    result = np.empty_like(field)
+    f,r = np.moveaxis(field,axis,0),np.moveaxis(result,axis,0)
+    r[1:-1] = f[2:] - f[:-2]
+    if boundary == 'periodic':
+        r[0]  = f[1] - f[-1]
+        r[-1] = f[0] - f[-2]
+    elif boundary == 'dirichlet':
+        r[0]  = f[1] - value
+        r[-1] = value - f[-2]
+    else:
+        r[0]  = 0.
+        r[-1] = 0.
+    result /= 2.*dx
+    return result
+
+def grid(length,nb_points,periodic=True):
+
+    """ Coordinates of nb_points grid points over length (the last point excluded if periodic) and the grid step """
+
+    x = np.linspace(0.,length,nb_points,endpoint=not periodic)
+    return x,x[1]-x[0]
+
+def wavenumbers(shape,dx):
+
+    """ Angular wavenumbers of the FFT of a periodic field of shape (int for 1D), dx: grid step (or one per axis). 2D: tuple (kx, ky) broadcasting to shape, e.g. laplacian -(kx**2+ky**2) """
+
+    shape = np.atleast_1d(shape)
+    dx    = np.broadcast_to(dx,(len(shape),))
+    k     = [2.*np.pi*np.fft.fftfreq(nb_points,step) for (nb_points,step) in zip(shape,dx)]
+    if len(k) == 1: return k[0]
+    return tuple(np.reshape(k_axis,[-1 if axis == index else 1 for axis in range(len(k))]) for (index,k_axis) in enumerate(k))
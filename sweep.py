@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# Parameter sweeps without GUI: independent integrations of the model of an input file, distributed over a process pool.
+# Each point is integrated for a warm-up (discarded) and a settle time over which statistics of observables are taken.
+# python sweep.py -f model_input.py --param f=0:10:0.1 --param delta=-8,-6 --observables mod_A mod_B --out sweep.npz
+
+import os
+import argparse
+import itertools
+import numpy as np
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from modele import Modele, parse_arguments, save_columns
+
+accepted_statistics = ['mean','std','min','max','final']
+
+
+def parameter_points(grid):
+
+    """ List of the points {param:value} of the cartesian product of grid {param:list of values} (the last param varies fastest) """
+
+    return [dict(zip(grid.keys(),values)) for values in itertools.product(*grid.values())]
+
+def parse_values(text):
+
+    """ Values of a --param option: 'start:stop:step' (stop included) or comma separated values """
+
+    if ':' in text:
+        start,stop,step = [float(value) for value in text.split(':')]
+        return np.arange(start,stop+step/2.,step)
+    return np.array([float(value) for value in text.split(',')])
+
+
+### BEGIN SweepStatistics class ###
+class SweepStatistics():
+
+    """ Running statistics of an observable over the successive chunks of samples of the settle time """
+
+    def __init__(self):
+        self.count   = 0
+        self.sum     = 0.
+        self.sum_sq  = 0.
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.final   = np.nan
+
+    def add(self,values):
+        self.count  += len(values)
+        self.sum    += np.sum(values)
+        self.sum_sq += np.sum(values**2)
+        self.minimum = min(self.minimum,np.min(values))
+        self.maximum = max(self.maximum,np.max(values))
+        self.final   = values[-1]
+
+    def value(self,statistic):
+        if statistic == 'mean':  return self.sum/self.count
+        if statistic == 'std':   return np.sqrt(max(self.sum_sq/self.count-(self.sum/self.count)**2,0.))
+        if statistic == 'min':   return self.minimum
+        if statistic == 'max':   return self.maximum
+        if statistic == 'final': return self.final
+
+
+# Model of the current worker process, loaded once per process
+worker_modele = None
+
+def run_points(filename,points,observables,nstep_warmup,nstep_settle,statistics,seed_from_neighbour,restore=None):
+
+    """ (worker process) Integrate the points one after the other. Each point starts from the initial conditions (or the checkpoint directory restore), or from the final state of the previous point if seed_from_neighbour. Returns {column:array} of the statistics """
+
+    global worker_modele
+    if worker_modele is None:
+        worker_modele = Modele(parse_arguments([] if filename is None else ['-f',filename]))
+    modele = worker_modele
+    for observable in observables:
+        assert observable in modele.variables.keys() and 'history' in modele.variables[observable], f"Sweep observable '{observable}' must be a variable or an observable with history (not 'calculation_size')"
+        assert observable not in modele.fields, f"Sweep observable '{observable}' is a field, use an observable reducing it to a number (e.g. its mean)"
+        assert not np.iscomplexobj(modele.variables[observable]['value']), f"Sweep observable '{observable}' is complex, use a real valued observable (e.g. its modulus)"
+
+    for point in points:
+        for (param,value) in point.items():
+            assert param in modele.params.keys(), f"Swept param '{param}' not understood. Must be in {list(modele.params.keys())}"
+            assert not np.issubdtype(modele.params[param]['value'].dtype,np.integer) or float(value).is_integer(), f"Value {value} of the integer param '{param}' is not an integer"
+
+    results = {f'{observable}_{statistic}':np.empty(len(points)) for observable in observables for statistic in statistics}
+    for (index,point) in enumerate(points):
+        if (index == 0 or not seed_from_neighbour) and restore is not None:
+            modele.restore_checkpoint(restore)
+        elif index == 0 or not seed_from_neighbour:
+            for variable in modele.variables.keys():
+                modele.reset_variable_to_init_cond(variable)
+            for param in modele.params.keys():
+                modele.set_param_value(param,modele.params[param]['init_cond'])
+        for (param,value) in point.items():
+            modele.set_param_value(param,value)
+        modele.update_observables(0)
+
+        nstep_done = 0
+        while nstep_done < nstep_warmup:
+            nstep = min(modele.array_size,nstep_warmup-nstep_done)
+            modele.advance(nstep)
+            nstep_done += nstep
+
+        running_statistics = {observable:SweepStatistics() for observable in observables}
+        nstep_done = 0
+        while nstep_done < nstep_settle:
+            nstep = min(modele.array_size,nstep_settle-nstep_done)
+            modele.advance(nstep)
+            for observable in observables:
+                running_statistics[observable].add(modele.variables[observable]['value'][-nstep:])
+            nstep_done += nstep
+
+        for observable in observables:
+            for statistic in statistics:
+                results[f'{observable}_{statistic}'][index] = running_statistics[observable].value(statistic)
+    return results
+
+def sweep(grid,observables,nstep_warmup=1000,nstep_settle=1000,statistics=('mean','min','max'),filename=None,out=None,seed_from_neighbour=False,max_workers=None,restore=None):
+
+    """ Sweep the cartesian product of grid {param:list of values} in parallel processes and return {column:array} with a column per param and per statistic of each observable ('{observable}_{statistic}', statistics among 'mean', 'std', 'min', 'max', 'final'), saved into out if given (.npz, .csv, .parquet or .xlsx). filename is the input file (default model_input.py). With seed_from_neighbour, the points along the last param are integrated in order, each one starting from the final state of the previous one (continuation). With restore (checkpoint directory, see Modele.save_checkpoint), points start from the checkpoint instead of the initial conditions """
+
+    for statistic in statistics:
+        assert statistic in accepted_statistics, f"Statistic '{statistic}' not understood. Must be in {accepted_statistics}"
+    assert nstep_settle > 0, "The settle time must be of at least 1 step"
+    points = parameter_points(grid)
+
+    # Contiguous chunks of points: lines along the last param when seeding from neighbours, otherwise a few chunks per process
+    if max_workers is None: max_workers = os.cpu_count()
+    if seed_from_neighbour: chunk_size = len(list(grid.values())[-1])
+    else:                   chunk_size = max(1,int(np.ceil(len(points)/(4*max_workers))))
+    chunks = [points[start:start+chunk_size] for start in range(0,len(points),chunk_size)]
+
+    time_start = perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_points,filename,chunk,observables,nstep_warmup,nstep_settle,statistics,seed_from_neighbour,restore) for chunk in chunks]
+        chunk_results = [future.result() for future in futures]
+    elapsed_time = perf_counter() - time_start
+    print(f'{len(points)} points swept in {elapsed_time:.3f} s ({len(points)*(nstep_warmup+nstep_settle)/elapsed_time:.1f} steps/s)')
+
+    results = {param:np.array([point[param] for point in points]) for param in grid.keys()}
+    for key in chunk_results[0].keys():
+        results[key] = np.concatenate([chunk_result[key] for chunk_result in chunk_results])
+    if out is not None: save_columns(out,results)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep of a GUIDE model (no GUI)')
+    parser.add_argument('-f', dest='filename', default=None, help='input file to load the model from (default: model_input.py)')
+    parser.add_argument('--param', action='append', required=True, help="swept param as name=start:stop:step (stop included) or name=v1,v2,...; repeat for a grid. Values of integer params (integer 'init_cond') must be integers, other values are rejected instead of truncated")
+    parser.add_argument('--observables', nargs='+', required=True, help='variables/observables (with history) whose statistics are collected')
+    parser.add_argument('--stats', nargs='+', default=['mean','min','max'], help=f'statistics over the settle time among {accepted_statistics}')
+    parser.add_argument('--warmup', type=int, default=1000, help='number of discarded time steps of each point')
+    parser.add_argument('--settle', type=int, default=1000, help='number of time steps of each point over which statistics are taken')
+    parser.add_argument('--seed-from-neighbour', action='store_true', help='start each point from the final state of the previous one along the last param')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: number of CPUs)')
+    parser.add_argument('--out', default=None, help='file where the results are saved (.npz, .csv, .parquet or .xlsx)')
+    parser.add_argument('--restore', default=None, help='checkpoint directory the points start from (warm start) instead of the initial conditions')
+    arguments = parser.parse_args()
+
+    grid = {}
+    for param_option in arguments.param:
+        param,values = param_option.split('=')
+        grid[param] = parse_values(values)
+    sweep(grid,arguments.observables,arguments.warmup,arguments.settle,arguments.stats,arguments.filename,arguments.out,arguments.seed_from_neighbour,arguments.workers,arguments.restore)
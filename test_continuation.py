@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Tests of the steady states and continuation of continuation.py: python -m pytest
+
+import numpy as np
+from modele import Modele, parse_arguments
+from continuation import continue_branch, steady_state
+
+brusselator = '''
+    import numpy as np
+    window_params = {'kernel': 'RK4_packed', 'step_size': 0.01, 'array_size': 1000}
+    def load_docks(): return {'plot1':{'type':'plot1D'}}
+    def load_variables(): return {'x':{'type':np.float64,'init_cond':1.},'y':{'type':np.float64,'init_cond':1.}}
+    def load_observables(): return {}
+    def load_params(): return {'a':{'init_cond':1.,'min':0.,'max':5.,'step':0.01},'b':{'init_cond':1.,'min':0.,'max':5.,'step':0.01}}
+    def diff_eq_x(ui,v,p): return p['a'] - (p['b']+1.)*v['x'] + v['x']**2*v['y']
+    def diff_eq_y(ui,v,p): return p['b']*v['x'] - v['x']**2*v['y']
+    def keyboard_keys(): return {}
+'''
+
+def test_folds_of_model_input():
+    """ Bistable branch of the reference example: two folds, last point on the bound """
+    modele = Modele(parse_arguments([]))
+    branch,bifurcations = continue_branch(modele,'f',10.,start=0.)
+    folds = sorted([bifurcation['f'] for bifurcation in bifurcations if bifurcation['type'] == 'fold'])
+    assert np.allclose(folds,[2.270,4.751],atol=2e-3)
+    assert branch['f'][0] == 0. and branch['f'][-1] == 10. and np.all(branch['f'] <= 10.)
+    assert not np.all(branch['stable'])  # middle part of the S-shaped branch
+
+def test_hopf_of_brusselator(model_from_source):
+    """ Steady state (a, b/a) of the Brusselator, Hopf bifurcation at b = 1 + a**2 """
+    modele = model_from_source('model_brusselator',brusselator)
+    y,converged = steady_state(modele)
+    assert converged and np.allclose(y,[1.,1.])
+    branch,bifurcations = continue_branch(modele,'b',3.)
+    hopf = [bifurcation for bifurcation in bifurcations if bifurcation['type'] == 'hopf']
+    assert len(hopf) == 1 and abs(hopf[0]['b']-2.) < 1e-3 and abs(hopf[0]['frequency']-1.) < 1e-2
+    assert branch['b'][-1] == 3. and np.all(branch['stable'] == (branch['b'] < 2.))
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# Tests of the min/max decimation of plot1D curves: python -m pytest
+
+import numpy as np
+from modele import RingBuffer
+from decimation import MinMaxPyramid
+
+
+def update(pyramid,history):
+    pyramid.update(history.view(),history.count,history.revision,history.version)
+
+def test_decimation_follows_appends():
+    history = RingBuffer(np.zeros(1000))
+    pyramid = MinMaxPyramid(1000)
+    update(pyramid,history)
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        history.extend(rng.standard_normal(137))
+        update(pyramid,history)
+        x,y = pyramid.decimate(history.view(),0,1000,100)
+        assert y.max() == history.view().max() and y.min() == history.view().min()
+
+def test_decimation_follows_set_last():
+    """ A set_last (e.g. param or IC modified while paused) only changes the version of the history """
+    history = RingBuffer(np.zeros(1000))
+    pyramid = MinMaxPyramid(1000)
+    history.extend(np.sin(np.arange(500.)))
+    update(pyramid,history)
+    history.set_last(10.)
+    update(pyramid,history)
+    x,y = pyramid.decimate(history.view(),0,1000,100)
+    assert y.max() == 10.
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# Tests of the model without GUI: python -m pytest
+
+import pytest
+import numpy as np
+from modele import Modele, parse_arguments
+
+
+def load_model(filename):
+    return Modele(parse_arguments(['-f',filename]))
+
+def test_pde_reset_init_cond():
+    """ Pointwise field observable re-evaluated on the whole field history after a reset of the ICs """
+    modele = load_model('model_input_PDE')
+    modele.advance(50)
+    for variable in modele.state_indices.keys():
+        modele.reset_variable_to_init_cond(variable)
+    modele.update_observables(0)
+    psi = modele.variables['psi']['value']
+    assert modele.variables['intensity']['value'].shape == psi.shape
+    assert np.allclose(modele.variables['intensity']['value'],np.abs(psi)**2)
+    modele.advance(30)
+    assert np.allclose(modele.variables['intensity']['value'][-1],np.abs(modele.variables['psi']['value'][-1])**2)
+
+def test_pde_restore_checkpoint(tmp_path):
+    """ Field histories restored from a checkpoint, then integration goes on as from the saved state """
+    modele = load_model('model_input_PDE')
+    modele.advance(50)
+    modele.save_checkpoint(str(tmp_path))
+    saved = modele.variables['psi']['value'].copy()
+    modele.advance(30)
+    modele.restore_checkpoint(str(tmp_path))
+    modele.update_observables(0)
+    assert np.array_equal(modele.variables['psi']['value'],saved)
+    assert np.allclose(modele.variables['intensity']['value'],np.abs(saved)**2)
+    modele.advance(30)
+    assert np.all(np.isfinite(modele.variables['psi']['value'][-1]))
+
+def test_field_observables_over_several_steps():
+    """ Field observables written over nstep > 1 steps: one row every nstep_field_history steps """
+    modele = load_model('model_input_PDE')
+    modele.advance(45)  # the last row was opened at step 40
+    modele.update_observables(50)
+    assert modele.history_rows('psi',50) == 3
+    assert np.allclose(modele.variables['intensity']['value'][-3:],np.abs(modele.variables['psi']['value'][-3:])**2)
+
+def test_ode_kernels_refused_for_fields(monkeypatch):
+    """ Packed kernels without a dict counterpart (e.g. 'BDF2', 'DP45') are refused for fields instead of switching to another kernel """
+    modele = load_model('model_input_PDE')
+    for kernel in ['BDF2','DP45']:
+        modele.set_kernel(kernel)
+        assert modele.kernel == 'splitstep'
+    import model_input_PDE
+    monkeypatch.setitem(model_input_PDE.window_params,'kernel','BDF2')
+    with pytest.raises(AssertionError):
+        load_model('model_input_PDE')
+
+mixed_model = '''
+    import numpy as np
+    window_params = {'kernel': 'RK4', 'step_size': 0.01, 'array_size': 1000, 'noise_seed': 1234}
+    def load_docks(): return {'plot1':{'type':'plot1D'}}
+    def load_variables(): return {'E':{'type':np.complex128,'init_cond':0.1,'noise':'sigma'},'N':{'type':np.float64,'init_cond':0.,'noise':'sigma'}}
+    def load_observables(): return {}
+    def load_params(): return {'P':{'init_cond':2.,'min':0.,'max':5.,'step':0.01},'sigma':{'init_cond':0.01,'min':0.,'max':1.,'step':0.01}}
+    def diff_eq_E(ui,variables,params): return (1j + variables['N'] - 1.)*variables['E']
+    def diff_eq_N(ui,variables,params): return params['P'] - variables['N'] - max(variables['N'],0.)*abs(variables['E'])**2
+    def keyboard_keys(): return {}
+'''
+
+def test_packed_kernels_real_variables_of_complex_state(model_from_source):
+    """ Real variables of a complex state vector reach diff_eq_* as floats (max(N,0.) would fail on a complex): packed kernels follow their dict versions """
+    def trajectories(kernel):
+        modele = model_from_source('model_mixed',mixed_model)
+        modele.set_kernel(kernel)
+        modele.advance(500)
+        assert modele.variables['N']['value'].dtype == np.float64
+        return modele.variables['E']['value'][-500:].copy(),modele.variables['N']['value'][-500:].copy()
+    for kernel in ['euler','RK4','euler_maruyama','heun']:
+        for (dict_values,packed_values) in zip(trajectories(kernel),trajectories(kernel+'_packed')):
+            assert np.allclose(dict_values,packed_values,rtol=0.,atol=1e-12), kernel
+    for (kernel,tolerance) in [('DP45',1e-5),('BDF2',1e-3)]:  # BDF2 is second order
+        for (dict_values,values) in zip(trajectories('RK4'),trajectories(kernel)):
+            assert np.allclose(dict_values,values,rtol=0.,atol=tolerance), kernel
+
+delay_model = '''
+    import numpy as np
+    window_params = {'kernel': 'RK4', 'step_size': 0.01, 'array_size': 1000, 'nstep_update_plot': 10}
+    def load_docks(): return {'plot1':{'type':'plot1D'}}
+    def load_variables(): return {'x':{'type':np.float64,'init_cond':1.,'max_delay':1.5}}
+    def load_observables(): return {}
+    def load_params(): return {'tau':{'init_cond':1.,'min':0.,'max':1.5,'step':0.01}}
+    def diff_eq_x(ui,variables,params): return -ui.delayed('x',params['tau'])
+    def keyboard_keys(): return {}
+'''
+
+def test_delay_differential_equation(model_from_source):
+    """ x'(t) = -x(t-1) with x = 1 for t <= 0: x(3) = 1 - 3 + 2**2/2 - 1/6 (method of steps) """
+    for (kernel,block_integration) in [('RK4',False),('RK4_packed',False),('RK4_packed',True),('DP45',True)]:
+        modele = model_from_source('model_delay',delay_model)
+        modele.set_kernel(kernel)
+        modele.block_integration = block_integration
+        modele.advance(300)
+        assert abs(modele.time_stamp[-1]-3.) < 1e-9
+        assert abs(modele.variables['x']['value'][-1]+1./6.) < 1e-8, kernel
+
+stiff_model = '''
+    import numpy as np
+    window_params = {'kernel': 'BDF2', 'step_size': 0.05, 'array_size': 1000, 'rtol': 1e-6, 'atol': 1e-9}
+    def load_docks(): return {'plot1':{'type':'plot1D'}}
+    def load_variables(): return {'x':{'type':np.float64,'init_cond':1.},'y':{'type':np.float64,'init_cond':1.}}
+    def load_observables(): return {}
+    def load_params(): return {'k':{'init_cond':1000.,'min':0.,'max':5000.,'step':1.}}
+    def diff_eq_x(ui,variables,params): return -params['k']*(variables['x'] - variables['y'])
+    def diff_eq_y(ui,variables,params): return -variables['y']
+    def keyboard_keys(): return {}
+'''
+
+def test_BDF2_stiff_system(model_from_source):
+    """ x' = -1000 (x - y), y' = -y at step_size 0.05 (50 times the stability limit of explicit kernels): x follows y = exp(-t) with a single Jacobian evaluation """
+    modele = model_from_source('model_stiff',stiff_model)
+    modele.advance(40)
+    t = modele.time_stamp[-1]
+    assert abs(modele.variables['y']['value'][-1]-np.exp(-t)) < 1e-4
+    assert abs(modele.variables['x']['value'][-1]-1000./999.*np.exp(-t)) < 1e-4
+    assert modele.BDF2_state['njev'] == 1
+    modele.set_param_value('k',2000.)  # new Jacobian after a param change
+    modele.advance(10)
+    assert modele.BDF2_state['njev'] == 2
+
+noise_model = '''
+    import numpy as np
+    window_params = {'kernel': 'heun_packed', 'step_size': 0.01, 'array_size': 20000, 'nstep_update_plot': 100, 'block_integration': True, 'noise_seed': 1234, 'nstep_record': 1}
+    def load_docks(): return {'plot1':{'type':'plot1D'}}
+    def load_variables(): return {'x':{'type':np.float64,'init_cond':0.,'noise':'sigma'},'z':{'type':np.complex128,'init_cond':0.,'noise':0.5}}
+    def load_observables(): return {}
+    def load_params(): return {'sigma':{'init_cond':1.,'min':0.,'max':5.,'step':0.01},'gamma':{'init_cond':1.,'min':0.,'max':5.,'step':0.01}}
+    def diff_eq_x(ui,variables,params): return -params['gamma']*variables['x']
+    def diff_eq_z(ui,variables,params): return -params['gamma']*variables['z']
+    def keyboard_keys(): return {}
+'''
+
+def test_stochastic_kernels_Ornstein_Uhlenbeck(model_from_source):
+    """ dx = -x dt + dW: stationary variance sigma**2/(2 gamma) = 0.5, <|z|**2> = 0.5**2/2 for the complex variable """
+    for kernel in ['euler_maruyama_packed','heun_packed']:
+        modele = model_from_source('model_noise',noise_model)
+        modele.set_kernel(kernel)
+        modele.advance(20000)
+        assert abs(np.var(modele.variables['x']['value'][1000:])-0.5) < 0.1, kernel
+        assert abs(np.mean(np.abs(modele.variables['z']['value'][1000:])**2)-0.125) < 0.025, kernel
+
+def test_stochastic_kernels_packed_and_dict(model_from_source,tmp_path):
+    """ Same noise sequence for a seed: packed and dict kernels give the same trajectories, also after a checkpoint restore """
+    for kernel in ['euler_maruyama','heun']:
+        trajectories = []
+        for variant in [kernel,kernel+'_packed']:
+            modele = model_from_source('model_noise',noise_model)
+            modele.set_kernel(variant)
+            modele.advance(2000)
+            trajectories.append(modele.variables['z']['value'][-2000:].copy())
+        assert np.allclose(trajectories[0],trajectories[1],rtol=0.,atol=1e-12)
+    modele.save_checkpoint(str(tmp_path/'checkpoint'))
+    modele.advance(1000)
+    restored = model_from_source('model_noise',noise_model)
+    restored.restore_checkpoint(str(tmp_path/'checkpoint'))
+    restored.advance(1000)
+    assert np.array_equal(restored.variables['z']['value'][-3000:],modele.variables['z']['value'][-3000:])
+
+def test_headless_record_streamed_by_chunks(tmp_path):
+    """ Headless traces go through the chunks of a Recorder, then are converted into the requested file """
+    modele = load_model('model_input')
+    modele.record_chunk_size = 1000
+    modele.run_headless(2500,str(tmp_path/'traces.npz'))
+    assert len(list((tmp_path/'traces_record').glob('chunk_*.npz'))) == 3
+    traces = np.load(tmp_path/'traces.npz')
+    reference = load_model('model_input')
+    reference.advance(2500)
+    assert np.allclose(np.diff(traces['time']),reference.step_size)
+    assert np.array_equal(traces['A'],reference.variables['A']['value'][-2500:])
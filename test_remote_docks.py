@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Tests of the shared memory hand-over of remote docks, both sides in this process: python -m pytest
+
+import numpy as np
+import remote_docks
+from remote_docks import SharedArrays, set_data
+
+
+class Item():
+    def setData(self,x,y):
+        self.x,self.y = x,y
+
+class ResourceTracker():
+    def unregister(self,name,rtype):
+        pass
+
+class Request():
+    """ Asynchronous remote call whose result is waited for by SharedArrays before reusing its block """
+    def __init__(self):
+        self.waited = False
+    def result(self):
+        self.waited = True
+
+def send(shared_arrays,item,x,y):
+    descriptors = [shared_arrays.write('dock/x',x),shared_arrays.write('dock/y',y)]
+    set_data(item,'setData',descriptors)
+    request = Request()
+    shared_arrays.sent(['dock/x','dock/y'],request)
+    return descriptors,request
+
+def test_blocks_written_in_turn(monkeypatch):
+    monkeypatch.setattr(remote_docks,'resource_tracker',ResourceTracker())  # same process: the blocks stay registered by their creator
+    shared_arrays,item = SharedArrays(),Item()
+    try:
+        names,requests = [],[]
+        for frame in range(4):
+            shared_arrays.new_frame()
+            descriptors,request = send(shared_arrays,item,np.arange(10.)+frame,np.ones(10)*frame)
+            names.append(descriptors[0][1])
+            requests.append(request)
+            assert np.array_equal(item.x,np.arange(10.)+frame) and np.all(item.y == frame)
+        assert names[0] == names[2] and names[1] == names[3] and names[0] != names[1]
+        assert requests[0].waited and requests[1].waited and not requests[2].waited  # a block is reused once the call reading it returned
+    finally:
+        shared_arrays.close()
+        for memory in remote_docks.attached_memories.values(): memory.close()
+        remote_docks.attached_memories.clear()
+
+def test_replaced_blocks_closed_in_remote_process(monkeypatch):
+    monkeypatch.setattr(remote_docks,'resource_tracker',ResourceTracker())
+    shared_arrays,item = SharedArrays(),Item()
+    try:
+        for size in [10,10,1000,1000]:
+            shared_arrays.new_frame()
+            send(shared_arrays,item,np.arange(float(size)),np.zeros(size))
+        assert len(item.x) == 1000
+        assert len(remote_docks.attached_memories) == 4  # one block per slot (key and block index), the small ones were closed
+        names = {block['memory'].name for blocks in shared_arrays.blocks.values() for block in blocks}
+        assert {memory.name for memory in remote_docks.attached_memories.values()} == names
+    finally:
+        shared_arrays.close()
+        for memory in remote_docks.attached_memories.values(): memory.close()
+        remote_docks.attached_memories.clear()
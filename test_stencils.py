@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+# Tests of the finite-difference stencils against analytic derivatives: python -m pytest
+
+import numpy as np
+from stencils import laplacian, gradient, grid
+
+
+def laplacian_error(nb_points,boundary):
+    """ Largest error of the laplacian of a cosine mode (zero derivative at both ends) or a sine mode (zero at both ends) """
+    x,dx = grid(10.,nb_points,periodic=False)
+    k    = 3.*np.pi/10.
+    mode = np.cos(k*x) if boundary == 'neumann' else np.sin(k*x)
+    return np.max(np.abs(laplacian(mode,dx,boundary) + k**2*mode))
+
+def test_laplacian_neumann_cosine():
+    errors = [laplacian_error(nb_points,'neumann') for nb_points in [51,101,201]]
+    assert errors[-1] < 1e-3
+    assert 3.5 < errors[0]/errors[1] < 4.5 and 3.5 < errors[1]/errors[2] < 4.5  # second order, boundaries included
+
+def test_laplacian_dirichlet_sine():
+    x,dx = grid(10.,101,periodic=False)
+    k    = 3.*np.pi/10.
+    mode = np.sin(k*x)[1:-1]  # inner points, the ghost points are the zeros at both ends
+    assert np.max(np.abs(laplacian(mode,dx,'dirichlet') + k**2*mode)) < 2e-3
+
+def test_laplacian_periodic_2D():
+    x,dx = grid(10.,128)
+    k    = 2.*np.pi/10.
+    mode = np.cos(k*x)[:,None]*np.sin(2.*k*x)[None,:]
+    assert np.max(np.abs(laplacian(mode,dx) + 5.*k**2*mode)) < 2e-3
+
+def test_gradient_periodic():
+    x,dx = grid(10.,128)
+    k    = 2.*np.pi/10.
+    assert np.max(np.abs(gradient(np.sin(k*x),dx) - k*np.cos(k*x))) < 2e-3
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+# Tests of the param sweeps (points integrated in this process): python -m pytest
+
+import pytest
+import sweep
+
+
+def test_integer_param_values(monkeypatch):
+    """ Sweep values of an integer param must be integers: 1000.0 is applied, 999.5 is rejected instead of truncated """
+    monkeypatch.setattr(sweep,'worker_modele',None)
+    results = sweep.run_points('model_input',[{'npts_PS':1000.},{'npts_PS':500.}],['mod_A'],10,10,['mean'],False)
+    assert sweep.worker_modele.params['npts_PS']['value'][-1] == 500
+    assert len(results['mod_A_mean']) == 2
+    with pytest.raises(AssertionError):
+        sweep.run_points('model_input',[{'npts_PS':999.5}],['mod_A'],10,10,['mean'],False)